@@ -0,0 +1,112 @@
+"""
+Benchmark dos codecs de contexto da memória
+Compara JSON, packed sem dicionário e packed com dicionário treinado em
+tamanho médio do payload e tempo de codificação/decodificação, com
+contextos no formato dos gravados pelo Prime (FALAR e decisões)
+Uso: python benchmarks/bench_contexto_codec.py --events 20000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from systems.contexto_codec import CodecDictionary, ContextoCodecs
+
+
+MOTIVOS = ["necessidade social alta", "usuário presente sem interação",
+           "curiosidade ativa", "energia baixa", "personalidade reservada",
+           "momento de descanso"]
+ESTADOS = ["neutro", "feliz", "cansado", "focado", "ausente"]
+LUZES = ["clara", "escura", "media"]
+
+
+def emocional(rng: random.Random):
+    return {
+        "energia": round(rng.random(), 3),
+        "humor": round(rng.uniform(-1, 1), 3),
+        "curiosidade": round(rng.random(), 3),
+        "necessidade_social": round(rng.random(), 3),
+        "cansaco": round(rng.random(), 3),
+    }
+
+
+def gerar_contextos(n: int, rng: random.Random):
+    """Mistura de contextos de FALAR e de decisões, como na memória real"""
+    inicio = datetime(2026, 1, 1)
+    contextos = []
+    for i in range(n):
+        if rng.random() < 0.6:
+            contextos.append({"decisao": rng.choice(MOTIVOS), "emocional": emocional(rng)})
+            continue
+        agora = inicio + timedelta(seconds=i * 10, microseconds=rng.randint(0, 999_999))
+        contextos.append({
+            "scores": {nome: round(rng.random(), 3)
+                       for nome in ("falar", "silenciar", "observar", "mudar_humor", "nada")},
+            "emocional": emocional(rng),
+            "situacional": {
+                "hora": agora.strftime("%H:%M"),
+                "luz": rng.choice(LUZES),
+                "usuario_presente": rng.random() < 0.5,
+                "usuario_estado": rng.choice(ESTADOS),
+                "interacao_recente": rng.random() < 0.3,
+                "ambiente": "casa",
+                "ultima_atualizacao": agora.isoformat(),
+            },
+        })
+    return contextos
+
+
+def medir(codecs: ContextoCodecs, contextos, repeticoes: int):
+    """(bytes médios, µs por encode, µs por decode) — melhor de N rodadas"""
+    codificados = [codecs.encode(c) for c in contextos]
+    tamanho = sum(len(raw.encode("utf-8") if isinstance(raw, str) else raw)
+                  for raw, _ in codificados) / len(contextos)
+    encode = decode = float("inf")
+    for _ in range(repeticoes):
+        t = time.perf_counter()
+        for contexto in contextos:
+            codecs.encode(contexto)
+        encode = min(encode, time.perf_counter() - t)
+        t = time.perf_counter()
+        for raw, tag in codificados:
+            codecs.decode(raw, tag)
+        decode = min(decode, time.perf_counter() - t)
+    n = len(contextos)
+    return tamanho, encode / n * 1e6, decode / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos codecs de contexto")
+    parser.add_argument("--events", type=int, default=20_000)
+    parser.add_argument("--train", type=int, default=2_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    
+    rng = random.Random(42)
+    treino = gerar_contextos(args.train, rng)
+    contextos = gerar_contextos(args.events, rng)
+    
+    com_dicionario = ContextoCodecs("packed")
+    com_dicionario.add_dictionary(CodecDictionary.train(1, treino))
+    variantes = {
+        "json": ContextoCodecs("json"),
+        "packed": ContextoCodecs("packed"),
+        "packed+dict": com_dicionario,
+    }
+    
+    base = None
+    for nome, codecs in variantes.items():
+        tamanho, encode, decode = medir(codecs, contextos, args.repeat)
+        base = base or tamanho
+        print(f"{nome:>11}: {tamanho:7.1f} bytes ({base / tamanho:4.1f}x menor) | "
+              f"encode {encode:5.2f}µs | decode {decode:5.2f}µs")
+    print(f"modelos: {com_dicionario.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark do caminho da expressão com o LLM substituto
+Roda ticks como o PrimeCore (situação → emoção → decisão) com o usuário
+presente e mede a latência do tick e, nos FALAR, o tempo até o primeiro
+token e até a resposta completa. Sem modelo e sem GPU; com a mesma
+semente, a mesma sequência de decisões e latências
+--http sobe o servidor substituto e passa pelo cliente HTTP do Ollama
+Uso: python benchmarks/bench_expression_latency.py --ticks 200 --first-token lognormal:300:0.4
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from systems.decision import DecisionSystem, DecisionType
+from systems.emotional_system import EmotionalSystem
+from systems.expression import ExpressionSystem
+from systems.llm_backend import OllamaBackend
+from systems.llm_standin import StandInBackend, StandInServer
+from systems.personality import PersonalitySystem, PersonalityTraits
+from systems.situational_awareness import SituationalAwareness
+
+
+def percentis(valores, ps=(50, 95, 99)):
+    if not valores:
+        return {f"p{p}": 0.0 for p in ps}
+    ordenados = sorted(valores)
+    return {f"p{p}": ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+            for p in ps}
+
+
+def linha(nome, valores):
+    p = percentis(valores)
+    print(f"{nome:<22} n={len(valores):<5} p50={p['p50']:8.1f} ms  "
+          f"p95={p['p95']:8.1f} ms  p99={p['p99']:8.1f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Latência do tick e da fala com LLM substituto")
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--first-token", default="lognormal:300:0.4",
+                        help="Distribuição da espera até o primeiro token (ms)")
+    parser.add_argument("--tokens-per-s", type=float, default=20.0)
+    parser.add_argument("--prompt-tokens-per-s", type=float, default=0.0)
+    parser.add_argument("--deadline", type=float, default=8.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--observadora", type=float, default=0.6,
+                        help="Traço observador (acima de 0.7 o Prime quase só observa)")
+    parser.add_argument("--stream", action="store_true", help="Fala em streaming (frase a frase)")
+    parser.add_argument("--http", action="store_true",
+                        help="Via servidor HTTP substituto e cliente do Ollama")
+    args = parser.parse_args()
+    
+    random.seed(args.seed)
+    standin = StandInBackend(first_token=args.first_token, tokens_per_s=args.tokens_per_s,
+                             prompt_tokens_per_s=args.prompt_tokens_per_s, seed=args.seed)
+    server = None
+    llm = standin
+    if args.http:
+        server = StandInServer(standin, port=0)
+        await server.start()
+        llm = OllamaBackend(standin.model, f"http://{server.host}:{server.port}")
+    
+    situational = SituationalAwareness()
+    situational.update_presence(True)
+    emotional = EmotionalSystem()
+    personality = PersonalitySystem(PersonalityTraits(observadora=args.observadora))
+    decision = DecisionSystem(seed_diaria=args.seed)
+    expression = ExpressionSystem(deadline=args.deadline, llm=llm)
+    expression._imperfection_plan = lambda: (False, False)
+    
+    ticks, primeiro_token, respostas = [], [], []
+    falar = 0
+    try:
+        for _ in range(args.ticks):
+            start = time.perf_counter()
+            situational.tick()
+            situacional = situational.get_state_dict()
+            emotional.tick(situacional)
+            emocional = emotional.get_state_dict()
+            decisao = decision.decide(emocional, situacional, personality.get_traits_dict())
+            ticks.append((time.perf_counter() - start) * 1000)
+            if decisao.tipo != DecisionType.FALAR:
+                continue
+            
+            falar += 1
+            pedido = (decisao.to_dict(), personality.get_traits_dict(), emocional, situacional)
+            start = time.perf_counter()
+            if args.stream:
+                await expression.speak_response_stream(*pedido)
+                primeiro_token.append(expression.last_first_token_ms)
+            else:
+                await expression.generate_response_async(*pedido)
+            respostas.append((time.perf_counter() - start) * 1000)
+            emotional.on_interaction("normal")
+    finally:
+        expression.close()
+        if server is not None:
+            await server.close()
+    
+    print(f"{args.ticks} ticks, {falar} FALAR (primeiro token: {args.first_token}, "
+          f"{args.tokens_per_s:g} tokens/s, {'http' if args.http else 'em processo'})")
+    linha("tick (decisão)", ticks)
+    if args.stream:
+        linha("primeiro token", primeiro_token)
+    linha("resposta completa", respostas)
+    stats = expression.get_stats()
+    print(f"timeouts={stats['timeouts']} erros={stats['errors']} "
+          f"tokens={standin.tokens} prompt avaliado (último)={stats['last_prompt_eval_tokens']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,139 @@
+"""
+Benchmark do corretor de pedidos ao LLM entre agentes
+Vários agentes pedem falas ao mesmo LLM substituto (com `--parallel`
+vagas, como o OLLAMA_NUM_PARALLEL) em dois modos com a mesma sequência de
+pedidos: direto (cada um por conta própria) e pelo ExpressionBroker.
+Mostra vazão, chamadas ao servidor e latência (geral e por agente)
+Uso: python benchmarks/bench_llm_broker.py --agents 6 --requests 20 --gap 2.0
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import namedtuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from systems.decision import DecisionSystem, DecisionType
+from systems.emotional_system import EmotionalSystem
+from systems.expression import ExpressionSystem
+from systems.llm_broker import ExpressionBroker, MERGE_MODES
+from systems.llm_standin import StandInBackend
+
+Lembranca = namedtuple("Lembranca", "evento")
+
+EVENTOS = ["usuário chegou", "usuário saiu", "conversa curta", "silêncio longo",
+           "usuário riu", "porta bateu"]
+
+
+def percentis(valores, ps=(50, 95, 99)):
+    if not valores:
+        return {f"p{p}": 0.0 for p in ps}
+    ordenados = sorted(valores)
+    return {f"p{p}": ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+            for p in ps}
+
+
+def linha(nome, valores):
+    p = percentis(valores)
+    print(f"{nome:<22} n={len(valores):<5} p50={p['p50']:8.1f} ms  "
+          f"p95={p['p95']:8.1f} ms  p99={p['p99']:8.1f} ms")
+
+
+def plano(args):
+    """Para cada agente: [(espera antes do pedido em s, mensagens)], igual nos dois modos"""
+    rng = random.Random(args.seed)
+    expression = ExpressionSystem(llm=StandInBackend())
+    personalidade = {"afetuosa": 0.7, "observadora": 0.6, "ironica": 0.3,
+                     "reservada": 0.4, "curiosa": 0.6}
+    estados = []
+    for _ in range(args.states):
+        emocional = EmotionalSystem().get_state_dict()
+        estados.append({campo: (rng.random() if isinstance(valor, float) else valor)
+                        for campo, valor in emocional.items()})
+    motivos = DecisionSystem.MOTIVOS[DecisionType.FALAR]
+    planos = []
+    for _ in range(args.agents):
+        pedidos = []
+        for _ in range(args.requests):
+            decisao = {"tipo": DecisionType.FALAR.value, "motivo": rng.choice(motivos)}
+            situacional = {"usuario_presente": True,
+                           "usuario_estado": rng.choice(["calmo", "desconhecido"])}
+            memoria = [Lembranca(e) for e in rng.sample(EVENTOS, rng.randint(0, 3))]
+            mensagens = expression._build_messages(decisao, personalidade, rng.choice(estados),
+                                                   situacional, memoria)
+            pedidos.append((rng.expovariate(1 / args.gap) if args.gap > 0 else 0.0, mensagens))
+        planos.append(pedidos)
+    expression.close()
+    return planos
+
+
+async def rodar(args, planos, merge):
+    """merge=None: direto no servidor; senão, pelo corretor com essa junção"""
+    standin = StandInBackend(first_token=args.first_token, tokens_per_s=args.tokens_per_s,
+                             seed=args.seed, parallel=args.parallel)
+    broker = None
+    if merge is not None:
+        broker = ExpressionBroker(standin, concurrency=args.parallel, merge=merge,
+                                  deadline=args.deadline)
+    latencias = {}
+    falhas = 0
+    
+    async def agente(indice, pedidos):
+        nonlocal falhas
+        llm = broker.client(f"agente{indice}") if broker else standin
+        latencias[indice] = []
+        for espera, mensagens in pedidos:
+            await asyncio.sleep(espera)
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(llm.chat(mensagens), args.deadline)
+            except asyncio.TimeoutError:
+                falhas += 1
+                continue
+            latencias[indice].append((time.perf_counter() - start) * 1000)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(agente(i, p) for i, p in enumerate(planos)))
+    duracao = time.perf_counter() - start
+    
+    total = sum(len(v) for v in latencias.values())
+    print(f"\n== {'direto' if merge is None else f'corretor (junção {merge})'}: "
+          f"{total} respostas em {duracao:.1f}s ({total / duracao:.2f}/s), "
+          f"{standin.requests} chamadas ao servidor, {falhas} fora do prazo")
+    linha("latência", [ms for v in latencias.values() for ms in v])
+    for indice, valores in sorted(latencias.items()):
+        linha(f"  agente{indice}", valores)
+    if broker is not None:
+        stats = broker.get_stats()
+        print(f"juntados={stats['merged']} vencidos na fila={stats['expired']} "
+              f"fila máx.={stats['max_queue']} justiça={stats['fairness']}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Direto no servidor vs. corretor entre agentes")
+    parser.add_argument("--agents", type=int, default=6)
+    parser.add_argument("--requests", type=int, default=20, help="Pedidos por agente")
+    parser.add_argument("--gap", type=float, default=2.0,
+                        help="Intervalo médio (s) entre pedidos de um agente")
+    parser.add_argument("--states", type=int, default=4,
+                        help="Estados emocionais distintos entre os agentes")
+    parser.add_argument("--parallel", type=int, default=1,
+                        help="Pedidos simultâneos que o servidor aguenta")
+    parser.add_argument("--first-token", default="lognormal:300:0.4")
+    parser.add_argument("--tokens-per-s", type=float, default=20.0)
+    parser.add_argument("--deadline", type=float, default=8.0)
+    parser.add_argument("--merge", choices=MERGE_MODES, default="exact")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    planos = plano(args)
+    await rodar(args, planos, None)
+    await rodar(args, planos, args.merge)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+Benchmark da memória semântica
+Indexa N eventos sintéticos e mede a latência de recall (top-k)
+Uso: python benchmarks/bench_semantic_recall.py --events 1000000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from systems.semantic_memory import SemanticMemory
+
+
+PALAVRAS = [
+    "usuário", "chegou", "cansado", "trabalho", "café", "noite", "manhã", "luz",
+    "silêncio", "falei", "observei", "música", "chuva", "cozinha", "sala", "dormiu",
+    "sorriu", "ignorou", "respondeu", "saiu", "voltou", "cedo", "tarde", "feliz",
+]
+
+
+def texto_aleatorio(rng: random.Random) -> str:
+    return " ".join(rng.choice(PALAVRAS) for _ in range(rng.randint(3, 10)))
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de recall semântico")
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=10_000)
+    args = parser.parse_args()
+    
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        memoria = SemanticMemory(os.path.join(tmp, "semantic"), dim=args.dim)
+        memoria.open()
+        
+        start = time.perf_counter()
+        next_id = 1
+        while next_id <= args.events:
+            n = min(args.batch, args.events - next_id + 1)
+            memoria.add([(next_id + i, texto_aleatorio(rng), "") for i in range(n)])
+            next_id += n
+        indexacao = time.perf_counter() - start
+        print(f"Indexação: {args.events} eventos em {indexacao:.1f}s "
+              f"({args.events / indexacao:,.0f} eventos/s)")
+        
+        consultas = [texto_aleatorio(rng) for _ in range(args.queries)]
+        for budget in (None, 50.0, 10.0):
+            latencias = []
+            completas = 0
+            for consulta in consultas:
+                t = time.perf_counter()
+                _, _, completa = memoria.search(consulta, k=args.k, budget_ms=budget)
+                latencias.append((time.perf_counter() - t) * 1000)
+                completas += completa
+            nome = "sem limite" if budget is None else f"orçamento {budget:.0f}ms"
+            print(f"Recall top-{args.k} ({nome}): "
+                  f"p50={statistics.median(latencias):.1f}ms "
+                  f"p95={percentil(latencias, 0.95):.1f}ms "
+                  f"completas={completas}/{len(consultas)}")
+        memoria.close()
+
+
+if __name__ == "__main__":
+    main()
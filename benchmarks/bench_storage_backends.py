@@ -0,0 +1,104 @@
+"""
+Benchmark dos backends de armazenamento da memória
+Compara SQLite e log segmentado em vazão de escrita (lotes como os da
+fila write-behind) e latência de varredura por intervalo de tempo
+Uso: python benchmarks/bench_storage_backends.py --events 200000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from systems.event_log import EventLogBackend
+from systems.memory import SQLiteMemoryBackend
+
+
+TIPOS = ["presenca", "interacao", "evento_emocional"]
+RESULTADOS = ["aceita", "ignorada", "negativa", ""]
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+def gerar_linhas(n: int, inicio_ms: int, rng: random.Random):
+    """Um evento a cada ~10s, a partir de inicio_ms"""
+    linhas = []
+    for i in range(n):
+        ts = inicio_ms + i * 10_000
+        linhas.append((
+            ts,
+            rng.choice(TIPOS),
+            f"usuário {rng.choice(['chegou', 'saiu', 'voltou', 'sorriu'])} {i % 97}",
+            rng.choice(["", "Oi.", "Hmm...", "Quer um café?"]),
+            rng.choice(RESULTADOS),
+            round(rng.random(), 3),
+            json.dumps({"presenca": True, "emocao": round(rng.random(), 2)}),
+            1,
+            ts,
+            0  # codec: JSON
+        ))
+    return linhas
+
+
+async def medir(backend, linhas, batch: int, consultas, page_size: int):
+    await backend.open()
+    start = time.perf_counter()
+    for i in range(0, len(linhas), batch):
+        await backend.write_batch(linhas[i:i + batch])
+    escrita = time.perf_counter() - start
+    
+    latencias = []
+    for tipo, since_ms, until_ms in consultas:
+        t = time.perf_counter()
+        await backend.scan(tipo, since_ms, until_ms, None, page_size)
+        latencias.append((time.perf_counter() - t) * 1000)
+    await backend.close()
+    return escrita, latencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos backends de memória")
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--batch", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--window-hours", type=float, default=24.0)
+    parser.add_argument("--page-size", type=int, default=500)
+    args = parser.parse_args()
+    
+    rng = random.Random(42)
+    inicio_ms = int(time.time() * 1000) - args.events * 10_000
+    linhas = gerar_linhas(args.events, inicio_ms, rng)
+    janela_ms = int(args.window_hours * 3600 * 1000)
+    fim_ms = inicio_ms + args.events * 10_000
+    consultas = []
+    for _ in range(args.queries):
+        since_ms = rng.randint(inicio_ms, max(inicio_ms, fim_ms - janela_ms))
+        consultas.append((rng.choice(TIPOS + [None]), since_ms, since_ms + janela_ms))
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = {
+            "sqlite": SQLiteMemoryBackend(os.path.join(tmp, "sqlite", "prime.db")),
+            "log": EventLogBackend(os.path.join(tmp, "event_log")),
+        }
+        for nome, backend in backends.items():
+            escrita, latencias = asyncio.run(
+                medir(backend, linhas, args.batch, consultas, args.page_size)
+            )
+            print(f"{nome:>6}: escrita {args.events / escrita:,.0f} eventos/s "
+                  f"(lotes de {args.batch}) | varredura {args.window_hours:g}h "
+                  f"p50={statistics.median(latencias):.2f}ms "
+                  f"p95={percentil(latencias, 0.95):.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
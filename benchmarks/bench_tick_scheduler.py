@@ -0,0 +1,90 @@
+"""
+Benchmark do agendador do loop principal
+Ticks com duração sorteada (a maioria curta, alguns com uma chamada ao
+LLM mais longa que o intervalo) durante `--seconds` s, no loop antigo
+(tick e depois sleep do intervalo) e no TickScheduler com cada política
+de atraso. Mostra ticks feitos vs. esperados, período médio e quanto o
+último tick ficou atrás da grade (início + n × intervalo)
+Uso: python benchmarks/bench_tick_scheduler.py --interval 0.2 --seconds 10
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from systems.tick_scheduler import OVERRUN_POLICIES, TickScheduler
+
+
+def duracoes(args):
+    """Duração (s) de cada tick, igual em todos os modos"""
+    rng = random.Random(args.seed)
+    while True:
+        if rng.random() < args.slow_rate:
+            yield args.interval * args.slow_factor
+        else:
+            yield rng.uniform(0.0, args.work * 2)
+
+
+async def rodar(args, policy):
+    """policy=None: loop antigo; senão, TickScheduler com essa política"""
+    sorteio = duracoes(args)
+    inicios = []
+    
+    async def tick():
+        inicios.append(time.monotonic())
+        await asyncio.sleep(next(sorteio))
+    
+    start = time.monotonic()
+    fim = start + args.seconds
+    if policy is None:
+        while time.monotonic() < fim:
+            await tick()
+            await asyncio.sleep(args.interval)
+        scheduler = None
+    else:
+        scheduler = TickScheduler(args.interval, policy=policy, max_catch_up=args.max_catch_up)
+        await scheduler.run(tick, lambda: time.monotonic() < fim)
+    
+    esperados = int(args.seconds / args.interval)
+    periodos = [b - a for a, b in zip(inicios, inicios[1:])]
+    periodo = sum(periodos) / len(periodos) * 1000 if periodos else 0.0
+    # Quanto o último tick começou depois do prazo que teria se nenhum fosse perdido
+    atras = (inicios[-1] - start - (len(inicios) - 1) * args.interval) * 1000
+    nome = "sleep depois do tick" if policy is None else f"agendador ({policy})"
+    print(f"{nome:<24} ticks={len(inicios):<4}/{esperados:<4} período médio={periodo:7.1f} ms  "
+          f"atrás da grade={atras:8.1f} ms")
+    if scheduler is not None:
+        stats = scheduler.get_stats()
+        print(f"{'':<24} atrasos={stats['overruns']} descartados={stats['skipped']} "
+              f"recuperados={stats['caught_up']} juntados={stats['coalesced']} "
+              f"atraso de início p50={stats['lag_ms']['p50']:.1f} "
+              f"p99={stats['lag_ms']['p99']:.1f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Loop com sleep vs. prazos fixos")
+    parser.add_argument("--interval", type=float, default=0.2, help="s entre ticks")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--work", type=float, default=0.02,
+                        help="Duração média (s) de um tick comum")
+    parser.add_argument("--slow-rate", type=float, default=0.05,
+                        help="Fração de ticks com uma chamada longa ao LLM")
+    parser.add_argument("--slow-factor", type=float, default=2.5,
+                        help="Duração do tick longo, em intervalos")
+    parser.add_argument("--max-catch-up", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    print(f"intervalo {args.interval * 1000:g} ms, {args.seconds:g} s")
+    await rodar(args, None)
+    for policy in OVERRUN_POLICIES:
+        await rodar(args, policy)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,98 @@
+"""
+Benchmark do aquecimento do modelo com o LLM substituto
+O substituto paga `--load-ms` para carregar o modelo no primeiro pedido e
+sempre que o keep_alive vence sem pedidos. Mede o primeiro FALAR:
+- depois do boot, sem e com aquecimento
+- quando o usuário volta depois de o keep_alive vencer, sem e com o
+  reaquecimento na chegada (o FALAR vem `--arrival-lead` s depois)
+keep_alive em segundos para o benchmark caber em meio minuto
+Uso: python benchmarks/bench_warmup.py --load-ms 3000 --keep-alive 3s
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from systems.decision import DecisionSystem, DecisionType
+from systems.expression import ExpressionSystem
+from systems.llm_backend import keep_alive_seconds
+from systems.llm_standin import StandInBackend
+from systems.llm_warmup import ModelWarmer
+
+PERSONALIDADE = {"afetuosa": 0.7, "observadora": 0.6, "ironica": 0.3,
+                 "reservada": 0.4, "curiosa": 0.6}
+EMOCIONAL = {"energia": 0.7, "curiosidade": 0.5}
+PRESENTE = {"usuario_presente": True, "usuario_estado": "calmo"}
+AUSENTE = {"usuario_presente": False, "usuario_estado": "desconhecido"}
+
+
+async def falar(expression):
+    decisao = {"tipo": DecisionType.FALAR.value,
+               "motivo": DecisionSystem.MOTIVOS[DecisionType.FALAR][0]}
+    start = time.perf_counter()
+    await expression.generate_response_async(decisao, PERSONALIDADE, EMOCIONAL, PRESENTE)
+    return (time.perf_counter() - start) * 1000
+
+
+async def cenario(args, aquecer: bool, volta: bool) -> float:
+    standin = StandInBackend(first_token=args.first_token, tokens_per_s=args.tokens_per_s,
+                             load_time=f"fixed:{args.load_ms}", seed=args.seed)
+    expression = ExpressionSystem(deadline=args.deadline, llm=standin)
+    expression._imperfection_plan = lambda: (False, False)
+    warmer = ModelWarmer(expression, standin, active_keep_alive=args.keep_alive,
+                         idle_keep_alive=args.keep_alive, timeout=args.deadline)
+    try:
+        if not volta:
+            warmer.observe(True, PERSONALIDADE, EMOCIONAL, PRESENTE)
+            if aquecer:
+                await warmer.warm_up()
+            return await falar(expression)
+        
+        # Conversa, o usuário sai e fica fora mais que o keep_alive
+        warmer.observe(True, PERSONALIDADE, EMOCIONAL, PRESENTE)
+        await warmer.warm_up()
+        await falar(expression)
+        warmer.observe(False, PERSONALIDADE, EMOCIONAL, AUSENTE)
+        await asyncio.sleep(keep_alive_seconds(args.keep_alive) + 0.5)
+        
+        # Volta: com reaquecimento, o modelo carrega enquanto o Prime observa
+        warmer.observe(True, PERSONALIDADE, EMOCIONAL, PRESENTE)
+        if aquecer and warmer.pending == "warm":
+            tarefa = asyncio.create_task(warmer.warm_up())
+            await asyncio.sleep(args.arrival_lead)
+            await tarefa
+        else:
+            await asyncio.sleep(args.arrival_lead)
+        return await falar(expression)
+    finally:
+        expression.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Primeiro FALAR frio vs. aquecido")
+    parser.add_argument("--load-ms", type=float, default=3000.0,
+                        help="Carga do modelo no substituto (ms)")
+    parser.add_argument("--first-token", default="fixed:300")
+    parser.add_argument("--tokens-per-s", type=float, default=20.0)
+    parser.add_argument("--keep-alive", default="3s")
+    parser.add_argument("--arrival-lead", type=float, default=4.0,
+                        help="s entre a chegada do usuário e o FALAR")
+    parser.add_argument("--deadline", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    print(f"carga do modelo {args.load_ms:g} ms, keep_alive {args.keep_alive}")
+    for nome, aquecer, volta in (("boot, sem aquecimento", False, False),
+                                 ("boot, aquecido", True, False),
+                                 ("volta, sem reaquecer", False, True),
+                                 ("volta, reaquecido", True, True)):
+        ms = await cenario(args, aquecer, volta)
+        print(f"{nome:<24} primeiro FALAR {ms:8.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
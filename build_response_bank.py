@@ -0,0 +1,62 @@
+"""
+Gera o banco de respostas offline do Prime
+Roda o LLM sobre (tipo de decisão, motivo, estado quantizado) e grava o
+arquivo lido por ResponseBank na inicialização
+Uso: python build_response_bank.py [--variants N] [--all-personalities]
+"""
+
+import argparse
+import asyncio
+import logging
+
+from systems.decision import DecisionSystem, DecisionType
+from systems.expression import ExpressionSystem
+from systems.response_bank import build_bank
+from config.settings import settings
+
+logging.basicConfig(
+    level=getattr(logging, settings.LOG_LEVEL),
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Gera o banco de respostas offline")
+    parser.add_argument("--output", default=settings.RESPONSE_BANK_PATH,
+                        help="Arquivo do banco")
+    parser.add_argument("--model", default=settings.OLLAMA_MODEL, help="Modelo do Ollama")
+    parser.add_argument("--variants", type=int, default=4,
+                        help="Falas geradas por chave (repetidas são descartadas)")
+    parser.add_argument("--all-personalities", action="store_true",
+                        help="Todos os buckets de personalidade (padrão: só a configurada)")
+    parser.add_argument("--deadline", type=float, default=60.0,
+                        help="Prazo (s) de cada geração")
+    args = parser.parse_args()
+    
+    personalidade = None
+    if not args.all_personalities:
+        personalidade = {
+            "afetuosa": settings.PERSONALITY_AFETUOSA,
+            "observadora": settings.PERSONALITY_OBSERVADORA,
+            "ironica": settings.PERSONALITY_IRONICA,
+            "reservada": settings.PERSONALITY_RESERVADA,
+            "curiosa": settings.PERSONALITY_CURIOSA
+        }
+    
+    expression = ExpressionSystem(model=args.model, base_url=settings.OLLAMA_BASE_URL,
+                                  keep_alive=settings.OLLAMA_KEEP_ALIVE)
+    motivos = {DecisionType.FALAR.value: DecisionSystem.MOTIVOS[DecisionType.FALAR]}
+    try:
+        resultado = await build_bank(expression, args.output, motivos,
+                                     personalidade=personalidade, variants=args.variants,
+                                     deadline=args.deadline)
+    finally:
+        expression.close()
+    logger.info(f"Banco gravado em {args.output}: {resultado['keys']} chaves, "
+                f"{resultado['texts']} falas ({resultado['llm_calls']} chamadas ao LLM "
+                f"em {resultado['seconds']}s)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
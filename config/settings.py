@@ -18,10 +18,94 @@ class Settings:
     # Ollama
     OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
     OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "phi3")
+    OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")  # Modelo e KV cache residentes
+    OLLAMA_KEEP_ALIVE_IDLE = os.getenv("OLLAMA_KEEP_ALIVE_IDLE", "5m")  # Sem atividade prevista
+    
+    # Aquecimento do modelo na inicialização e quando a atividade volta
+    ENABLE_LLM_WARMUP = os.getenv("ENABLE_LLM_WARMUP", "true").lower() == "true"
+    LLM_WARMUP_TIMEOUT = float(os.getenv("LLM_WARMUP_TIMEOUT", "120.0"))  # s (carga do modelo)
+    LLM_READY_RECHECK = float(os.getenv("LLM_READY_RECHECK", "30.0"))  # s entre conferências
+    
+    # Backend do LLM: "ollama" ou "standin" (substituto determinístico, sem modelo)
+    LLM_BACKEND = os.getenv("LLM_BACKEND", "ollama")
+    STANDIN_FIRST_TOKEN = os.getenv("STANDIN_FIRST_TOKEN", "lognormal:300:0.4")  # ms
+    STANDIN_TOKENS_PER_S = float(os.getenv("STANDIN_TOKENS_PER_S", "20.0"))
+    STANDIN_SEED = int(os.getenv("STANDIN_SEED", "0"))
+    STANDIN_LOAD_TIME = os.getenv("STANDIN_LOAD_TIME", "fixed:0")  # ms para carregar o modelo
+    
+    # Corretor entre agentes (llm_broker.py): vários Prime no mesmo servidor de modelo
+    AGENT_ID = os.getenv("AGENT_ID", "prime")  # Vai no cabeçalho X-Prime-Agent
+    LLM_BROKER_PORT = int(os.getenv("LLM_BROKER_PORT", "11500"))
+    LLM_BROKER_CONCURRENCY = int(os.getenv("LLM_BROKER_CONCURRENCY", "1"))  # OLLAMA_NUM_PARALLEL
+    LLM_BROKER_PER_AGENT = int(os.getenv("LLM_BROKER_PER_AGENT", "1"))  # Vagas por agente
+    LLM_BROKER_MERGE = os.getenv("LLM_BROKER_MERGE", "exact")  # off | exact | near
+    
+    # Resiliência do LLM: SLO por pedido, pedido de reserva (hedge) e disjuntor
+    ENABLE_LLM_RESILIENCE = os.getenv("ENABLE_LLM_RESILIENCE", "true").lower() == "true"
+    LLM_SLO = float(os.getenv("LLM_SLO", "4.0"))  # s até a resposta ou o primeiro token
+    LLM_HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER", "0"))  # s; 0 desliga o hedge
+    LLM_HEDGE_MODEL = os.getenv("LLM_HEDGE_MODEL", "")  # Vazio: mesmo modelo, menos tokens
+    LLM_HEDGE_MAX_TOKENS = int(os.getenv("LLM_HEDGE_MAX_TOKENS", "32"))
+    LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "3"))  # Falhas seguidas
+    LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30.0"))  # s até sondar de novo
+    EXPRESSION_DEADLINE = float(os.getenv("EXPRESSION_DEADLINE", "8.0"))  # s até a resposta mínima
+    EXPRESSION_STREAMING = os.getenv("EXPRESSION_STREAMING", "true").lower() == "true"
+    
+    # Banco de respostas offline (build_response_bank.py): fallback do LLM ou,
+    # com EXPRESSION_MODE=bank, caminho principal em hardware fraco
+    ENABLE_RESPONSE_BANK = os.getenv("ENABLE_RESPONSE_BANK", "true").lower() == "true"
+    RESPONSE_BANK_PATH = os.getenv("RESPONSE_BANK_PATH", "./data/response_bank.bin")
+    EXPRESSION_MODE = os.getenv("EXPRESSION_MODE", "llm")  # "llm" ou "bank"
+    
+    # Pré-geração especulativa: fala candidata gerada quando FALAR está perto de vencer
+    ENABLE_SPECULATIVE = os.getenv("ENABLE_SPECULATIVE", "true").lower() == "true"
+    SPECULATIVE_MARGIN = float(os.getenv("SPECULATIVE_MARGIN", "0.25"))  # Distância do score vencedor
+    SPECULATIVE_TTL = float(os.getenv("SPECULATIVE_TTL", "60.0"))  # s até a candidata ficar velha
+    SPECULATIVE_CACHE_SIZE = int(os.getenv("SPECULATIVE_CACHE_SIZE", "8"))
+    
+    # Worker de TTS: fila limitada e idade máxima (s) de uma fala na fila
+    TTS_QUEUE_SIZE = int(os.getenv("TTS_QUEUE_SIZE", "16"))
+    TTS_MAX_AGE = float(os.getenv("TTS_MAX_AGE", "10.0"))
+    
+    # Cache de áudio: falas curtas recorrentes tocadas de WAV pré-renderizado
+    ENABLE_AUDIO_CACHE = os.getenv("ENABLE_AUDIO_CACHE", "true").lower() == "true"
+    AUDIO_CACHE_PATH = os.getenv("AUDIO_CACHE_PATH", "./data/audio_cache")
+    AUDIO_CACHE_MAX_MB = int(os.getenv("AUDIO_CACHE_MAX_MB", "64"))
+    AUDIO_CACHE_MIN_REPEATS = int(os.getenv("AUDIO_CACHE_MIN_REPEATS", "3"))
     
     # Database
     DATABASE_PATH = os.getenv("DATABASE_PATH", "./data/prime.db")
     CHROMA_PATH = os.getenv("CHROMA_PATH", "./data/chroma")
+    DB_READER_POOL_SIZE = int(os.getenv("DB_READER_POOL_SIZE", "2"))
+    DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "8192"))
+    DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", "67108864"))  # 64MB
+    MEMORY_WRITE_BATCH_SIZE = int(os.getenv("MEMORY_WRITE_BATCH_SIZE", "64"))
+    MEMORY_WRITE_FLUSH_INTERVAL = float(os.getenv("MEMORY_WRITE_FLUSH_INTERVAL", "0.5"))
+    MEMORY_WRITE_QUEUE_SIZE = int(os.getenv("MEMORY_WRITE_QUEUE_SIZE", "1024"))
+    MEMORY_SHORT_TERM_SIZE = int(os.getenv("MEMORY_SHORT_TERM_SIZE", "20"))
+    MEMORY_COALESCE_WINDOW = float(os.getenv("MEMORY_COALESCE_WINDOW", "300"))  # 0 desliga
+    
+    # Memória semântica (índice vetorial local)
+    ENABLE_SEMANTIC_MEMORY = os.getenv("ENABLE_SEMANTIC_MEMORY", "true").lower() == "true"
+    SEMANTIC_INDEX_PATH = os.getenv("SEMANTIC_INDEX_PATH", "./data/semantic")
+    SEMANTIC_DIM = int(os.getenv("SEMANTIC_DIM", "128"))
+    
+    # Consolidação da memória (retenção em camadas)
+    ENABLE_MEMORY_CONSOLIDATION = os.getenv("ENABLE_MEMORY_CONSOLIDATION", "true").lower() == "true"
+    MEMORY_ARCHIVE_PATH = os.getenv("MEMORY_ARCHIVE_PATH", "./data/archive")
+    MEMORY_HOT_DAYS = int(os.getenv("MEMORY_HOT_DAYS", "30"))
+    MEMORY_SUMMARY_WEIGHT = float(os.getenv("MEMORY_SUMMARY_WEIGHT", "0.3"))
+    MEMORY_CONSOLIDATION_INTERVAL = float(os.getenv("MEMORY_CONSOLIDATION_INTERVAL", "3600"))
+    
+    # Backend de armazenamento da memória: "sqlite" (padrão) ou "log" (log segmentado)
+    MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "sqlite")
+    MEMORY_LOG_PATH = os.getenv("MEMORY_LOG_PATH", "./data/event_log")
+    MEMORY_LOG_SEGMENT_RECORDS = int(os.getenv("MEMORY_LOG_SEGMENT_RECORDS", "65536"))
+    MEMORY_LOG_SEGMENT_BYTES = int(os.getenv("MEMORY_LOG_SEGMENT_BYTES", "33554432"))  # 32MB
+    
+    # Codec do contexto dos eventos: "packed" (binário) ou "json"
+    MEMORY_CONTEXTO_CODEC = os.getenv("MEMORY_CONTEXTO_CODEC", "auto")
+    MEMORY_CODEC_AUTO_TRAIN = int(os.getenv("MEMORY_CODEC_AUTO_TRAIN", "2000"))  # 0 desliga
     
     # Sensorial
     CAMERA_INDEX = int(os.getenv("CAMERA_INDEX", "0"))
@@ -42,6 +126,8 @@ class Settings:
     
     # Sistema de Decisão
     TICK_INTERVAL = float(os.getenv("TICK_INTERVAL", "5.0"))
+    TICK_OVERRUN_POLICY = os.getenv("TICK_OVERRUN_POLICY", "skip")  # skip, catch_up ou coalesce
+    TICK_MAX_CATCH_UP = int(os.getenv("TICK_MAX_CATCH_UP", "3"))
     DECISION_THRESHOLD = float(os.getenv("DECISION_THRESHOLD", "0.5"))
     
     # Logs
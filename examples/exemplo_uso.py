@@ -140,6 +140,7 @@ async def exemplo_memoria():
     
     await memoria.store_event(evento1)
     await memoria.store_event(evento2)
+    await memoria.flush()  # grava a fila write-behind antes de consultar o banco
     
     # Recupera eventos recentes
     recentes = await memoria.get_recent_events(limit=5)
@@ -152,6 +153,8 @@ async def exemplo_memoria():
     print(f"\nMemórias emocionais: {len(emocionais)}")
     for mem in emocionais:
         print(f"  - {mem.evento} (peso: {mem.peso_emocional})")
+    
+    await memoria.close()
 
 
 async def exemplo_completo():
@@ -201,6 +204,8 @@ async def exemplo_completo():
         )
         await memoria.store_event(evento)
         print("\n3. Evento armazenado na memória")
+    
+    await memoria.close()
 
 
 async def main():
@@ -0,0 +1,84 @@
+"""
+Corretor de pedidos ao LLM entre agentes
+Vários Prime (salas, casas) apontam OLLAMA_BASE_URL para cá; o corretor
+junta pedidos iguais, limita os pedidos simultâneos no servidor de modelo
+e atende por prazo. GET /stats mostra espera e latência por agente
+Uso: python llm_broker.py --port 11500 --concurrency 2
+Depois, em cada agente: OLLAMA_BASE_URL=http://host:11500 AGENT_ID=sala python run.py
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+
+from systems.llm_backend import OllamaBackend
+from systems.llm_broker import ExpressionBroker, MERGE_MODES
+from systems.llm_server import OllamaProtocolServer
+from config.settings import settings
+
+logging.basicConfig(
+    level=getattr(logging, settings.LOG_LEVEL),
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+async def report(broker: ExpressionBroker, interval: float):
+    """Resumo periódico no log"""
+    while True:
+        await asyncio.sleep(interval)
+        stats = broker.get_stats()
+        logger.info(f"Corretor: {stats['jobs']} pedidos, {stats['merged']} juntados, "
+                    f"{stats['expired']} vencidos, fila máx. {stats['max_queue']}, "
+                    f"justiça {stats['fairness']}")
+        for agente, s in stats["agents"].items():
+            logger.info(f"  {agente}: {json.dumps(s, ensure_ascii=False)}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Corretor de pedidos ao LLM entre agentes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=settings.LLM_BROKER_PORT)
+    parser.add_argument("--upstream", default=settings.OLLAMA_BASE_URL,
+                        help="Servidor de modelo (Ollama)")
+    parser.add_argument("--model", default=settings.OLLAMA_MODEL, help="Modelo padrão")
+    parser.add_argument("--concurrency", type=int, default=settings.LLM_BROKER_CONCURRENCY,
+                        help="Pedidos simultâneos no servidor de modelo")
+    parser.add_argument("--max-per-agent", type=int, default=settings.LLM_BROKER_PER_AGENT,
+                        help="Vagas que um agente ocupa enquanto outros esperam")
+    parser.add_argument("--merge", choices=MERGE_MODES, default=settings.LLM_BROKER_MERGE)
+    parser.add_argument("--deadline", type=float, default=settings.EXPRESSION_DEADLINE,
+                        help="Prazo (s) de quem não manda X-Prime-Deadline")
+    parser.add_argument("--report-every", type=float, default=300.0,
+                        help="Resumo no log a cada N s (0 desliga)")
+    args = parser.parse_args()
+    
+    def upstream(model: str) -> OllamaBackend:
+        return OllamaBackend(model, args.upstream, keep_alive=settings.OLLAMA_KEEP_ALIVE)
+    
+    broker = ExpressionBroker(upstream(args.model), concurrency=args.concurrency,
+                              max_per_agent=args.max_per_agent, merge=args.merge,
+                              deadline=args.deadline, upstream_factory=upstream)
+    
+    def resolve(headers, model):
+        try:
+            deadline = float(headers.get("x-prime-deadline") or args.deadline)
+        except ValueError:
+            deadline = args.deadline
+        return broker.client(headers.get("x-prime-agent", "anonimo"), model=model,
+                             deadline=deadline)
+    
+    server = OllamaProtocolServer(resolve, [args.model], host=args.host, port=args.port,
+                                  version="0.0.0-broker", stats=broker.get_stats)
+    if args.report_every > 0:
+        asyncio.ensure_future(report(broker, args.report_every))
+    logger.info(f"Corretor → {args.upstream} ({args.concurrency} simultâneos, junção {args.merge})")
+    await server.serve_forever()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,53 @@
+"""
+Servidor substituto do Ollama para testes e benchmarks
+Fala o protocolo de chat do Ollama com latência e taxa de tokens
+configuráveis, sem modelo e sem GPU
+Uso: python llm_standin.py --port 11435 --first-token lognormal:300:0.4
+Depois: OLLAMA_BASE_URL=http://localhost:11435 python run.py
+"""
+
+import argparse
+import asyncio
+import logging
+
+from systems.llm_standin import StandInBackend, StandInServer
+from config.settings import settings
+
+logging.basicConfig(
+    level=getattr(logging, settings.LOG_LEVEL),
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Servidor substituto do Ollama")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--model", default=settings.OLLAMA_MODEL,
+                        help="Nome do modelo anunciado em /api/tags")
+    parser.add_argument("--first-token", default=settings.STANDIN_FIRST_TOKEN,
+                        help="Espera até o primeiro token em ms: fixed:MS, uniform:MIN:MAX, "
+                             "normal:MEDIA:DESVIO ou lognormal:MEDIANA:SIGMA")
+    parser.add_argument("--tokens-per-s", type=float, default=settings.STANDIN_TOKENS_PER_S)
+    parser.add_argument("--prompt-tokens-per-s", type=float, default=0.0,
+                        help="Avaliação do prompt (0 = instantânea)")
+    parser.add_argument("--seed", type=int, default=settings.STANDIN_SEED)
+    parser.add_argument("--load-time", default=settings.STANDIN_LOAD_TIME,
+                        help="Carga do modelo em ms (mesmo formato de --first-token)")
+    parser.add_argument("--parallel", type=int, default=0,
+                        help="Pedidos gerados ao mesmo tempo (0 = sem limite)")
+    args = parser.parse_args()
+    
+    backend = StandInBackend(model=args.model, first_token=args.first_token,
+                             tokens_per_s=args.tokens_per_s,
+                             prompt_tokens_per_s=args.prompt_tokens_per_s, seed=args.seed,
+                             parallel=args.parallel, load_time=args.load_time)
+    server = StandInServer(backend, host=args.host, port=args.port)
+    await server.serve_forever()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
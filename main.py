@@ -40,7 +40,7 @@ async def startup():
     await prime.initialize()
     
     # Inicia loop principal em background
-    prime_task = asyncio.create_task(prime.run(tick_interval=5.0))
+    prime_task = asyncio.create_task(prime.run(tick_interval=settings.TICK_INTERVAL))
     logger.info("Prime iniciado!")
 
 
@@ -98,6 +98,13 @@ async def health():
             content={"status": "unhealthy"}
         )
     
+    # Servidor do LLM no ar e modelo carregado
+    if not prime.llm_ready:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "warming_up", "llm": prime.warmer.get_stats()}
+        )
+    
     return {"status": "healthy"}
 
 
@@ -113,6 +120,9 @@ async def register_interaction(tipo: str = "normal"):
             content={"error": "Prime não está inicializado"}
         )
     
+    # Usuário interagiu: Prime para de falar (barge-in)
+    prime.expression.barge_in()
+    
     # Atualiza sistema emocional
     prime.emotional.on_interaction(tipo)
     
@@ -0,0 +1,120 @@
+"""
+Ferramenta de manutenção da memória do Prime
+Uso: python memory_admin.py <comando>
+"""
+
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+
+from systems.memory import MemorySystem
+from config.settings import settings
+
+logging.basicConfig(
+    level=getattr(logging, settings.LOG_LEVEL),
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+async def rebuild_patterns(memory: MemorySystem, args):
+    """Recalcula os agregados de padrões a partir do histórico"""
+    await memory.rebuild_patterns()
+    logger.info("Agregados de padrões reconstruídos")
+
+
+async def migrate(memory: MemorySystem, args):
+    """Aplica migrações pendentes (executadas em initialize) e mostra a versão"""
+    version = await memory.get_schema_version()
+    logger.info(f"Schema da memória na versão {version}")
+
+
+async def consolidate(memory: MemorySystem, args):
+    """Arquiva eventos antigos, gera resumos e roda VACUUM incremental"""
+    resultado = await memory.consolidate()
+    logger.info(f"Consolidação: {resultado['archived']} arquivados, "
+                f"{resultado['summarized']} resumidos")
+
+
+async def vacuum(memory: MemorySystem, args):
+    """VACUUM completo (converte bancos antigos para VACUUM incremental)"""
+    await memory.vacuum()
+    logger.info("VACUUM concluído")
+
+
+async def export(memory: MemorySystem, args):
+    """Exporta a memória em NDJSON (streaming)"""
+    since = datetime.fromisoformat(args.since) if args.since else None
+    until = datetime.fromisoformat(args.until) if args.until else None
+    total = await memory.export_ndjson(args.file, tipo=args.tipo, since=since, until=until)
+    logger.info(f"{total} eventos exportados para {args.file}")
+
+
+async def import_(memory: MemorySystem, args):
+    """Importa um NDJSON exportado"""
+    total = await memory.import_ndjson(args.file, keep_ids=args.keep_ids)
+    logger.info(f"{total} eventos importados de {args.file}")
+
+
+async def train_codec(memory: MemorySystem, args):
+    """Treina um dicionário novo do codec de contexto com os eventos recentes"""
+    dictionary = await memory.train_codec(args.samples)
+    if dictionary is None:
+        logger.info("Sem eventos para treinar o codec")
+        return
+    stats = dictionary.get_stats()
+    logger.info(f"Dicionário {stats['id']} do codec: {stats['strings']} textos, "
+                f"{stats['templates']} modelos")
+
+
+COMMANDS = {
+    "export": export,
+    "import": import_,
+    "consolidate": consolidate,
+    "vacuum": vacuum,
+    "migrate": migrate,
+    "rebuild-patterns": rebuild_patterns,
+    "train-codec": train_codec,
+}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Manutenção da memória do Prime")
+    parser.add_argument("--db", default=settings.DATABASE_PATH, help="Caminho do banco")
+    parser.add_argument("--backend", default=settings.MEMORY_BACKEND, choices=["sqlite", "log"],
+                        help="Backend de armazenamento da memória")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    parser.add_argument("--file", default="./data/memory.ndjson",
+                        help="Arquivo NDJSON (export/import)")
+    parser.add_argument("--tipo", help="Filtra por tipo (export)")
+    parser.add_argument("--since", help="Data/hora ISO inicial (export)")
+    parser.add_argument("--until", help="Data/hora ISO final (export)")
+    parser.add_argument("--keep-ids", action="store_true",
+                        help="Mantém os ids do arquivo e ignora os já existentes (import)")
+    parser.add_argument("--samples", type=int, default=5000,
+                        help="Eventos recentes usados no treino (train-codec)")
+    args = parser.parse_args()
+    
+    memory = MemorySystem(
+        args.db,
+        archive_path=settings.MEMORY_ARCHIVE_PATH,
+        hot_days=settings.MEMORY_HOT_DAYS,
+        summary_weight=settings.MEMORY_SUMMARY_WEIGHT,
+        backend=args.backend,
+        log_path=settings.MEMORY_LOG_PATH,
+        log_segment_records=settings.MEMORY_LOG_SEGMENT_RECORDS,
+        log_segment_bytes=settings.MEMORY_LOG_SEGMENT_BYTES,
+        contexto_codec=settings.MEMORY_CONTEXTO_CODEC
+    )
+    await memory.initialize()
+    try:
+        await COMMANDS[args.command](memory, args)
+    except NotImplementedError as e:
+        logger.error(str(e))
+    finally:
+        await memory.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
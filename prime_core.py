@@ -5,7 +5,7 @@ Conecta todos os 7 sistemas e executa o loop principal
 
 import asyncio
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional
 
 from systems.situational_awareness import SituationalAwareness
@@ -15,6 +15,15 @@ from systems.memory import MemorySystem, MemoryEvent
 from systems.sensory import SensorySystem
 from systems.decision import DecisionSystem, DecisionType
 from systems.expression import ExpressionSystem
+from systems.speculative import SpeculativeGenerator
+from systems.audio_cache import AudioCache
+from systems.response_bank import ResponseBank
+from systems.llm_backend import OllamaBackend
+from systems.llm_standin import StandInBackend
+from systems.llm_resilience import ResilientBackend
+from systems.llm_broker import ExpressionBroker
+from systems.llm_warmup import ActivityForecast, ModelWarmer
+from systems.tick_scheduler import TickScheduler
 from config.settings import settings
 
 logging.basicConfig(
@@ -28,9 +37,14 @@ class PrimeCore:
     """
     Núcleo do agente Prime
     Orquestra todos os sistemas
+    llm_broker: corretor compartilhado com outros agentes no mesmo processo
+    (agent_id identifica este; padrão settings.AGENT_ID)
     """
     
-    def __init__(self):
+    def __init__(self, llm_broker: Optional[ExpressionBroker] = None,
+                 agent_id: Optional[str] = None):
+        self.agent_id = agent_id or settings.AGENT_ID
+        
         # Inicializa todos os sistemas
         logger.info("Inicializando sistemas do Prime...")
         
@@ -51,7 +65,34 @@ class PrimeCore:
         self.personality = PersonalitySystem(traits)
         
         # 4. Memória
-        self.memory = MemorySystem(settings.DATABASE_PATH)
+        self.memory = MemorySystem(
+            settings.DATABASE_PATH,
+            reader_pool_size=settings.DB_READER_POOL_SIZE,
+            cache_size_kb=settings.DB_CACHE_SIZE_KB,
+            mmap_size=settings.DB_MMAP_SIZE,
+            write_batch_size=settings.MEMORY_WRITE_BATCH_SIZE,
+            write_flush_interval=settings.MEMORY_WRITE_FLUSH_INTERVAL,
+            write_queue_size=settings.MEMORY_WRITE_QUEUE_SIZE,
+            short_term_size=settings.MEMORY_SHORT_TERM_SIZE,
+            coalesce_window=settings.MEMORY_COALESCE_WINDOW,
+            semantic_index_path=(
+                settings.SEMANTIC_INDEX_PATH if settings.ENABLE_SEMANTIC_MEMORY else None
+            ),
+            semantic_dim=settings.SEMANTIC_DIM,
+            archive_path=settings.MEMORY_ARCHIVE_PATH,
+            hot_days=settings.MEMORY_HOT_DAYS,
+            summary_weight=settings.MEMORY_SUMMARY_WEIGHT,
+            consolidation_interval=(
+                settings.MEMORY_CONSOLIDATION_INTERVAL
+                if settings.ENABLE_MEMORY_CONSOLIDATION else None
+            ),
+            backend=settings.MEMORY_BACKEND,
+            log_path=settings.MEMORY_LOG_PATH,
+            log_segment_records=settings.MEMORY_LOG_SEGMENT_RECORDS,
+            log_segment_bytes=settings.MEMORY_LOG_SEGMENT_BYTES,
+            contexto_codec=settings.MEMORY_CONTEXTO_CODEC,
+            codec_auto_train=settings.MEMORY_CODEC_AUTO_TRAIN
+        )
         
         # 5. Sensorial
         self.sensory = SensorySystem(
@@ -64,25 +105,144 @@ class PrimeCore:
         self.decision = DecisionSystem()
         
         # 7. Expressão
+        audio_cache = None
+        if settings.ENABLE_AUDIO_CACHE:
+            audio_cache = AudioCache(
+                settings.AUDIO_CACHE_PATH,
+                max_bytes=settings.AUDIO_CACHE_MAX_MB * 1024 * 1024,
+                min_repeats=settings.AUDIO_CACHE_MIN_REPEATS
+            )
+        # Quem fala com o Ollama se identifica (o corretor entre agentes usa)
+        headers = {"X-Prime-Agent": self.agent_id,
+                   "X-Prime-Deadline": str(settings.EXPRESSION_DEADLINE)}
+        if llm_broker is not None:
+            llm = llm_broker.client(self.agent_id, deadline=settings.EXPRESSION_DEADLINE)
+        elif settings.LLM_BACKEND == "standin":
+            llm = StandInBackend(
+                model=settings.OLLAMA_MODEL,
+                first_token=settings.STANDIN_FIRST_TOKEN,
+                tokens_per_s=settings.STANDIN_TOKENS_PER_S,
+                seed=settings.STANDIN_SEED,
+                load_time=settings.STANDIN_LOAD_TIME,
+                keep_alive=settings.OLLAMA_KEEP_ALIVE
+            )
+        elif settings.LLM_BACKEND == "ollama":
+            llm = OllamaBackend(
+                settings.OLLAMA_MODEL,
+                settings.OLLAMA_BASE_URL,
+                keep_alive=settings.OLLAMA_KEEP_ALIVE,
+                headers=headers
+            )
+        else:
+            raise ValueError(f"Backend de LLM desconhecido: {settings.LLM_BACKEND}")
+        llm_direto = llm  # Aquecimento sem SLO: carregar o modelo demora
+        if settings.ENABLE_LLM_RESILIENCE:
+            hedge = None
+            if settings.LLM_HEDGE_MODEL and llm_broker is not None:
+                hedge = llm_broker.client(self.agent_id, model=settings.LLM_HEDGE_MODEL,
+                                          deadline=settings.EXPRESSION_DEADLINE)
+            elif settings.LLM_HEDGE_MODEL:
+                hedge = OllamaBackend(
+                    settings.LLM_HEDGE_MODEL,
+                    settings.OLLAMA_BASE_URL,
+                    keep_alive=settings.OLLAMA_KEEP_ALIVE,
+                    headers=headers
+                )
+            llm = ResilientBackend(
+                llm,
+                slo=settings.LLM_SLO,
+                hedge=hedge,
+                hedge_after=settings.LLM_HEDGE_AFTER or None,
+                hedge_max_tokens=None if hedge else settings.LLM_HEDGE_MAX_TOKENS,
+                failure_threshold=settings.LLM_BREAKER_FAILURES,
+                reset_timeout=settings.LLM_BREAKER_RESET
+            )
+        
+        response_bank = None
+        if settings.ENABLE_RESPONSE_BANK:
+            response_bank = ResponseBank(settings.RESPONSE_BANK_PATH)
+            if not response_bank.open():
+                logger.info("Sem banco de respostas (gere com build_response_bank.py)")
+                response_bank = None
         self.expression = ExpressionSystem(
-            model=settings.OLLAMA_MODEL,
-            base_url=settings.OLLAMA_BASE_URL
+            llm=llm,
+            deadline=settings.EXPRESSION_DEADLINE,
+            tts_queue_size=settings.TTS_QUEUE_SIZE,
+            tts_max_age=settings.TTS_MAX_AGE,
+            audio_cache=audio_cache,
+            response_bank=response_bank,
+            bank_primary=settings.EXPRESSION_MODE == "bank"
         )
         
+        # Aquecimento do modelo e keep_alive pela atividade prevista (no modo
+        # bank o LLM não está no caminho da fala e não há o que aquecer)
+        self.warmer: Optional[ModelWarmer] = None
+        if settings.ENABLE_LLM_WARMUP and settings.EXPRESSION_MODE != "bank":
+            self.warmer = ModelWarmer(
+                self.expression,
+                llm_direto,
+                active_keep_alive=settings.OLLAMA_KEEP_ALIVE,
+                idle_keep_alive=settings.OLLAMA_KEEP_ALIVE_IDLE,
+                timeout=settings.LLM_WARMUP_TIMEOUT,
+                recheck=settings.LLM_READY_RECHECK,
+                forecast=ActivityForecast()
+            )
+        self._warmup_task: Optional[asyncio.Task] = None
+        
+        # Pré-geração especulativa das falas
+        self.speculative: Optional[SpeculativeGenerator] = None
+        if settings.ENABLE_SPECULATIVE:
+            self.speculative = SpeculativeGenerator(
+                self.expression,
+                DecisionSystem.MOTIVOS[DecisionType.FALAR],
+                max_entries=settings.SPECULATIVE_CACHE_SIZE,
+                ttl=settings.SPECULATIVE_TTL,
+                margin=settings.SPECULATIVE_MARGIN
+            )
+        
         # Estado interno
         self.is_running = False
         self.last_decision: Optional[dict] = None
         self.tick_count = 0
+        self.scheduler: Optional[TickScheduler] = None
+        self._speech_tasks: set = set()  # Falas em andamento (LLM + registro)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._initialized = False
     
     async def initialize(self):
-        """Inicializa sistemas assíncronos"""
+        """Inicializa sistemas assíncronos (uma vez; run() chama se ninguém chamou)"""
+        if self._initialized:
+            return
+        self._initialized = True
         logger.info("Inicializando sistemas assíncronos...")
+        self._loop = asyncio.get_running_loop()
         await self.memory.initialize()
+        if self.warmer is not None and self._warmup_task is None:
+            # Em segundo plano: /health fica em "warming_up" até o modelo responder
+            self._warmup_task = asyncio.create_task(self._run_warmer())
         logger.info("Sistemas inicializados!")
     
+    async def _run_warmer(self):
+        """Previsão de atividade a partir da memória, depois o aquecimento contínuo"""
+        # Horas em que o usuário costuma interagir (últimas 2 semanas)
+        async for evento in self.memory.iter_events(
+            tipo="interacao", since=datetime.now() - timedelta(days=14)
+        ):
+            self.warmer.forecast.add(evento.timestamp, evento.count)
+        self.warmer.observe(
+            self.situational.get_state_dict().get("usuario_presente", False),
+            self.personality.get_traits_dict(),
+            self.emotional.get_state_dict(),
+            self.situational.get_state_dict()
+        )
+        await self.warmer.run()
+    
     def _on_presence_detected(self, presente: bool, estado: str):
         """Callback quando detecta presença"""
         self.situational.update_presence(presente)
+        if not presente and self._loop is not None:
+            # Chamado da thread sensorial: o barge-in roda no loop de eventos
+            self._loop.call_soon_threadsafe(self._on_user_left)
         if estado != "desconhecido":
             self.situational.update_user_state(estado)
         
@@ -93,6 +253,11 @@ class PrimeCore:
         
         logger.info(f"Presença detectada: {presente}, Estado: {estado}")
     
+    def _on_user_left(self):
+        """Usuário saiu: não há para quem falar (barge-in)"""
+        if self.expression.barge_in():
+            logger.info("Usuário saiu: fala interrompida")
+    
     async def tick(self):
         """
         Ciclo principal de execução
@@ -108,6 +273,14 @@ class PrimeCore:
         self.emotional.tick(situacional_state)
         emocional_state = self.emotional.get_state_dict()
         
+        if self.warmer is not None:
+            self.warmer.observe(
+                situacional_state.get("usuario_presente", False),
+                self.personality.get_traits_dict(),
+                emocional_state,
+                situacional_state
+            )
+        
         # 3. Obtém memória recente
         memoria_recente = await self.memory.get_recent_events(limit=5)
         
@@ -116,11 +289,21 @@ class PrimeCore:
             emocional=emocional_state,
             situacional=situacional_state,
             personalidade=self.personality.get_traits_dict(),
-            memoria_recente=[m for m in memoria_recente]
+            memoria_recente=memoria_recente
         )
         
         self.last_decision = decisao.to_dict()
         
+        # Sem falar agora, mas perto disso: adianta a próxima fala
+        if self.speculative is not None:
+            self.speculative.observe(
+                self.last_decision,
+                personalidade=self.personality.get_traits_dict(),
+                emocional=emocional_state,
+                situacional=situacional_state,
+                memoria_recente=memoria_recente
+            )
+        
         # 5. Executa decisão
         await self._execute_decision(decisao, emocional_state, situacional_state, memoria_recente)
         
@@ -132,7 +315,13 @@ class PrimeCore:
                                 memoria_recente: list):
         """Executa a decisão tomada"""
         if decisao.tipo == DecisionType.FALAR:
-            await self._execute_falar(decisao, emocional, situacional, memoria_recente)
+            # Em segundo plano: os ticks e a API seguem enquanto o LLM pensa;
+            # um FALAR mais novo cancela a geração do anterior
+            task = asyncio.create_task(
+                self._execute_falar(decisao, emocional, situacional, memoria_recente)
+            )
+            self._speech_tasks.add(task)
+            task.add_done_callback(self._speech_tasks.discard)
         elif decisao.tipo == DecisionType.SILENCIO:
             await self._execute_silenciar()
         elif decisao.tipo == DecisionType.OBSERVAR:
@@ -145,20 +334,34 @@ class PrimeCore:
                             memoria_recente: list):
         """Executa decisão de falar"""
         # Gera resposta usando sistema de expressão
-        resposta = self.expression.generate_response(
+        pedido = dict(
             decisao=decisao.to_dict(),
             personalidade=self.personality.get_traits_dict(),
             emocional=emocional,
             situacional=situacional,
             memoria_recente=memoria_recente
         )
+        candidata = None
+        if self.speculative is not None:
+            candidata = await self.speculative.take(
+                pedido["decisao"], pedido["personalidade"], emocional, situacional,
+                deadline=settings.EXPRESSION_DEADLINE
+            )
+        if candidata:
+            # Já gerada nos ticks anteriores: fala direto
+            resposta = await self.expression.speak_prepared(candidata)
+        elif settings.EXPRESSION_STREAMING:
+            # Fala frase a frase enquanto o LLM ainda gera
+            resposta = await self.expression.speak_response_stream(**pedido)
+        else:
+            resposta = await self.expression.generate_response_async(**pedido)
+            if resposta:
+                # Fala usando TTS
+                self.expression.speak(resposta, async_mode=True)
         
         if resposta:
             logger.info(f"Prime fala: {resposta}")
             
-            # Fala usando TTS
-            self.expression.speak(resposta, async_mode=True)
-            
             # Marca interação
             self.situational.mark_interaction(True)
             
@@ -192,11 +395,18 @@ class PrimeCore:
         logger.debug("Prime está observando")
         # Apenas observa - não faz nada além de atualizar estados
     
-    async def run(self, tick_interval: float = 5.0):
+    async def run(self, tick_interval: Optional[float] = None):
         """
         Loop principal de execução
-        tick_interval: segundos entre cada tick
+        tick_interval: segundos entre o início de um tick e o do próximo
+        (padrão settings.TICK_INTERVAL)
         """
+        tick_interval = tick_interval or settings.TICK_INTERVAL
+        self.scheduler = TickScheduler(
+            tick_interval,
+            policy=settings.TICK_OVERRUN_POLICY,
+            max_catch_up=settings.TICK_MAX_CATCH_UP
+        )
         logger.info("Iniciando Prime Core...")
         await self.initialize()
         
@@ -204,12 +414,11 @@ class PrimeCore:
         self.sensory.start()
         
         self.is_running = True
-        logger.info(f"Prime está vivo! Tick a cada {tick_interval}s")
+        logger.info(f"Prime está vivo! Tick a cada {tick_interval}s "
+                    f"(atraso: {settings.TICK_OVERRUN_POLICY})")
         
         try:
-            while self.is_running:
-                await self.tick()
-                await asyncio.sleep(tick_interval)
+            await self.scheduler.run(self.tick, lambda: self.is_running)
         except KeyboardInterrupt:
             logger.info("Interrompido pelo usuário")
         except Exception as e:
@@ -221,17 +430,45 @@ class PrimeCore:
         """Encerra sistemas"""
         logger.info("Encerrando Prime...")
         self.is_running = False
+        self._initialized = False
         self.sensory.stop()
+        if self.speculative is not None:
+            await self.speculative.close()
+        if self._warmup_task is not None:
+            self._warmup_task.cancel()
+            await asyncio.gather(self._warmup_task, return_exceptions=True)
+            self._warmup_task = None
+        # Falas em andamento saem antes do TTS e do banco que elas usam
+        for task in list(self._speech_tasks):
+            task.cancel()
+        if self._speech_tasks:
+            await asyncio.gather(*self._speech_tasks, return_exceptions=True)
+        # Tarefas do loop são canceladas no loop; tts.stop() espera a thread
+        # do worker (até 2 s), então vai para fora dele
+        self.expression.cancel_pending()
+        await asyncio.to_thread(self.expression.close_resources)
+        await self.memory.close()
         logger.info("Prime encerrado.")
     
+    @property
+    def llm_ready(self) -> bool:
+        """Servidor e modelo do LLM prontos (sempre, sem aquecimento ou no modo bank)"""
+        return self.warmer is None or self.warmer.ready
+    
     def get_status(self) -> dict:
         """Retorna status atual de todos os sistemas"""
         return {
             "running": self.is_running,
+            "agent_id": self.agent_id,
             "tick_count": self.tick_count,
             "situational": self.situational.get_state_dict(),
             "emotional": self.emotional.get_state_dict(),
             "personality": self.personality.get_traits_dict(),
             "last_decision": self.last_decision,
-            "sensory": self.sensory.get_current_state()
+            "sensory": self.sensory.get_current_state(),
+            "memory": self.memory.get_stats(),
+            "expression": self.expression.get_stats(),
+            "speculative": self.speculative.get_stats() if self.speculative else None,
+            "warmup": self.warmer.get_stats() if self.warmer else None,
+            "scheduler": self.scheduler.get_stats() if self.scheduler else None
         }
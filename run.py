@@ -24,7 +24,7 @@ async def main():
     prime = PrimeCore()
     
     try:
-        await prime.run(tick_interval=5.0)
+        await prime.run(tick_interval=settings.TICK_INTERVAL)
     except KeyboardInterrupt:
         logger.info("\nInterrompido pelo usuário")
     except Exception as e:
@@ -0,0 +1,210 @@
+"""
+Cache de áudio das falas recorrentes
+Falas curtas e repetidas (as respostas mínimas, por exemplo) são
+renderizadas uma vez em WAV e tocadas direto do disco, sem passar de novo
+pela síntese. Chave: hash de (voz, velocidade, texto) — trocar a voz ou a
+velocidade gera arquivos novos e os antigos saem por LRU
+"""
+
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import wave
+
+logger = logging.getLogger(__name__)
+
+# WAV vazio (só cabeçalho) não serve
+_MIN_WAV_BYTES = 64
+
+
+class WavPlayer:
+    """
+    Toca um WAV e pode ser interrompido
+    Windows: winsound (biblioteca padrão); Linux/Mac: aplay, paplay ou afplay
+    """
+    
+    _COMMANDS = (["aplay", "-q"], ["paplay"], ["afplay"])
+    
+    def __init__(self):
+        self._command: Optional[List[str]] = None
+        self._winsound = None
+        if sys.platform == "win32":
+            import winsound
+            self._winsound = winsound
+        else:
+            for command in self._COMMANDS:
+                if shutil.which(command[0]):
+                    self._command = command
+                    break
+    
+    @property
+    def available(self) -> bool:
+        return self._winsound is not None or self._command is not None
+    
+    def play(self, path: str, cancel: threading.Event) -> bool:
+        """Toca até o fim (True) ou até `cancel` (False)"""
+        if self._winsound is not None:
+            return self._play_winsound(path, cancel)
+        process = subprocess.Popen(self._command + [path], stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.DEVNULL)
+        while process.poll() is None:
+            if cancel.wait(0.02):
+                process.terminate()
+                process.wait()
+                return False
+        if process.returncode != 0:
+            raise RuntimeError(f"{self._command[0]} saiu com código {process.returncode}")
+        return True
+    
+    def _play_winsound(self, path: str, cancel: threading.Event) -> bool:
+        winsound = self._winsound
+        with wave.open(path, "rb") as wav:
+            duration = wav.getnframes() / float(wav.getframerate())
+        winsound.PlaySound(path, winsound.SND_FILENAME | winsound.SND_ASYNC)
+        if cancel.wait(duration):
+            winsound.PlaySound(None, winsound.SND_PURGE)
+            return False
+        return True
+
+
+class AudioCache:
+    """
+    Arquivos WAV endereçados pelo conteúdo, com limite de tamanho (LRU)
+    A ordem de uso sobrevive a reinícios pelo mtime dos arquivos
+    Acesso só pela thread do worker de TTS (não há trava)
+    """
+    
+    # Só falas curtas entram no cache
+    MAX_TEXT = 120
+    
+    def __init__(self, path: str, max_bytes: int = 64 * 1024 * 1024, min_repeats: int = 3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.min_repeats = max(1, min_repeats)  # Falas ditas mais vezes que isso são renderizadas
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # chave -> bytes (LRU primeiro)
+        self._counts: "OrderedDict[str, int]" = OrderedDict()
+        self._pinned: set = set()
+        self.bytes = 0
+        
+        # Métricas
+        self.hits = 0
+        self.misses = 0
+        self.renders = 0
+        self.evictions = 0
+    
+    def open(self):
+        """Cria o diretório e reconstrói o índice a partir dos arquivos"""
+        os.makedirs(self.path, exist_ok=True)
+        arquivos = []
+        for nome in os.listdir(self.path):
+            caminho = os.path.join(self.path, nome)
+            if nome.endswith(".tmp.wav"):
+                os.remove(caminho)  # Renderização interrompida
+                continue
+            if not nome.endswith(".wav"):
+                continue
+            stat = os.stat(caminho)
+            arquivos.append((stat.st_mtime, nome[:-4], stat.st_size))
+        self._entries.clear()
+        self.bytes = 0
+        for _, key, size in sorted(arquivos):
+            self._entries[key] = size
+            self.bytes += size
+        self._evict()
+    
+    @staticmethod
+    def key(text: str, voice: str, rate) -> str:
+        return hashlib.sha1(f"{voice}\0{rate}\0{text}".encode("utf-8")).hexdigest()
+    
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, key + ".wav")
+    
+    def lookup(self, text: str, voice: str, rate) -> Optional[str]:
+        """Caminho do WAV da fala, se estiver no cache (marca como usado)"""
+        key = self.key(text, voice, rate)
+        if key not in self._entries:
+            self.misses += 1
+            return None
+        caminho = self._file(key)
+        if not os.path.exists(caminho):
+            self.bytes -= self._entries.pop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        try:
+            os.utime(caminho)
+        except OSError:
+            pass
+        self.hits += 1
+        return caminho
+    
+    def pin(self, texts: Iterable[str]):
+        """Falas renderizadas já na inicialização, qualquer que seja a contagem"""
+        self._pinned.update(text for text in texts if text and len(text) <= self.MAX_TEXT)
+    
+    def wants(self, text: str, voice: str, rate) -> bool:
+        """Conta uma fala sintetizada; True se ela deve ser renderizada agora"""
+        if not text or len(text) > self.MAX_TEXT:
+            return False
+        if self.key(text, voice, rate) in self._entries:
+            return False
+        if text in self._pinned:
+            return True
+        count = self._counts.pop(text, 0) + 1
+        self._counts[text] = count
+        if len(self._counts) > 4096:
+            self._counts.popitem(last=False)
+        return count > self.min_repeats
+    
+    def pending(self, voice: str, rate) -> List[str]:
+        """Falas fixadas que ainda não estão no cache"""
+        return [text for text in self._pinned
+                if self.key(text, voice, rate) not in self._entries]
+    
+    def temp_path(self, text: str, voice: str, rate) -> str:
+        """Arquivo temporário para a renderização (depois vai para add)"""
+        return os.path.join(self.path, self.key(text, voice, rate) + ".tmp.wav")
+    
+    def add(self, text: str, voice: str, rate, temp_path: str) -> Optional[str]:
+        """Move o WAV renderizado para o cache; descarta se estiver vazio"""
+        key = self.key(text, voice, rate)
+        if not os.path.exists(temp_path) or os.path.getsize(temp_path) < _MIN_WAV_BYTES:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return None
+        caminho = self._file(key)
+        os.replace(temp_path, caminho)
+        size = os.path.getsize(caminho)
+        self.bytes += size - self._entries.pop(key, 0)
+        self._entries[key] = size
+        self._counts.pop(text, None)
+        self.renders += 1
+        self._evict()
+        return caminho if key in self._entries else None
+    
+    def _evict(self):
+        while self.bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._file(key))
+            except OSError:
+                pass
+    
+    def get_stats(self) -> Dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "renders": self.renders,
+            "evictions": self.evictions
+        }
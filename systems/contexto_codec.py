@@ -0,0 +1,582 @@
+"""
+Codecs do contexto dos eventos de memória
+- json (tag 0): texto JSON, o formato original; linhas antigas continuam legíveis
+- packed (tag 1): binário compacto com tipos marcados, varints, decimais
+  escalados e datas ISO em BCD
+Um dicionário treinado com contextos típicos torna o packed bem menor:
+textos frequentes (chaves, motivos) viram referências e formatos recorrentes
+viram modelos de layout fixo, gravados só com os valores (struct)
+A tag fica ao lado do contexto na linha; o id do dicionário vai no início
+do payload, então dicionários novos não invalidam linhas antigas
+"""
+
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+import json
+import math
+import struct
+
+CODEC_JSON = 0
+CODEC_PACKED = 1
+
+# Marcadores de tipo do formato genérico
+(_NONE, _FALSE, _TRUE, _INT, _FLOAT, _DECIMAL, _STR, _REF, _LIST, _DICT,
+ _DATETIME) = range(11)
+
+# Decimais com até 3 casas (os estados emocionais são arredondados assim)
+DECIMAL_SCALE = 1000
+
+_FLOAT64 = struct.Struct("<d")
+_ISO_SIZE = 10
+
+# Campo de modelo → formato struct ("n" não ocupa bytes; "S" guarda o tamanho
+# e o texto vai no fim do payload; "t" = data ISO em BCD)
+_KIND_FORMATS = {"d": "i", "f": "d", "q": "q", "b": "?", "s": "H", "S": "I", "t": "10s", "n": "0s"}
+_KIND_TYPES = {"f": float, "q": int, "b": bool}
+
+_INT64_MIN = -(2 ** 63)
+_INT64_MAX = 2 ** 63 - 1
+
+
+def _write_varint(out: bytearray, n: int):
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_varint(buf, pos: int) -> Tuple[int, int]:
+    n = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+def _zigzag(n: int) -> int:
+    return n * 2 if n >= 0 else -n * 2 - 1
+
+
+def _unzigzag(n: int) -> int:
+    return -(n >> 1) - 1 if n & 1 else n >> 1
+
+
+def _decimal(value: float) -> Optional[int]:
+    """Inteiro escalado se o float volta idêntico de n / DECIMAL_SCALE"""
+    if not math.isfinite(value):
+        return None
+    n = round(value * DECIMAL_SCALE)
+    if n / DECIMAL_SCALE != value or (n == 0 and math.copysign(1.0, value) < 0):
+        return None
+    return n
+
+
+def _iso_pack(texto: str) -> Optional[bytes]:
+    """
+    Data/hora ISO sem fuso (AAAA-MM-DDTHH:MM:SS[.ffffff]) → 10 bytes BCD
+    Só reagrupa os dígitos (sem fração = nibbles "f"): a volta é exata
+    """
+    n = len(texto)
+    if ((n != 19 and n != 26) or texto[10] != "T" or texto[4] != "-" or texto[7] != "-"
+            or texto[13] != ":" or texto[16] != ":" or (n == 26 and texto[19] != ".")
+            or not texto.isascii()):
+        return None
+    digitos = texto.replace("-", "").replace(":", "").replace("T", "").replace(".", "")
+    # Separador fora do lugar encurta os dígitos
+    if len(digitos) != (20 if n == 26 else 14) or not digitos.isdigit():
+        return None
+    return bytes.fromhex(digitos if n == 26 else digitos + "ffffff")
+
+
+def _iso_unpack(bcd: bytes) -> str:
+    h = bcd.hex()
+    texto = f"{h[0:4]}-{h[4:6]}-{h[6:8]}T{h[8:10]}:{h[10:12]}:{h[12:14]}"
+    return texto if h[14] == "f" else f"{texto}.{h[14:]}"
+
+
+def _json_key(key) -> str:
+    """Chaves não textuais viram texto como no json.dumps"""
+    if isinstance(key, str):
+        return str.__str__(key)
+    if key is None or isinstance(key, (int, float)):
+        return json.dumps(key)
+    raise TypeError(f"Chave de contexto inválida: {type(key).__name__}")
+
+
+def _flatten(value: Dict, values: list) -> Optional[tuple]:
+    """
+    Estrutura de chaves (aninhada) de um dict; os valores não-dict vão para
+    `values`. None se alguma chave não é str (não vira modelo)
+    """
+    keys = []
+    for key, item in value.items():
+        if type(key) is not str:
+            return None
+        if type(item) is dict:
+            sub = _flatten(item, values)
+            if sub is None:
+                return None
+            keys.append((key, sub))
+        else:
+            keys.append(key)
+            values.append(item)
+    return tuple(keys)
+
+
+def _kind(value, strings: Dict[str, int]) -> str:
+    """Tipo de campo de modelo de um valor ("x" = não cabe em modelo)"""
+    if value is None:
+        return "n"
+    if type(value) is bool:
+        return "b"
+    if type(value) is int:
+        return "q" if _INT64_MIN <= value <= _INT64_MAX else "x"
+    if type(value) is float:
+        return "d" if _decimal(value) is not None and abs(value) < 2 ** 31 / DECIMAL_SCALE else "f"
+    if type(value) is str:
+        if _iso_pack(value) is not None:
+            return "t"
+        return "s" if value in strings else "S"
+    return "x"
+
+
+class _Template:
+    """
+    Modelo de layout fixo: estrutura de chaves + tipo de cada valor
+    Os valores vão num struct.Struct montado uma vez por modelo; campos "S"
+    guardam o tamanho no struct e o texto no fim do payload
+    encode devolve None quando o contexto não cabe no modelo
+    """
+    
+    __slots__ = ("id", "keys", "kinds", "header", "_shape", "_struct", "_strings", "_string_ids")
+    
+    def __init__(self, id: int, keys: tuple, kinds: str, header: bytes,
+                 strings: List[str], string_ids: Dict[str, int]):
+        self.id = id
+        self.keys = keys
+        self.kinds = kinds
+        self.header = header
+        self._shape = _shape(keys)
+        self._struct = struct.Struct("<" + "".join(_KIND_FORMATS[kind] for kind in kinds))
+        self._strings = strings
+        self._string_ids = string_ids
+    
+    def encode(self, contexto: Dict) -> Optional[bytes]:
+        values: list = []
+        if not _match(contexto, self._shape, values):
+            return None
+        campos = []
+        textos = []
+        for kind, value in zip(self.kinds, values):
+            if kind == "d":
+                n = _decimal(value) if type(value) is float else None
+                if n is None:
+                    return None
+                campos.append(n)
+            elif kind == "s":
+                n = self._string_ids.get(value) if type(value) is str else None
+                if n is None:
+                    return None
+                campos.append(n)
+            elif kind == "t":
+                bcd = _iso_pack(value) if type(value) is str else None
+                if bcd is None:
+                    return None
+                campos.append(bcd)
+            elif kind == "S":
+                if type(value) is not str:
+                    return None
+                texto = value.encode("utf-8")
+                campos.append(len(texto))
+                textos.append(texto)
+            elif kind == "n":
+                if value is not None:
+                    return None
+                campos.append(b"")
+            else:
+                if type(value) is not _KIND_TYPES[kind]:
+                    return None
+                campos.append(value)
+        return self._struct.pack(*campos) + b"".join(textos)
+    
+    def decode(self, raw: bytes, pos: int) -> Dict:
+        campos = self._struct.unpack_from(raw, pos)
+        pos += self._struct.size
+        valores = []
+        for kind, campo in zip(self.kinds, campos):
+            if kind == "d":
+                valores.append(campo / DECIMAL_SCALE)
+            elif kind == "s":
+                valores.append(self._strings[campo])
+            elif kind == "t":
+                valores.append(_iso_unpack(campo))
+            elif kind == "S":
+                valores.append(raw[pos:pos + campo].decode("utf-8"))
+                pos += campo
+            elif kind == "n":
+                valores.append(None)
+            else:
+                valores.append(campo)
+        return _build(self.keys, iter(valores))
+
+
+def _shape(keys: tuple) -> tuple:
+    """Estrutura de chaves → (nomes do nível, forma de cada dict aninhado ou None)"""
+    return (tuple(key[0] if type(key) is tuple else key for key in keys),
+            tuple(_shape(key[1]) if type(key) is tuple else None for key in keys))
+
+
+def _match(value, shape: tuple, values: list) -> bool:
+    """value tem exatamente as chaves do modelo, na mesma ordem; folhas vão para `values`"""
+    nomes, aninhados = shape
+    if type(value) is not dict or tuple(value) != nomes:
+        return False
+    for item, sub in zip(value.values(), aninhados):
+        if sub is None:
+            values.append(item)
+        elif not _match(item, sub, values):
+            return False
+    return True
+
+
+def _build(keys: tuple, valores) -> Dict:
+    """Contexto com a estrutura do modelo, consumindo os valores na ordem"""
+    out = {}
+    for key in keys:
+        if type(key) is tuple:
+            out[key[0]] = _build(key[1], valores)
+        else:
+            out[key] = next(valores)
+    return out
+
+
+def _top_keys(keys: tuple) -> list:
+    return [key[0] if type(key) is tuple else key for key in keys]
+
+
+def _keys_to_json(keys: tuple) -> list:
+    return [[key[0], _keys_to_json(key[1])] if type(key) is tuple else key for key in keys]
+
+
+def _keys_from_json(keys: list) -> tuple:
+    return tuple((key[0], _keys_from_json(key[1])) if isinstance(key, list) else key
+                 for key in keys)
+
+
+class CodecDictionary:
+    """
+    Dicionário treinado do codec packed: tabela de textos frequentes e
+    modelos dos formatos de contexto recorrentes
+    Imutável depois de gravado; linhas guardam o id do dicionário usado
+    """
+    
+    def __init__(self, id: int, strings: List[str], templates: List[Tuple[tuple, str]]):
+        self.id = id
+        self.strings = list(strings)
+        self.string_ids = {texto: i for i, texto in enumerate(self.strings)}
+        self.templates: List[_Template] = []
+        # Modelos por chaves do primeiro nível (o encode confere os níveis internos)
+        self.by_top: Dict[tuple, List[_Template]] = {}
+        for i, (keys, kinds) in enumerate(templates, start=1):
+            header = bytearray()
+            _write_varint(header, id)
+            _write_varint(header, i)
+            template = _Template(i, keys, kinds, bytes(header), self.strings, self.string_ids)
+            self.templates.append(template)
+            self.by_top.setdefault(tuple(_top_keys(keys)), []).append(template)
+    
+    @classmethod
+    def train(cls, id: int, samples: Iterable[Dict], max_strings: int = 4096,
+              max_templates: int = 255, min_share: float = 0.01) -> "CodecDictionary":
+        """
+        Treina com contextos típicos
+        Textos (chaves e valores) que se repetem entram na tabela; formatos
+        com pelo menos min_share das amostras viram modelos
+        """
+        samples = [sample for sample in samples if type(sample) is dict]
+        textos: Counter = Counter()
+        
+        def contar(value):
+            if isinstance(value, dict):
+                for key, item in value.items():
+                    textos[_json_key(key)] += 1
+                    contar(item)
+            elif isinstance(value, (list, tuple)):
+                for item in value:
+                    contar(item)
+            elif type(value) is str and _iso_pack(value) is None:
+                textos[value] += 1
+        
+        for sample in samples:
+            contar(sample)
+        strings = [texto for texto, n in textos.most_common(min(max_strings, 65535)) if n > 1]
+        string_ids = {texto: i for i, texto in enumerate(strings)}
+        
+        formatos: Dict[tuple, list] = {}
+        for sample in samples:
+            values: list = []
+            keys = _flatten(sample, values)
+            if keys is None:
+                continue
+            kinds = [_kind(value, string_ids) for value in values]
+            acc = formatos.setdefault(keys, [0, [Counter() for _ in kinds]])
+            acc[0] += 1
+            for contagem, kind in zip(acc[1], kinds):
+                contagem[kind] += 1
+        
+        templates = []
+        minimo = max(2, int(len(samples) * min_share))
+        for keys, (n, contagens) in sorted(formatos.items(), key=lambda item: -item[1][0]):
+            if n < minimo or len(templates) >= max_templates:
+                break
+            kinds = ""
+            for contagem in contagens:
+                kind = contagem.most_common(1)[0][0]
+                if kind == "d" and contagem["f"]:
+                    kind = "f"  # floats quaisquer também cabem
+                elif kind == "s" and contagem["S"]:
+                    kind = "S"
+                if kind == "x":
+                    break
+                kinds += kind
+            else:
+                templates.append((keys, kinds))
+        return cls(id, strings, templates)
+    
+    def to_bytes(self) -> bytes:
+        return json.dumps({
+            "id": self.id,
+            "strings": self.strings,
+            "templates": [[_keys_to_json(t.keys), t.kinds] for t in self.templates]
+        }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CodecDictionary":
+        dados = json.loads(data)
+        return cls(dados["id"], dados["strings"],
+                   [(_keys_from_json(keys), kinds) for keys, kinds in dados["templates"]])
+    
+    def get_stats(self) -> Dict:
+        return {"id": self.id, "strings": len(self.strings), "templates": len(self.templates)}
+
+
+class JsonCodec:
+    """Texto JSON (formato original)"""
+    
+    tag = CODEC_JSON
+    name = "json"
+    
+    def encode(self, contexto: Dict) -> str:
+        return json.dumps(contexto)
+    
+    def decode(self, raw: Union[str, bytes, None]) -> Dict:
+        return json.loads(raw or '{}')
+
+
+class PackedCodec:
+    """
+    Binário compacto: varint(id do dicionário) + varint(modelo) + corpo
+    Modelo 0 = formato genérico (qualquer valor JSON); modelo n = valores do
+    contexto no layout fixo do modelo n do dicionário
+    """
+    
+    tag = CODEC_PACKED
+    name = "packed"
+    
+    def __init__(self):
+        self.dictionaries: Dict[int, CodecDictionary] = {}
+        self.active: Optional[CodecDictionary] = None
+        
+        # Métricas
+        self.template_hits = 0
+        self.generic = 0
+    
+    def add_dictionary(self, dictionary: CodecDictionary):
+        """Registra um dicionário; o de maior id passa a ser usado nas gravações"""
+        self.dictionaries[dictionary.id] = dictionary
+        if self.active is None or dictionary.id >= self.active.id:
+            self.active = dictionary
+    
+    def encode(self, contexto: Dict) -> bytes:
+        dictionary = self.active
+        if dictionary is not None and type(contexto) is dict:
+            for template in dictionary.by_top.get(tuple(contexto), ()):
+                try:
+                    corpo = template.encode(contexto)
+                except (TypeError, ValueError, OverflowError, struct.error):
+                    # Valor fora da faixa do campo (ou não hasheável): formato genérico
+                    corpo = None
+                if corpo is not None:
+                    self.template_hits += 1
+                    return template.header + corpo
+        out = bytearray()
+        _write_varint(out, dictionary.id if dictionary is not None else 0)
+        out.append(0)
+        self._encode_value(out, contexto, dictionary.string_ids if dictionary is not None else {})
+        self.generic += 1
+        return bytes(out)
+    
+    def _encode_value(self, out: bytearray, value: Any, string_ids: Dict[str, int]):
+        """Formato genérico, com a mesma semântica do json.dumps"""
+        if isinstance(value, str):
+            value = str.__str__(value)
+            ref = string_ids.get(value)
+            if ref is not None:
+                out.append(_REF)
+                _write_varint(out, ref)
+                return
+            bcd = _iso_pack(value)
+            if bcd is not None:
+                out.append(_DATETIME)
+                out += bcd
+                return
+            texto = value.encode("utf-8")
+            out.append(_STR)
+            _write_varint(out, len(texto))
+            out += texto
+        elif isinstance(value, float):
+            n = _decimal(value)
+            if n is not None:
+                out.append(_DECIMAL)
+                _write_varint(out, _zigzag(n))
+            else:
+                out.append(_FLOAT)
+                out += _FLOAT64.pack(value)
+        elif value is True or value is False:
+            out.append(_TRUE if value else _FALSE)
+        elif isinstance(value, int):
+            out.append(_INT)
+            _write_varint(out, _zigzag(int(value)))
+        elif value is None:
+            out.append(_NONE)
+        elif isinstance(value, dict):
+            out.append(_DICT)
+            _write_varint(out, len(value))
+            for key, item in value.items():
+                self._encode_value(out, _json_key(key), string_ids)
+                self._encode_value(out, item, string_ids)
+        elif isinstance(value, (list, tuple)):
+            out.append(_LIST)
+            _write_varint(out, len(value))
+            for item in value:
+                self._encode_value(out, item, string_ids)
+        else:
+            raise TypeError(f"Valor de contexto não serializável: {type(value).__name__}")
+    
+    def decode(self, raw: bytes) -> Dict:
+        dict_id, pos = _read_varint(raw, 0)
+        dictionary = None
+        if dict_id:
+            dictionary = self.dictionaries.get(dict_id)
+            if dictionary is None:
+                raise ValueError(f"Dicionário do codec de contexto {dict_id} não carregado")
+        template_id, pos = _read_varint(raw, pos)
+        if template_id:
+            return dictionary.templates[template_id - 1].decode(raw, pos)
+        value, _ = self._decode_value(raw, pos, dictionary.strings if dictionary else [])
+        return value
+    
+    def _decode_value(self, raw: bytes, pos: int, strings: List[str]) -> Tuple[Any, int]:
+        marcador = raw[pos]
+        pos += 1
+        if marcador == _DECIMAL:
+            n, pos = _read_varint(raw, pos)
+            return _unzigzag(n) / DECIMAL_SCALE, pos
+        if marcador == _REF:
+            n, pos = _read_varint(raw, pos)
+            return strings[n], pos
+        if marcador == _STR:
+            n, pos = _read_varint(raw, pos)
+            return raw[pos:pos + n].decode("utf-8"), pos + n
+        if marcador == _DICT:
+            n, pos = _read_varint(raw, pos)
+            out = {}
+            for _ in range(n):
+                key, pos = self._decode_value(raw, pos, strings)
+                out[key], pos = self._decode_value(raw, pos, strings)
+            return out, pos
+        if marcador == _LIST:
+            n, pos = _read_varint(raw, pos)
+            items = []
+            for _ in range(n):
+                item, pos = self._decode_value(raw, pos, strings)
+                items.append(item)
+            return items, pos
+        if marcador == _DATETIME:
+            return _iso_unpack(raw[pos:pos + _ISO_SIZE]), pos + _ISO_SIZE
+        if marcador == _INT:
+            n, pos = _read_varint(raw, pos)
+            return _unzigzag(n), pos
+        if marcador == _FLOAT:
+            return _FLOAT64.unpack_from(raw, pos)[0], pos + _FLOAT64.size
+        if marcador in (_NONE, _FALSE, _TRUE):
+            return (None, False, True)[marcador], pos
+        raise ValueError(f"Marcador de contexto desconhecido: {marcador}")
+
+
+class ContextoCodecs:
+    """
+    Registro de codecs por tag
+    Grava com o codec padrão e lê qualquer tag registrada
+    default="auto": json até haver um dicionário, packed depois (sem
+    dicionário o packed fica maior e mais lento que o json)
+    """
+    
+    def __init__(self, default: str = "auto"):
+        self.packed = PackedCodec()
+        self._codecs = {}
+        for codec in (JsonCodec(), self.packed):
+            self.register(codec)
+        self.auto = default == "auto"
+        self.default = self.by_name(JsonCodec.name if self.auto else default)
+    
+    def register(self, codec):
+        """Codec com atributos tag, name, encode(dict) e decode(raw)"""
+        self._codecs[codec.tag] = codec
+    
+    def by_name(self, name: str):
+        for codec in self._codecs.values():
+            if codec.name == name:
+                return codec
+        raise ValueError(f"Codec de contexto desconhecido: {name}")
+    
+    def add_dictionary(self, dictionary: CodecDictionary):
+        self.packed.add_dictionary(dictionary)
+        if self.auto:
+            self.default = self.packed
+    
+    @property
+    def dictionary(self) -> Optional[CodecDictionary]:
+        """Dicionário usado nas gravações (None = packed sem dicionário)"""
+        return self.packed.active
+    
+    def encode(self, contexto: Dict) -> Tuple[Union[str, bytes], int]:
+        """(payload, tag) com o codec padrão"""
+        return self.default.encode(contexto), self.default.tag
+    
+    def decode(self, raw: Union[str, bytes, None], tag: Optional[int]) -> Dict:
+        if raw is None:
+            return {}
+        codec = self._codecs.get(tag or CODEC_JSON)
+        if codec is None:
+            raise ValueError(f"Codec de contexto desconhecido: tag {tag}")
+        return codec.decode(raw)
+    
+    def to_json(self, raw: Union[str, bytes, None], tag: Optional[int]) -> Optional[str]:
+        """Payload de qualquer codec → texto JSON (formatos que não conhecem as tags)"""
+        if raw is None or not tag:
+            return raw
+        return json.dumps(self.decode(raw, tag))
+    
+    def get_stats(self) -> Dict:
+        dictionary = self.packed.active
+        return {
+            "default": self.default.name,
+            "auto": self.auto,
+            "dictionary": dictionary.get_stats() if dictionary is not None else None,
+            "template_hits": self.packed.template_hits,
+            "generic": self.packed.generic
+        }
@@ -45,6 +45,30 @@ class DecisionSystem:
     Combina: emoção + situação + personalidade + memória
     """
     
+    # Motivos possíveis de cada decisão
+    MOTIVOS = {
+        DecisionType.FALAR: [
+            "necessidade social alta",
+            "usuário presente sem interação",
+            "curiosidade ativa"
+        ],
+        DecisionType.SILENCIO: [
+            "energia baixa",
+            "personalidade reservada",
+            "momento de descanso"
+        ],
+        DecisionType.OBSERVAR: [
+            "personalidade observadora",
+            "curiosidade sobre o ambiente",
+            "aguardando momento certo"
+        ],
+        DecisionType.NADA: [
+            "tudo equilibrado",
+            "não há necessidade de ação",
+            "momento de quietude"
+        ]
+    }
+    
     def __init__(self, seed_diaria: Optional[int] = None):
         # Seed diária para imprevisibilidade controlada
         if seed_diaria is None:
@@ -212,29 +236,6 @@ class DecisionSystem:
     
     def _generate_motivo(self, tipo: DecisionType, emocional: Dict, situacional: Dict) -> str:
         """Gera motivo da decisão"""
-        motivos = {
-            DecisionType.FALAR: [
-                "necessidade social alta",
-                "usuário presente sem interação",
-                "curiosidade ativa"
-            ],
-            DecisionType.SILENCIO: [
-                "energia baixa",
-                "personalidade reservada",
-                "momento de descanso"
-            ],
-            DecisionType.OBSERVAR: [
-                "personalidade observadora",
-                "curiosidade sobre o ambiente",
-                "aguardando momento certo"
-            ],
-            DecisionType.NADA: [
-                "tudo equilibrado",
-                "não há necessidade de ação",
-                "momento de quietude"
-            ]
-        }
-        
-        if tipo in motivos:
-            return random.choice(motivos[tipo])
+        if tipo in self.MOTIVOS:
+            return random.choice(self.MOTIVOS[tipo])
         return "decisão autônoma"
@@ -0,0 +1,853 @@
+"""
+Log de Eventos Segmentado
+Backend de memória append-only para taxas altas de eventos
+- Segmentos de registros binários de layout fixo, gravados via mmap
+- Textos (evento, resposta, contexto) num arquivo de payload ao lado
+- Índice temporal esparso (ts mínimo/máximo por bloco) para varrer intervalos
+- Segmento cheio é selado e um novo é aberto; a compactação arquiva eventos
+  antigos de baixo peso e junta segmentos pequenos
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple, Union
+import asyncio
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+
+import numpy as np
+
+from .contexto_codec import CODEC_JSON
+from .memory_backend import MemoryBackend
+
+logger = logging.getLogger(__name__)
+
+# 1: contexto em texto JSON | 2: contexto com o byte do codec na frente
+LOG_FORMAT_VERSION = 2
+
+# Cabeçalho do .rec: magic, versão, selado, registros, bytes de payload usados
+_MAGIC = b"PRIMELOG"
+_HEADER = struct.Struct("<8sIIQQ")
+_HEADER_SIZE = 64
+
+# Registro de layout fixo (56 bytes); tipo e resultado são códigos da tabela de símbolos
+_RECORD = np.dtype([
+    ("id", "<i8"),
+    ("ts", "<i8"),
+    ("first_ts", "<i8"),
+    ("peso", "<f8"),
+    ("count", "<u4"),
+    ("tipo", "<u4"),
+    ("resultado", "<u4"),
+    ("payload_len", "<u4"),
+    ("payload_off", "<u8"),
+])
+
+# Payload: tamanhos de evento, resposta_dada e contexto, seguidos dos bytes
+# (textos em UTF-8; contexto = byte do codec + payload do codec, vazio se None)
+_PAYLOAD = struct.Struct("<III")
+
+# Registros por entrada do índice esparso
+INDEX_STRIDE = 256
+
+# NNNNNNNN.rec ou NNNNNNNN-GGGG.rec: a compactação grava uma geração nova do
+# segmento em vez de sobrescrever a atual
+_SEGMENT_RE = re.compile(r"^(\d{8})(?:-(\d{4}))?\.rec$")
+
+_TS_MIN = -(2 ** 63)
+_TS_MAX = 2 ** 63 - 1
+
+
+def _encode_payload(evento: str, resposta_dada: Optional[str],
+                    contexto: Union[str, bytes, None], codec: int) -> bytes:
+    if contexto is None:
+        dados = b""
+    else:
+        dados = bytes((codec,)) + (contexto.encode("utf-8") if isinstance(contexto, str) else contexto)
+    partes = [(evento or "").encode("utf-8"), (resposta_dada or "").encode("utf-8"), dados]
+    return _PAYLOAD.pack(*(len(parte) for parte in partes)) + b"".join(partes)
+
+
+def _decode_payload(buf: bytes, version: int = LOG_FORMAT_VERSION) -> tuple:
+    """(evento, resposta_dada, contexto, codec); contexto JSON volta como str"""
+    n_evento, n_resposta, n_contexto = _PAYLOAD.unpack_from(buf, 0)
+    start = _PAYLOAD.size
+    evento = buf[start:start + n_evento].decode("utf-8")
+    start += n_evento
+    resposta = buf[start:start + n_resposta].decode("utf-8")
+    start += n_resposta
+    dados = buf[start:start + n_contexto]
+    if not dados:
+        return evento, resposta, None, CODEC_JSON
+    if version < 2:
+        return evento, resposta, dados.decode("utf-8"), CODEC_JSON
+    codec = dados[0]
+    if codec == CODEC_JSON:
+        return evento, resposta, dados[1:].decode("utf-8"), codec
+    return evento, resposta, dados[1:], codec
+
+
+def _fsync_dir(path: str):
+    """Torna duráveis as trocas de nome no diretório (o Windows não tem esse fsync)"""
+    if os.name == "nt":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _map(path: str, writable: bool) -> mmap.mmap:
+    with open(path, "r+b" if writable else "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+
+
+class _Segment:
+    """
+    Um segmento do log: NNNNNNNN.rec (cabeçalho + registros),
+    NNNNNNNN.dat (payload) e, depois de selado, NNNNNNNN.idx (índice esparso)
+    O segmento ativo é pré-alocado e mapeado para escrita; selados são só leitura
+    Compactado, vira a geração seguinte (NNNNNNNN-GGGG.*), em arquivos novos
+    """
+    
+    def __init__(self, path: str, seq: int, gen: int = 0):
+        self.seq = seq
+        self.gen = gen
+        base = os.path.join(path, f"{seq:08d}" + (f"-{gen:04d}" if gen else ""))
+        self.rec_path = base + ".rec"
+        self.dat_path = base + ".dat"
+        self.idx_path = base + ".idx"
+        self.count = 0
+        self.payload_used = 0
+        self.version = LOG_FORMAT_VERSION
+        self.sealed = False
+        self.capacity = 0
+        self.payload_capacity = 0
+        self.block_min = np.empty(0, dtype=np.int64)
+        self.block_max = np.empty(0, dtype=np.int64)
+        self._rec_mm: Optional[mmap.mmap] = None
+        self._dat_mm: Optional[mmap.mmap] = None
+    
+    @classmethod
+    def create(cls, path: str, seq: int, capacity: int, payload_capacity: int) -> "_Segment":
+        """Cria um segmento ativo vazio (arquivos esparsos pré-alocados)"""
+        seg = cls(path, seq)
+        with open(seg.rec_path, "wb") as f:
+            f.truncate(_HEADER_SIZE + capacity * _RECORD.itemsize)
+        with open(seg.dat_path, "wb") as f:
+            f.truncate(payload_capacity)
+        seg._rec_mm = _map(seg.rec_path, writable=True)
+        seg._dat_mm = _map(seg.dat_path, writable=True)
+        seg.capacity = capacity
+        seg.payload_capacity = payload_capacity
+        seg._write_header()
+        return seg
+    
+    @classmethod
+    def load(cls, path: str, seq: int, gen: int = 0) -> "_Segment":
+        """Abre um segmento existente"""
+        seg = cls(path, seq, gen)
+        with open(seg.rec_path, "rb") as f:
+            magic, version, sealed, count, payload_used = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != _MAGIC:
+            raise ValueError(f"{seg.rec_path} não é um segmento do log de memória")
+        if version > LOG_FORMAT_VERSION:
+            raise ValueError(f"{seg.rec_path} tem formato v{version}, suportado até v{LOG_FORMAT_VERSION}")
+        # O cabeçalho não pode apontar além dos arquivos (um .dat de outro .rec, cortado...)
+        tamanho_rec = os.path.getsize(seg.rec_path)
+        tamanho_dat = os.path.getsize(seg.dat_path) if os.path.exists(seg.dat_path) else -1
+        if tamanho_rec < _HEADER_SIZE + count * _RECORD.itemsize or tamanho_dat < payload_used:
+            raise ValueError(f"{seg.rec_path} não confere com os arquivos: {count} registros e "
+                             f"{payload_used} bytes de payload no cabeçalho, {tamanho_rec} bytes "
+                             f"no .rec e {tamanho_dat} no .dat")
+        seg.count = count
+        seg.payload_used = payload_used
+        seg.version = version
+        seg.sealed = bool(sealed)
+        seg._rec_mm = _map(seg.rec_path, writable=not seg.sealed)
+        seg._dat_mm = _map(seg.dat_path, writable=not seg.sealed)
+        seg.capacity = (len(seg._rec_mm) - _HEADER_SIZE) // _RECORD.itemsize
+        seg.payload_capacity = len(seg._dat_mm)
+        blocks = -(-count // INDEX_STRIDE)
+        if seg.sealed and os.path.exists(seg.idx_path):
+            index = np.fromfile(seg.idx_path, dtype=np.int64)
+            if len(index) == 2 * blocks:
+                seg.block_min, seg.block_max = index[:blocks].copy(), index[blocks:].copy()
+                return seg
+        seg._reindex(0)
+        return seg
+    
+    def _write_header(self):
+        _HEADER.pack_into(self._rec_mm, 0, _MAGIC, self.version, int(self.sealed),
+                          self.count, self.payload_used)
+    
+    def records(self) -> np.ndarray:
+        """Registros gravados (visão sobre o mmap, sem cópia)"""
+        return np.frombuffer(self._rec_mm, dtype=_RECORD, count=self.count, offset=_HEADER_SIZE)
+    
+    def payload(self, off: int, size: int) -> bytes:
+        return self._dat_mm[off:off + size]
+    
+    @property
+    def min_ts(self) -> int:
+        return int(self.block_min.min()) if self.count else _TS_MAX
+    
+    @property
+    def max_ts(self) -> int:
+        return int(self.block_max.max()) if self.count else _TS_MIN
+    
+    def room(self) -> Tuple[int, int]:
+        """Espaço livre: (registros, bytes de payload)"""
+        return self.capacity - self.count, self.payload_capacity - self.payload_used
+    
+    def append(self, recs: np.ndarray, payload: bytes):
+        """
+        Acrescenta registros (payload_off relativo ao início do payload novo)
+        O cabeçalho é gravado por último: é ele que torna os registros visíveis
+        """
+        recs = recs.copy()
+        recs["payload_off"] += self.payload_used
+        start = _HEADER_SIZE + self.count * _RECORD.itemsize
+        self._rec_mm[start:start + recs.nbytes] = recs.tobytes()
+        self._dat_mm[self.payload_used:self.payload_used + len(payload)] = payload
+        first_block = self.count // INDEX_STRIDE
+        self.count += len(recs)
+        self.payload_used += len(payload)
+        self._write_header()
+        self._reindex(first_block)
+    
+    def update_last(self, count: int, ts: int, peso: float):
+        """Soma uma repetição ao último registro (só no segmento ativo)"""
+        recs = self.records()
+        recs["count"][-1] += count
+        recs["ts"][-1] = ts
+        recs["peso"][-1] = max(float(recs["peso"][-1]), peso)
+        del recs
+        self._reindex((self.count - 1) // INDEX_STRIDE)
+    
+    def _reindex(self, first_block: int):
+        """Recalcula o índice esparso a partir de um bloco"""
+        ts = self.records()["ts"][first_block * INDEX_STRIDE:]
+        if len(ts):
+            starts = np.arange(0, len(ts), INDEX_STRIDE)
+            block_min = np.minimum.reduceat(ts, starts)
+            block_max = np.maximum.reduceat(ts, starts)
+        else:
+            block_min = block_max = np.empty(0, dtype=np.int64)
+        self.block_min = np.concatenate([self.block_min[:first_block], block_min])
+        self.block_max = np.concatenate([self.block_max[:first_block], block_max])
+    
+    def ranges(self, lo: int, hi: int) -> List[Tuple[int, int]]:
+        """Faixas de posições cujos blocos podem ter ts em [lo, hi)"""
+        blocks = np.nonzero((self.block_max >= lo) & (self.block_min < hi))[0]
+        if not len(blocks):
+            return []
+        breaks = np.nonzero(np.diff(blocks) > 1)[0]
+        starts = np.concatenate([blocks[:1], blocks[breaks + 1]])
+        ends = np.concatenate([blocks[breaks], blocks[-1:]]) + 1
+        return [(int(s) * INDEX_STRIDE, min(int(e) * INDEX_STRIDE, self.count))
+                for s, e in zip(starts, ends)]
+    
+    def write_index(self):
+        np.concatenate([self.block_min, self.block_max]).astype(np.int64).tofile(self.idx_path)
+    
+    def seal(self):
+        """Marca como selado, grava o índice e devolve o espaço pré-alocado"""
+        self.sealed = True
+        self._write_header()
+        self.write_index()
+        self.close()
+        with open(self.rec_path, "r+b") as f:
+            f.truncate(_HEADER_SIZE + self.count * _RECORD.itemsize)
+        with open(self.dat_path, "r+b") as f:
+            f.truncate(self.payload_used)
+        self._rec_mm = _map(self.rec_path, writable=False)
+        self._dat_mm = _map(self.dat_path, writable=False)
+        self.capacity = self.count
+        self.payload_capacity = self.payload_used
+    
+    def flush(self):
+        if self._rec_mm is not None and not self.sealed:
+            self._rec_mm.flush()
+            self._dat_mm.flush()
+    
+    def close(self):
+        self.flush()
+        for mm in (self._rec_mm, self._dat_mm):
+            if mm is not None:
+                mm.close()
+        self._rec_mm = self._dat_mm = None
+    
+    def remove(self):
+        self.close()
+        for path in (self.rec_path, self.dat_path, self.idx_path):
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def disk_bytes(self) -> int:
+        return sum(os.path.getsize(path) for path in (self.rec_path, self.dat_path)
+                   if os.path.exists(path))
+
+
+class EventLogBackend(MemoryBackend):
+    """
+    Backend append-only em segmentos mapeados em memória
+    Escritas são cópias para o mmap (sem SQL nem transação); consultas por
+    intervalo de tempo usam o índice esparso e filtros vetorizados (NumPy)
+    Durabilidade como synchronous=NORMAL: sobrevive à queda do processo; os
+    mapeamentos são sincronizados ao selar e ao fechar
+    Sem busca textual nem resumos; importação só acrescenta ids novos;
+    padrões são calculados sobre o log (eventos arquivados deixam de contar)
+    """
+    
+    name = "log"
+    
+    def __init__(self, path: str, segment_records: int = 65536,
+                 segment_bytes: int = 32 * 1024 * 1024, archive=None,
+                 hot_days: int = 30, keep_weight: float = 0.7):
+        self.path = path
+        self.segment_records = max(INDEX_STRIDE, segment_records)
+        self.segment_bytes = max(4096, segment_bytes)
+        self.archive = archive  # MemoryArchive (retenção) ou None (compactação sem perda)
+        self.hot_days = hot_days
+        self.keep_weight = keep_weight
+        self._segments: List[_Segment] = []
+        self._last_id = 0
+        self._symbols: Dict[str, List[str]] = {"tipo": [], "resultado": []}
+        self._codes: Dict[str, Dict[str, int]] = {"tipo": {}, "resultado": {}}
+        self._saved_symbols = 0
+        self._lock = threading.RLock()
+        self._compact_lock: Optional[asyncio.Lock] = None
+        
+        # Métricas
+        self.records_written = 0
+        self.rollovers = 0
+        self.compactions = 0
+        self.archived = 0
+        self.last_scan_ms = 0.0
+        self.last_scan_ranges = 0
+        self.last_compaction_ms = 0.0
+    
+    @property
+    def _symbols_path(self) -> str:
+        return os.path.join(self.path, "symbols.json")
+    
+    async def open(self):
+        await asyncio.to_thread(self._open)
+    
+    def _open(self):
+        with self._lock:
+            if self._segments:
+                return
+            os.makedirs(self.path, exist_ok=True)
+            if os.path.exists(self._symbols_path):
+                with open(self._symbols_path, "r", encoding="utf-8") as f:
+                    self._symbols = json.load(f)
+                self._codes = {tabela: {valor: i for i, valor in enumerate(valores)}
+                               for tabela, valores in self._symbols.items()}
+                self._saved_symbols = self._n_symbols()
+            nomes = sorted(os.listdir(self.path))
+            encontrados = []
+            for nome in nomes:
+                if nome.endswith(".tmp"):
+                    # Compactação interrompida antes da troca
+                    os.remove(os.path.join(self.path, nome))
+                    continue
+                base, ext = os.path.splitext(nome)
+                if ext in (".dat", ".idx") and base + ".rec" not in nomes:
+                    # .dat de uma compactação interrompida antes do .rec (que é a troca)
+                    os.remove(os.path.join(self.path, nome))
+                    continue
+                match = _SEGMENT_RE.match(nome)
+                if match:
+                    encontrados.append((int(match.group(1)), int(match.group(2) or 0)))
+            # Geração mais nova primeiro: as anteriores do mesmo trecho ficam redundantes
+            for seq, gen in sorted(encontrados, key=lambda item: (item[0], -item[1])):
+                seg = _Segment.load(self.path, seq, gen)
+                if seg.count and self._segments and self._last_id >= int(seg.records()["id"][0]):
+                    # Compactação interrompida depois da troca: já está na geração nova
+                    logger.warning(f"Removendo segmento redundante {seg.rec_path}")
+                    seg.remove()
+                    continue
+                self._segments.append(seg)
+                if seg.count:
+                    self._last_id = int(seg.records()["id"][-1])
+            active = self._active()
+            if active is not None and active.version < LOG_FORMAT_VERSION:
+                # Segmento ativo de formato antigo: gravações novas vão para um segmento novo
+                active.seal()
+    
+    async def close(self):
+        await asyncio.to_thread(self._close)
+    
+    def _close(self):
+        with self._lock:
+            for seg in self._segments:
+                seg.close()
+            self._segments = []
+    
+    async def schema_version(self) -> int:
+        return LOG_FORMAT_VERSION
+    
+    def _code(self, tabela: str, valor: str) -> int:
+        code = self._codes[tabela].get(valor)
+        if code is None:
+            code = len(self._symbols[tabela])
+            self._symbols[tabela].append(valor)
+            self._codes[tabela][valor] = code
+        return code
+    
+    def _n_symbols(self) -> int:
+        return sum(len(valores) for valores in self._symbols.values())
+    
+    def _save_symbols(self):
+        tmp = self._symbols_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._symbols, f, ensure_ascii=False)
+        os.replace(tmp, self._symbols_path)
+        self._saved_symbols = self._n_symbols()
+    
+    def _dictionary_path(self, dict_id: int) -> str:
+        return os.path.join(self.path, f"codec-{dict_id:04d}.dict")
+    
+    async def codec_dictionaries(self) -> List[bytes]:
+        return await asyncio.to_thread(self._codec_dictionaries)
+    
+    def _codec_dictionaries(self) -> List[bytes]:
+        dados = []
+        for nome in sorted(os.listdir(self.path)):
+            if nome.startswith("codec-") and nome.endswith(".dict"):
+                with open(os.path.join(self.path, nome), "rb") as f:
+                    dados.append(f.read())
+        return dados
+    
+    async def save_codec_dictionary(self, dict_id: int, data: bytes):
+        await asyncio.to_thread(self._save_codec_dictionary, dict_id, data)
+    
+    def _save_codec_dictionary(self, dict_id: int, data: bytes):
+        path = self._dictionary_path(dict_id)
+        if os.path.exists(path):
+            raise ValueError(f"Dicionário de codec {dict_id} já existe")
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+    
+    def _next_seq(self) -> int:
+        return self._segments[-1].seq + 1 if self._segments else 1
+    
+    def _active(self) -> Optional[_Segment]:
+        if self._segments and not self._segments[-1].sealed:
+            return self._segments[-1]
+        return None
+    
+    def _rows(self, seg: _Segment, positions) -> List[tuple]:
+        """Decodifica registros de um segmento em linhas (tuplas cruas)"""
+        tipos = self._symbols["tipo"]
+        resultados = self._symbols["resultado"]
+        rows = []
+        # tolist() converte os campos de uma vez (acesso campo a campo no NumPy é lento)
+        registros = seg.records()[np.asarray(positions, dtype=np.int64)].tolist()
+        for id_, ts, first_ts, peso, count, tipo, resultado, size, off in registros:
+            evento, resposta, contexto, codec = _decode_payload(seg.payload(off, size), seg.version)
+            rows.append((id_, ts, tipos[tipo], evento, resposta, resultados[resultado],
+                         peso, contexto, count, first_ts, codec))
+        return rows
+    
+    def _rows_in_order(self, segs: np.ndarray, positions: np.ndarray) -> List[tuple]:
+        """Linhas de (segmento, posição) na ordem dada, decodificadas segmento a segmento"""
+        rows: List[Optional[tuple]] = [None] * len(segs)
+        for k in np.unique(segs):
+            idx = np.nonzero(segs == k)[0]
+            for i, row in zip(idx, self._rows(self._segments[k], positions[idx])):
+                rows[i] = row
+        return rows
+    
+    async def write_batch(self, rows: List[tuple],
+                          merge_into: Optional[int] = None) -> Tuple[bool, List[int]]:
+        return await asyncio.to_thread(self._write_batch, rows, merge_into)
+    
+    def _write_batch(self, rows: List[tuple], merge_into: Optional[int]) -> Tuple[bool, List[int]]:
+        with self._lock:
+            merged = False
+            active = self._active()
+            if merge_into is not None and rows and active is not None and active.count:
+                if int(active.records()["id"][-1]) == merge_into:
+                    ts, _, _, _, _, peso, _, count, _, _ = rows[0]
+                    active.update_last(count, ts, peso)
+                    merged = True
+                    rows = rows[1:]
+            return merged, self._append(rows)
+    
+    def _append(self, rows: List[tuple], ids: Optional[List[int]] = None) -> List[int]:
+        """Acrescenta linhas, abrindo segmentos novos quando o ativo enche"""
+        if not rows:
+            return []
+        recs = np.zeros(len(rows), dtype=_RECORD)
+        payloads = []
+        for i, row in enumerate(rows):
+            ts, tipo, evento, resposta, resultado, peso, contexto, count, first_ts, codec = row
+            payload = _encode_payload(evento, resposta, contexto, codec)
+            if len(payload) > self.segment_bytes:
+                raise ValueError(f"Evento de {len(payload)} bytes excede o segmento ({self.segment_bytes})")
+            payloads.append(payload)
+            recs[i] = (0, ts, first_ts if first_ts is not None else ts, peso, count,
+                       self._code("tipo", tipo), self._code("resultado", resultado or ""),
+                       len(payload), 0)
+        if ids is None:
+            ids = list(range(self._last_id + 1, self._last_id + 1 + len(rows)))
+        recs["id"] = ids
+        if self._n_symbols() != self._saved_symbols:
+            # Símbolos novos vão para o disco antes dos registros que os usam
+            self._save_symbols()
+        
+        sizes = np.array([len(payload) for payload in payloads], dtype=np.int64)
+        ends = np.cumsum(sizes)
+        i = 0
+        while i < len(rows):
+            active = self._active()
+            if active is None:
+                active = _Segment.create(self.path, self._next_seq(),
+                                         self.segment_records, self.segment_bytes)
+                self._segments.append(active)
+            free_recs, free_bytes = active.room()
+            base = ends[i - 1] if i else 0
+            # Quantos registros a partir de i cabem no espaço livre
+            fit = int(np.searchsorted(ends[i:], base + free_bytes, side="right"))
+            j = i + min(fit, free_recs)
+            if j == i:
+                active.seal()
+                self.rollovers += 1
+                continue
+            chunk = recs[i:j]
+            chunk["payload_off"] = np.concatenate([[0], ends[i:j - 1] - base])
+            active.append(chunk, b"".join(payloads[i:j]))
+            i = j
+        self._last_id = int(ids[-1])
+        self.records_written += len(rows)
+        return [int(i) for i in ids]
+    
+    async def scan(self, tipo: Optional[str] = None, since_ms: Optional[int] = None,
+                   until_ms: Optional[int] = None, after: Optional[Tuple[int, int]] = None,
+                   limit: int = 500) -> List[tuple]:
+        return await asyncio.to_thread(self._scan, tipo, since_ms, until_ms, after, limit)
+    
+    def _scan(self, tipo, since_ms, until_ms, after, limit) -> List[tuple]:
+        start = time.perf_counter()
+        with self._lock:
+            tipo_code = None
+            if tipo is not None:
+                tipo_code = self._codes["tipo"].get(tipo)
+                if tipo_code is None:
+                    return []
+            lo = since_ms if since_ms is not None else _TS_MIN
+            hi = until_ms if until_ms is not None else _TS_MAX
+            if after is not None:
+                lo = max(lo, after[0])
+            
+            segments = self._segments
+            # Menor ts de cada sufixo de segmentos: permite parar cedo
+            suffix_min = [_TS_MAX] * (len(segments) + 1)
+            for k in range(len(segments) - 1, -1, -1):
+                suffix_min[k] = min(suffix_min[k + 1], segments[k].min_ts)
+            
+            found_ts, found_id, found_seg, found_pos = [], [], [], []
+            total = 0
+            n_ranges = 0
+            for k, seg in enumerate(segments):
+                if total >= limit:
+                    kth = np.partition(np.concatenate(found_ts), limit - 1)[limit - 1]
+                    if suffix_min[k] >= kth:
+                        break
+                if not seg.count or seg.max_ts < lo or seg.min_ts >= hi:
+                    continue
+                recs = seg.records()
+                for begin, end in seg.ranges(lo, hi):
+                    n_ranges += 1
+                    bloco = recs[begin:end]
+                    ts = bloco["ts"]
+                    mask = (ts >= lo) & (ts < hi)
+                    if tipo_code is not None:
+                        mask &= bloco["tipo"] == tipo_code
+                    if after is not None:
+                        mask &= (ts > after[0]) | (bloco["id"] > after[1])
+                    pos = np.nonzero(mask)[0]
+                    if len(pos):
+                        found_ts.append(ts[pos])
+                        found_id.append(bloco["id"][pos])
+                        found_seg.append(np.full(len(pos), k))
+                        found_pos.append(pos + begin)
+                        total += len(pos)
+                del recs
+            
+            rows = []
+            if total:
+                order = np.lexsort((np.concatenate(found_id), np.concatenate(found_ts)))[:limit]
+                rows = self._rows_in_order(np.concatenate(found_seg)[order],
+                                           np.concatenate(found_pos)[order])
+            self.last_scan_ms = (time.perf_counter() - start) * 1000
+            self.last_scan_ranges = n_ranges
+            return rows
+    
+    async def fetch_last(self, limit: int) -> List[tuple]:
+        return await asyncio.to_thread(self._fetch_last, limit)
+    
+    def _fetch_last(self, limit: int) -> List[tuple]:
+        with self._lock:
+            rows = []
+            for seg in reversed(self._segments):
+                if len(rows) >= limit:
+                    break
+                n = min(seg.count, limit - len(rows))
+                rows.extend(self._rows(seg, np.arange(seg.count - 1, seg.count - 1 - n, -1)))
+            return rows
+    
+    async def fetch_ids(self, ids: List[int]) -> List[tuple]:
+        return await asyncio.to_thread(self._fetch_ids, ids)
+    
+    def _fetch_ids(self, ids: List[int]) -> List[tuple]:
+        wanted = np.unique(np.asarray(ids, dtype=np.int64))
+        with self._lock:
+            rows = []
+            for seg in self._segments:
+                if not seg.count:
+                    continue
+                # ids crescentes dentro do segmento: busca binária
+                seg_ids = seg.records()["id"]
+                sel = wanted[(wanted >= seg_ids[0]) & (wanted <= seg_ids[-1])]
+                pos = np.searchsorted(seg_ids, sel)
+                rows.extend(self._rows(seg, pos[seg_ids[pos] == sel]))
+            return rows
+    
+    async def fetch_after_id(self, after_id: int, limit: int) -> List[tuple]:
+        return await asyncio.to_thread(self._fetch_after_id, after_id, limit)
+    
+    def _fetch_after_id(self, after_id: int, limit: int) -> List[tuple]:
+        with self._lock:
+            rows = []
+            for seg in self._segments:
+                if not seg.count:
+                    continue
+                seg_ids = seg.records()["id"]
+                if seg_ids[-1] <= after_id:
+                    continue
+                pos = int(np.searchsorted(seg_ids, after_id, side="right"))
+                rows.extend(self._rows(seg, np.arange(pos, min(seg.count, pos + limit - len(rows)))))
+                if len(rows) >= limit:
+                    break
+            return rows
+    
+    def _select(self, since_ms: int, tipo_code: Optional[int] = None):
+        """(segmento, registros selecionados) com ts >= since_ms, via índice esparso"""
+        for seg in self._segments:
+            if not seg.count or seg.max_ts < since_ms:
+                continue
+            recs = seg.records()
+            for begin, end in seg.ranges(since_ms, _TS_MAX):
+                bloco = recs[begin:end]
+                mask = bloco["ts"] >= since_ms
+                if tipo_code is not None:
+                    mask &= bloco["tipo"] == tipo_code
+                yield seg, bloco[mask]
+    
+    async def count(self, tipo: str, since_ms: int) -> int:
+        return await asyncio.to_thread(self._count, tipo, since_ms)
+    
+    def _count(self, tipo: str, since_ms: int) -> int:
+        with self._lock:
+            code = self._codes["tipo"].get(tipo)
+            if code is None:
+                return 0
+            return int(sum(int(recs["count"].sum())
+                           for _, recs in self._select(since_ms + 1, code)))
+    
+    async def patterns(self, since_ms: int) -> List[tuple]:
+        return await asyncio.to_thread(self._patterns, since_ms)
+    
+    def _patterns(self, since_ms: int) -> List[tuple]:
+        with self._lock:
+            counts: Dict[tuple, int] = {}
+            for _, recs in self._select(since_ms):
+                if not len(recs):
+                    continue
+                # Agrupa pelo par de códigos (tipo, resultado), ponderando por count
+                pares = recs["tipo"].astype(np.int64) << 32 | recs["resultado"]
+                chaves, inverso = np.unique(pares, return_inverse=True)
+                somas = np.bincount(inverso, weights=recs["count"])
+                for chave, soma in zip(chaves, somas):
+                    key = (int(chave) >> 32, int(chave) & 0xFFFFFFFF)
+                    counts[key] = counts.get(key, 0) + int(soma)
+            return sorted(((self._symbols["tipo"][tipo], self._symbols["resultado"][resultado], count)
+                           for (tipo, resultado), count in counts.items()),
+                          key=lambda item: item[2], reverse=True)
+    
+    async def fetch_emotional(self, min_weight: float, limit: int = 50) -> List[tuple]:
+        return await asyncio.to_thread(self._fetch_emotional, min_weight, limit)
+    
+    def _fetch_emotional(self, min_weight: float, limit: int) -> List[tuple]:
+        with self._lock:
+            pesos, tss, segs, posicoes = [], [], [], []
+            for k, seg in enumerate(self._segments):
+                if not seg.count:
+                    continue
+                recs = seg.records()
+                pos = np.nonzero(recs["peso"] >= min_weight)[0]
+                pesos.append(recs["peso"][pos])
+                tss.append(recs["ts"][pos])
+                segs.append(np.full(len(pos), k))
+                posicoes.append(pos)
+            if not pesos:
+                return []
+            order = np.lexsort((-np.concatenate(tss), -np.concatenate(pesos)))[:limit]
+            return self._rows_in_order(np.concatenate(segs)[order],
+                                       np.concatenate(posicoes)[order])
+    
+    async def import_rows(self, rows: List[tuple]) -> List[int]:
+        return await asyncio.to_thread(self._import_rows, rows)
+    
+    def _import_rows(self, rows: List[tuple]) -> List[int]:
+        """Append-only: só entram ids maiores que o último gravado"""
+        with self._lock:
+            novos = sorted((row for row in rows if row[0] > self._last_id), key=lambda row: row[0])
+            self._append([row[1:] for row in novos], ids=[row[0] for row in novos])
+            return [row[0] for row in novos]
+    
+    async def consolidate(self, now: Optional[datetime] = None) -> Dict:
+        """
+        Compactação dos segmentos selados
+        Eventos antigos de baixo peso vão para o arquivo mensal (se houver)
+        e saem do log; segmentos vizinhos que cabem num só são juntados
+        """
+        if self._compact_lock is None:
+            self._compact_lock = asyncio.Lock()
+        async with self._compact_lock:
+            start = time.perf_counter()
+            now = now or datetime.now()
+            cutoff = int((now - timedelta(days=self.hot_days)).timestamp() * 1000)
+            plano = await asyncio.to_thread(self._plan_compaction, cutoff)
+            removidos = 0
+            for seg, keep in plano:
+                if self.archive is not None and not keep.all():
+                    # Arquivo primeiro: se cair no meio, nada se perde
+                    await self.archive.write(await asyncio.to_thread(self._rows_at, seg, ~keep))
+                    removidos += int((~keep).sum())
+            reescritos = await asyncio.to_thread(self._rewrite, plano)
+            self.archived += removidos
+            self.last_compaction_ms = (time.perf_counter() - start) * 1000
+            if reescritos:
+                self.compactions += 1
+                logger.info(f"Log de memória compactado: {removidos} eventos arquivados, "
+                            f"{reescritos} segmentos reescritos ({self.last_compaction_ms:.0f}ms)")
+            return {"archived": removidos, "summarized": 0, "segments_rewritten": reescritos}
+    
+    def _plan_compaction(self, cutoff: int) -> List[tuple]:
+        """(segmento selado, máscara dos registros que ficam)"""
+        with self._lock:
+            plano = []
+            for seg in self._segments:
+                if not seg.sealed:
+                    continue
+                recs = seg.records()
+                keep = np.ones(seg.count, dtype=bool)
+                if self.archive is not None:
+                    keep = ~((recs["ts"] < cutoff) & (recs["peso"] < self.keep_weight))
+                plano.append((seg, keep))
+            return plano
+    
+    def _rows_at(self, seg: _Segment, mask: np.ndarray) -> List[tuple]:
+        with self._lock:
+            return self._rows(seg, np.nonzero(mask)[0])
+    
+    def _rewrite(self, plano: List[tuple]) -> int:
+        """Reescreve grupos de segmentos selados vizinhos; retorna quantos foram reescritos"""
+        grupos: List[list] = []
+        atual: list = []
+        n_atual = bytes_atual = 0
+        with self._lock:
+            for seg, keep in plano:
+                n = int(keep.sum())
+                b = int(seg.records()["payload_len"][keep].sum())
+                if atual and (n_atual + n > self.segment_records
+                              or bytes_atual + b > self.segment_bytes):
+                    grupos.append(atual)
+                    atual, n_atual, bytes_atual = [], 0, 0
+                atual.append((seg, keep))
+                n_atual += n
+                bytes_atual += b
+            if atual:
+                grupos.append(atual)
+            
+            reescritos = 0
+            for grupo in grupos:
+                if len(grupo) == 1 and grupo[0][1].all():
+                    continue
+                self._write_compacted(grupo)
+                reescritos += len(grupo)
+            return reescritos
+    
+    def _write_compacted(self, grupo: List[tuple]):
+        """
+        Junta os registros mantidos do grupo num segmento selado novo, a
+        geração seguinte do primeiro do grupo, em arquivos novos: .dat
+        primeiro e depois o .rec, cuja troca de nome (os.replace) é o passo
+        único que o põe em vigor. Só então os segmentos antigos são apagados;
+        sobras de um passo interrompido são removidas na abertura
+        """
+        alvo = grupo[0][0]
+        partes = []
+        payload = bytearray()
+        for seg, keep in grupo:
+            recs = seg.records()[keep].copy()
+            for i in range(len(recs)):
+                off, size = int(recs["payload_off"][i]), int(recs["payload_len"][i])
+                dados = seg.payload(off, size)
+                if seg.version < LOG_FORMAT_VERSION:
+                    dados = _encode_payload(*_decode_payload(dados, seg.version))
+                recs["payload_off"][i] = len(payload)
+                recs["payload_len"][i] = len(dados)
+                payload += dados
+            partes.append(recs)
+        recs = np.concatenate(partes) if partes else np.zeros(0, dtype=_RECORD)
+        
+        posicao = self._segments.index(alvo)
+        novo = None
+        if len(recs):
+            header = bytearray(_HEADER_SIZE)
+            _HEADER.pack_into(header, 0, _MAGIC, LOG_FORMAT_VERSION, 1, len(recs), len(payload))
+            novo = _Segment(self.path, alvo.seq, alvo.gen + 1)
+            for path, data in ((novo.dat_path, bytes(payload)),
+                               (novo.rec_path, bytes(header) + recs.tobytes())):
+                with open(path + ".tmp", "wb") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(path + ".tmp", path)
+            _fsync_dir(self.path)
+            novo = _Segment.load(self.path, alvo.seq, alvo.gen + 1)
+            novo.write_index()
+        for seg, _ in grupo:
+            seg.remove()
+        self._segments[posicao:posicao + len(grupo)] = [novo] if novo is not None else []
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "backend": self.name,
+                "segments": len(self._segments),
+                "records": sum(seg.count for seg in self._segments),
+                "disk_bytes": sum(seg.disk_bytes() for seg in self._segments),
+                "records_written": self.records_written,
+                "rollovers": self.rollovers,
+                "compactions": self.compactions,
+                "archived": self.archived,
+                "last_scan_ms": round(self.last_scan_ms, 3),
+                "last_scan_ranges": self.last_scan_ranges,
+                "last_compaction_ms": round(self.last_compaction_ms, 3)
+            }
@@ -5,10 +5,56 @@ O LLM apenas verbaliza decisões já tomadas
 NUNCA decide emoções ou iniciativa
 """
 
-import ollama
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Tuple
 import pyttsx3
+import asyncio
 import threading
+import time
+
+from .audio_cache import AudioCache
+from .llm_backend import LLMBackend, LLMUnavailable, OllamaBackend
+from .response_bank import ResponseBank
+from .tts_worker import PRIORITY_NORMAL, TTSWorker
+
+
+class SentenceSegmenter:
+    """
+    Corta o texto em frases conforme os tokens chegam
+    Fronteira: pontuação final seguida de espaço, ou quebra de linha.
+    Vírgula, ponto e vírgula e dois pontos só cortam trechos com pelo
+    menos min_clause caracteres, para não picotar a fala
+    """
+    
+    SENTENCE_END = ".!?…"
+    CLAUSE_END = ",;:"
+    
+    def __init__(self, min_clause: int = 40):
+        self.min_clause = min_clause
+        self._buffer = ""
+    
+    def feed(self, token: str) -> List[str]:
+        """Acrescenta um token; retorna os trechos completos"""
+        buffer = self._buffer + token
+        segments = []
+        start = 0
+        for i in range(1, len(buffer)):
+            if not buffer[i].isspace():
+                continue
+            anterior = buffer[i - 1]
+            if (buffer[i] == "\n" or anterior in self.SENTENCE_END
+                    or (anterior in self.CLAUSE_END and i - start >= self.min_clause)):
+                segment = buffer[start:i].strip()
+                if segment:
+                    segments.append(segment)
+                start = i + 1
+        self._buffer = buffer[start:]
+        return segments
+    
+    def flush(self) -> Optional[str]:
+        """Fim do texto: devolve o que sobrou"""
+        segment = self._buffer.strip()
+        self._buffer = ""
+        return segment or None
 
 
 class ExpressionSystem:
@@ -17,73 +63,196 @@ class ExpressionSystem:
     LLM recebe ordens claras e apenas verbaliza
     """
     
-    def __init__(self, model: str = "phi3", base_url: str = "http://localhost:11434"):
-        self.model = model
-        self.base_url = base_url
-        self.tts_engine = None
-        self._init_tts()
+    # Opções de geração do LLM
+    LLM_OPTIONS = {
+        "temperature": 0.7,  # Criatividade controlada
+        "top_p": 0.9,
+    }
     
-    def _init_tts(self):
-        """Inicializa engine de TTS"""
-        try:
-            self.tts_engine = pyttsx3.init()
-            # Configurações de voz (ajustar conforme disponível)
-            voices = self.tts_engine.getProperty('voices')
-            if voices:
-                # Tenta usar voz feminina se disponível
-                for voice in voices:
-                    if 'female' in voice.name.lower() or 'pt' in voice.id.lower():
-                        self.tts_engine.setProperty('voice', voice.id)
-                        break
-            self.tts_engine.setProperty('rate', 150)  # Velocidade da fala
-        except Exception as e:
-            print(f"Erro ao inicializar TTS: {e}")
-            self.tts_engine = None
+    # Grupo das falas do LLM na fila do TTS (uma fala nova descarta a anterior)
+    SPEECH_GROUP = "fala"
+    
+    # Respostas mínimas possíveis (sem LLM); pré-renderizadas no cache de áudio
+    MINIMAL_RESPONSES = [
+        "...",
+        "Hmm...",
+        "Ok.",
+        "Entendi.",
+    ]
+    
+    # Regras fundamentais
+    RULES = [
+        "Você NÃO é um assistente.",
+        "Você é uma presença doméstica.",
+        "Fale pouco. Frases curtas.",
+        "Seja imperfeita. Às vezes fale incompleto.",
+        "Não explique demais.",
+        "Não seja previsível.",
+        "Você NÃO decide emoções - elas já foram decididas.",
+        "Você NÃO decide iniciativa - você apenas verbaliza.",
+        "Seja natural. Como uma pessoa real.",
+    ]
+    
+    # Restrições por limiar: (campo, limite, acima do limite?, texto)
+    PERSONALITY_CONSTRAINTS = [
+        ("reservada", 0.5, True, "Você fala pouco. Prefere silêncio."),
+        ("afetuosa", 0.6, True, "Você é afetuosa, mas não exagerada."),
+        ("ironica", 0.4, True, "Você tem um toque de ironia sutil."),
+        ("observadora", 0.7, True, "Você observa antes de falar."),
+        ("curiosa", 0.6, True, "Você é curiosa, mas não invasiva."),
+    ]
+    # Estado emocional (contexto, não comando)
+    EMOTIONAL_CONSTRAINTS = [
+        ("energia", 0.3, False, "Você está com pouca energia. Fale pouco."),
+        ("irritacao", 0.5, True, "Você está um pouco irritada. Seja breve."),
+        ("necessidade_social", 0.7, True, "Você sente necessidade de interação."),
+    ]
+    
+    def __init__(self, model: str = "phi3", base_url: str = "http://localhost:11434",
+                 deadline: float = 8.0, tts_queue_size: int = 16, tts_max_age: float = 10.0,
+                 audio_cache: Optional[AudioCache] = None, keep_alive: Optional[str] = "30m",
+                 response_bank: Optional[ResponseBank] = None, bank_primary: bool = False,
+                 llm: Optional[LLMBackend] = None):
+        # LLM: Ollama em model/base_url, a menos que outro backend seja dado
+        self.llm = llm or OllamaBackend(model, base_url, keep_alive=keep_alive)
+        self.model = self.llm.model
+        self.deadline = deadline  # Prazo padrão (s) de generate_response_async
+        
+        # Trechos do prompt já montados, por estado quantizado
+        self._quantize_personality = self._compile_quantizer(self.PERSONALITY_CONSTRAINTS)
+        self._quantize_emotional = self._compile_quantizer(self.EMOTIONAL_CONSTRAINTS)
+        self._prefix_cache: Dict[tuple, str] = {}
+        self._prompt_cache: Dict[tuple, str] = {}
+        self._situational_cache: Dict[tuple, List[str]] = {}
+        
+        # Banco de respostas offline: fallback do LLM ou, com bank_primary,
+        # o caminho principal (o LLM só cobre as chaves que faltam)
+        if response_bank is not None and not response_bank.compatible(self.bank_constraints()):
+            print("Banco de respostas gerado com outras restrições; ignorado (regere o banco)")
+            response_bank = None
+        self.response_bank = response_bank
+        self.bank_primary = bank_primary and response_bank is not None
+        if audio_cache is not None:
+            audio_cache.pin(self.MINIMAL_RESPONSES)
+        self.tts = TTSWorker(self._create_tts_engine, max_queue=tts_queue_size,
+                             max_age=tts_max_age, audio_cache=audio_cache)
+        self._inflight: Optional[asyncio.Task] = None
+        
+        # Métricas do caminho assíncrono
+        self.requests = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.superseded = 0
+        self.errors = 0
+        self.short_circuits = 0  # Pedidos barrados pelo disjuntor do LLM
+        self.last_llm_ms = 0.0
+        self.max_llm_ms = 0.0
+        self._total_llm_ms = 0.0
+        
+        # Métricas da fala em streaming (ms desde o pedido)
+        self.last_first_token_ms = 0.0
+        self.last_first_audio_ms = 0.0
+        self.max_first_audio_ms = 0.0
+        self._total_first_audio_ms = 0.0
+        self._first_audio_count = 0
+        
+        self.barge_ins = 0
+        
+        # Avaliação do prompt informada pelo Ollama (tokens avaliados caem
+        # quando o prefixo é reaproveitado)
+        self.last_prompt_eval_tokens = 0
+        self.last_prompt_eval_ms = 0.0
+        self.last_eval_tokens = 0
+        
+        self.tts.start()
+    
+    @property
+    def tts_engine(self):
+        """Engine do TTS (None se não inicializou); só o worker fala com ele"""
+        return self.tts.engine
+    
+    def _create_tts_engine(self):
+        """Cria o engine de TTS (chamado na thread do worker)"""
+        engine = pyttsx3.init()
+        # Configurações de voz (ajustar conforme disponível)
+        voices = engine.getProperty('voices')
+        if voices:
+            # Tenta usar voz feminina se disponível
+            for voice in voices:
+                if 'female' in voice.name.lower() or 'pt' in voice.id.lower():
+                    engine.setProperty('voice', voice.id)
+                    break
+        engine.setProperty('rate', 150)  # Velocidade da fala
+        return engine
+    
+    @staticmethod
+    def _compile_quantizer(constraints: List[tuple]):
+        """
+        Estado contínuo → quais restrições valem (uma comparação por
+        restrição); a tabela é fixada uma vez, fora do caminho quente
+        """
+        tabela = tuple((campo, limite, acima) for campo, limite, acima, _ in constraints)
+        return lambda estado: tuple(
+            (estado.get(campo, 0) > limite) if acima else (estado.get(campo, 0) < limite)
+            for campo, limite, acima in tabela
+        )
     
     def _build_system_prompt(self, personalidade: Dict, emocional: Dict, 
                             situacional: Dict) -> str:
         """
         Constrói prompt do sistema
         Define claramente o papel do LLM
+        O prefixo (regras + personalidade) sai idêntico entre chamadas, e o
+        Ollama reaproveita o KV cache dele; só o trecho emocional, no fim,
+        varia. O prompt fica em cache pelo estado quantizado
         """
-        constraints = []
-        
-        # Personalidade
-        if personalidade.get("reservada", 0) > 0.5:
-            constraints.append("Você fala pouco. Prefere silêncio.")
-        if personalidade.get("afetuosa", 0) > 0.6:
-            constraints.append("Você é afetuosa, mas não exagerada.")
-        if personalidade.get("ironica", 0) > 0.4:
-            constraints.append("Você tem um toque de ironia sutil.")
-        if personalidade.get("observadora", 0) > 0.7:
-            constraints.append("Você observa antes de falar.")
-        if personalidade.get("curiosa", 0) > 0.6:
-            constraints.append("Você é curiosa, mas não invasiva.")
-        
-        # Estado emocional (contexto, não comando)
-        if emocional.get("energia", 0) < 0.3:
-            constraints.append("Você está com pouca energia. Fale pouco.")
-        if emocional.get("irritacao", 0) > 0.5:
-            constraints.append("Você está um pouco irritada. Seja breve.")
-        if emocional.get("necessidade_social", 0) > 0.7:
-            constraints.append("Você sente necessidade de interação.")
-        
-        # Regras fundamentais
-        rules = [
-            "Você NÃO é um assistente.",
-            "Você é uma presença doméstica.",
-            "Fale pouco. Frases curtas.",
-            "Seja imperfeita. Às vezes fale incompleto.",
-            "Não explique demais.",
-            "Não seja previsível.",
-            "Você NÃO decide emoções - elas já foram decididas.",
-            "Você NÃO decide iniciativa - você apenas verbaliza.",
-            "Seja natural. Como uma pessoa real.",
-        ]
+        chave_personalidade = self._quantize_personality(personalidade)
+        chave = chave_personalidade + self._quantize_emotional(emocional)
+        prompt = self._prompt_cache.get(chave)
+        if prompt is not None:
+            return prompt
+        
+        prefixo = self._prefix_cache.get(chave_personalidade)
+        if prefixo is None:
+            prefixo = "\n".join(self.RULES) + "\n\n" + "\n".join(
+                texto for ativa, (_, _, _, texto)
+                in zip(chave_personalidade, self.PERSONALITY_CONSTRAINTS) if ativa
+            )
+            self._prefix_cache[chave_personalidade] = prefixo
         
-        prompt = "\n".join(rules) + "\n\n" + "\n".join(constraints)
+        fragmento = "\n".join(
+            texto for ativa, (_, _, _, texto)
+            in zip(chave[len(chave_personalidade):], self.EMOTIONAL_CONSTRAINTS) if ativa
+        )
+        if fragmento and any(chave_personalidade):
+            fragmento = "\n" + fragmento
+        
+        prompt = prefixo + fragmento
+        self._prompt_cache[chave] = prompt
         return prompt
     
+    def _build_messages(self, decisao: Dict, personalidade: Dict, emocional: Dict,
+                        situacional: Dict, memoria_recente: List) -> List[Dict]:
+        """Mensagens do chat: prompt do sistema + contexto da decisão"""
+        system_prompt = self._build_system_prompt(personalidade, emocional, situacional)
+        user_prompt = self._build_user_prompt(decisao, situacional, memoria_recente)
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    def warmup_messages(self, personalidade: Dict, emocional: Dict,
+                        situacional: Dict) -> List[Dict]:
+        """
+        Pedido mínimo de aquecimento: o prompt do sistema de verdade, para o
+        prefixo já estar no KV cache no primeiro FALAR
+        """
+        return [
+            {"role": "system", "content": self._build_system_prompt(personalidade, emocional,
+                                                                    situacional)},
+            {"role": "user", "content": "Ok."}
+        ]
+    
     def generate_response(self,
                          decisao: Dict,
                          personalidade: Dict,
@@ -93,36 +262,26 @@ class ExpressionSystem:
         """
         Gera resposta usando LLM
         O LLM apenas verbaliza a decisão já tomada
+        Bloqueia até o fim da geração; dentro do loop de eventos use
+        generate_response_async
         """
         memoria_recente = memoria_recente or []
         
         # Se decisão é silêncio ou nada, retorna vazio ou frase mínima
         if decisao.get("tipo") in ["silenciar", "nada"]:
-            # Às vezes fala algo mínimo, às vezes não
-            import random
-            if random.random() < 0.3:  # 30% de chance de falar algo mínimo
-                return self._generate_minimal_response(decisao, emocional)
-            return ""
+            return self._silent_response(decisao, emocional)
         
-        # Constrói prompt do sistema
-        system_prompt = self._build_system_prompt(personalidade, emocional, situacional)
+        if self.bank_primary:
+            texto = self._bank_response(decisao, personalidade, emocional)
+            if texto:
+                return self._apply_imperfection(texto)
         
-        # Constrói contexto da decisão
-        user_prompt = self._build_user_prompt(decisao, situacional, memoria_recente)
+        messages = self._build_messages(decisao, personalidade, emocional,
+                                        situacional, memoria_recente)
         
         try:
             # Chama LLM
-            response = ollama.chat(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                options={
-                    "temperature": 0.7,  # Criatividade controlada
-                    "top_p": 0.9,
-                }
-            )
+            response = self.llm.chat_sync(messages, self.LLM_OPTIONS)
             
             texto = response['message']['content'].strip()
             
@@ -130,11 +289,381 @@ class ExpressionSystem:
             texto = self._apply_imperfection(texto)
             
             return texto
-            
+        
+        except LLMUnavailable:
+            self.short_circuits += 1
+            return self._generate_minimal_response(decisao, emocional, personalidade)
+        except Exception as e:
+            print(f"Erro ao gerar resposta com LLM: {e}")
+            # Fallback: banco de respostas ou resposta mínima
+            return self._generate_minimal_response(decisao, emocional, personalidade)
+    
+    async def generate_response_async(self,
+                                      decisao: Dict,
+                                      personalidade: Dict,
+                                      emocional: Dict,
+                                      situacional: Dict,
+                                      memoria_recente: List = None,
+                                      deadline: Optional[float] = None) -> str:
+        """
+        Gera resposta sem bloquear o loop de eventos (cliente HTTP assíncrono)
+        deadline: segundos até desistir do LLM e cair na resposta mínima
+        (padrão: self.deadline). Um pedido novo cancela o anterior ainda em
+        andamento; o pedido superado retorna ""
+        """
+        memoria_recente = memoria_recente or []
+        
+        if decisao.get("tipo") in ["silenciar", "nada"]:
+            return self._silent_response(decisao, emocional)
+        
+        if self.bank_primary:
+            texto = self._bank_response(decisao, personalidade, emocional)
+            if texto:
+                return self._apply_imperfection(texto)
+        
+        messages = self._build_messages(decisao, personalidade, emocional,
+                                        situacional, memoria_recente)
+        
+        # A decisão mais nova substitui a anterior: cancelar a requisição
+        # fecha a conexão e o servidor para de gerar
+        anterior = self._inflight
+        if anterior is not None and not anterior.done():
+            anterior.cancel()
+        task = asyncio.create_task(self._chat(messages))
+        self._inflight = task
+        self.requests += 1
+        start = time.perf_counter()
+        
+        try:
+            texto = await asyncio.wait_for(task, self.deadline if deadline is None else deadline)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return self._generate_minimal_response(decisao, emocional, personalidade)
+        except asyncio.CancelledError:
+            if self._inflight is task:
+                raise  # Quem chamou foi cancelado, não superado
+            self.superseded += 1
+            return ""
+        except LLMUnavailable:
+            self.short_circuits += 1
+            return self._generate_minimal_response(decisao, emocional, personalidade)
+        except Exception as e:
+            self.errors += 1
+            print(f"Erro ao gerar resposta com LLM: {e}")
+            return self._generate_minimal_response(decisao, emocional, personalidade)
+        finally:
+            if self._inflight is task:
+                self._inflight = None
+        
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.completed += 1
+        self.last_llm_ms = elapsed_ms
+        self.max_llm_ms = max(self.max_llm_ms, elapsed_ms)
+        self._total_llm_ms += elapsed_ms
+        
+        return self._apply_imperfection(texto)
+    
+    async def _chat(self, messages: List[Dict]) -> str:
+        """Uma chamada ao LLM pelo backend assíncrono"""
+        response = await self.llm.chat(messages, self.LLM_OPTIONS)
+        self._record_eval(response)
+        return response['message']['content'].strip()
+    
+    def _record_eval(self, response: Dict):
+        """Guarda as contagens de avaliação da resposta final do Ollama"""
+        self.last_prompt_eval_tokens = response.get('prompt_eval_count', 0)
+        self.last_prompt_eval_ms = response.get('prompt_eval_duration', 0) / 1e6
+        self.last_eval_tokens = response.get('eval_count', 0)
+    
+    async def speak_response_stream(self,
+                                    decisao: Dict,
+                                    personalidade: Dict,
+                                    emocional: Dict,
+                                    situacional: Dict,
+                                    memoria_recente: List = None,
+                                    deadline: Optional[float] = None) -> str:
+        """
+        Gera e fala ao mesmo tempo: os tokens do LLM viram frases que vão
+        para o TTS enquanto o resto ainda está sendo gerado
+        deadline: prazo até a primeira frase e, depois, entre tokens; sem
+        nenhuma frase no prazo, fala a resposta mínima
+        Como em generate_response_async, um pedido novo cancela o anterior
+        Retorna o texto falado (para a memória)
+        """
+        memoria_recente = memoria_recente or []
+        
+        if decisao.get("tipo") in ["silenciar", "nada"]:
+            texto = self._silent_response(decisao, emocional)
+            if texto:
+                await self._say(texto)
+            return texto
+        
+        if self.bank_primary:
+            texto = self._bank_response(decisao, personalidade, emocional)
+            if texto:
+                return await self.speak_prepared(texto)
+        
+        messages = self._build_messages(decisao, personalidade, emocional,
+                                        situacional, memoria_recente)
+        
+        anterior = self._inflight
+        if anterior is not None and not anterior.done():
+            anterior.cancel()
+        # Frases da fala anterior que ainda não saíram perderam a vez
+        self.tts.clear(self.SPEECH_GROUP)
+        falado: List[str] = []
+        task = asyncio.create_task(self._stream(
+            messages, self.deadline if deadline is None else deadline,
+            decisao, personalidade, emocional, falado
+        ))
+        self._inflight = task
+        self.requests += 1
+        
+        try:
+            await task
+        except asyncio.CancelledError:
+            if self._inflight is task:
+                raise
+            # Superado: o que já foi falado continua valendo
+            self.superseded += 1
+        finally:
+            if self._inflight is task:
+                self._inflight = None
+        
+        return " ".join(falado)
+    
+    async def _stream(self, messages: List[Dict], deadline: float, decisao: Dict,
+                      personalidade: Dict, emocional: Dict, falado: List[str]):
+        """
+        Consome o stream do LLM, segmenta e enfileira as frases para o TTS
+        A imperfeição é sorteada antes: o corte cai na frase em que o texto
+        passa de 20 caracteres e encerra a geração; a pontuação final sai
+        só do texto devolvido (a entonação do TTS é a mesma)
+        """
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        t0 = time.perf_counter()
+        falas: List[asyncio.Future] = []
+        segmentador = SentenceSegmenter()
+        cortar, sem_pontuacao = self._imperfection_plan()
+        tamanho = 0
+        stream = None
+        falhou = False
+        
+        def emitir(segmento: str) -> bool:
+            """Manda um trecho para o TTS; True se ele foi cortado (fim da fala)"""
+            nonlocal tamanho
+            tamanho += len(segmento)
+            cortado = cortar and tamanho > 20 and len(segmento) >= 10
+            if cortado:
+                segmento = self._cut(segmento)
+            falado.append(segmento)
+            falas.append(self._say(segmento, t0 if not falas else None))
+            return cortado
+        
+        def prazo() -> float:
+            # Até a primeira frase o prazo é do pedido; depois, entre tokens
+            return deadline if falado else start + deadline - loop.time()
+        
+        try:
+            stream = self.llm.stream(messages, self.LLM_OPTIONS)
+            chunks = stream.__aiter__()
+            primeiro = True
+            cortado = False
+            while not cortado:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), prazo())
+                except StopAsyncIteration:
+                    resto = segmentador.flush()
+                    if resto:
+                        emitir(resto)
+                    break
+                if primeiro:
+                    primeiro = False
+                    self.last_first_token_ms = (loop.time() - start) * 1000
+                if chunk.get('done'):
+                    self._record_eval(chunk)
+                for segmento in segmentador.feed(chunk['message']['content']):
+                    cortado = emitir(segmento)
+                    if cortado:
+                        break
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            falhou = True
+        except LLMUnavailable:
+            self.short_circuits += 1
+            falhou = True
         except Exception as e:
+            self.errors += 1
+            falhou = True
             print(f"Erro ao gerar resposta com LLM: {e}")
-            # Fallback: resposta mínima
+        else:
+            elapsed_ms = (loop.time() - start) * 1000
+            self.completed += 1
+            self.last_llm_ms = elapsed_ms
+            self.max_llm_ms = max(self.max_llm_ms, elapsed_ms)
+            self._total_llm_ms += elapsed_ms
+        finally:
+            if stream is not None:
+                await stream.aclose()
+        
+        # Nada dito no prazo: banco de respostas ou resposta mínima. Depois
+        # da primeira frase, uma falha só encerra a fala
+        if falhou and not falado:
+            minima = self._generate_minimal_response(decisao, emocional, personalidade)
+            if minima:
+                falado.append(minima)
+                falas.append(self._say(minima, t0))
+        
+        if sem_pontuacao and falado and falado[-1].endswith(('.', '!', '?')):
+            falado[-1] = falado[-1][:-1]
+        
+        # Espera o TTS terminar (ou descartar) as frases desta fala
+        if falas:
+            await asyncio.gather(*falas)
+    
+    def _say(self, texto: str, t0: Optional[float] = None) -> asyncio.Future:
+        """
+        Enfileira uma fala no worker de TTS; o future resolve com o status
+        final (spoken, stale, cancelled...). Com t0 (perf_counter do pedido),
+        mede o tempo até o primeiro áudio quando o worker começa a falar
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        
+        def resolver(status: str):
+            if not future.done():
+                future.set_result(status)
+        
+        def on_done(utterance):
+            loop.call_soon_threadsafe(resolver, utterance.status)
+        
+        on_start = None
+        if t0 is not None:
+            def on_start(utterance):
+                self._record_first_audio((time.perf_counter() - t0) * 1000)
+        
+        self.tts.submit(texto, PRIORITY_NORMAL, group=self.SPEECH_GROUP,
+                        on_start=on_start, on_done=on_done)
+        return future
+    
+    def _record_first_audio(self, elapsed_ms: float):
+        self.last_first_audio_ms = elapsed_ms
+        self.max_first_audio_ms = max(self.max_first_audio_ms, elapsed_ms)
+        self._total_first_audio_ms += elapsed_ms
+        self._first_audio_count += 1
+    
+    def barge_in(self) -> bool:
+        """
+        Interrompe a fala: cancela a geração em andamento, descarta a fila
+        do TTS e para a frase atual. A fala interrompida devolve o que já
+        foi dito. Retorna se havia algo a interromper
+        """
+        pendente = self._inflight
+        self._inflight = None  # Para quem esperava, é como ser superado
+        gerando = pendente is not None and not pendente.done()
+        if gerando:
+            pendente.cancel()
+        descartadas = self.tts.clear()
+        interrompida = self.tts.cancel_current()
+        if gerando or descartadas or interrompida:
+            self.barge_ins += 1
+            return True
+        return False
+    
+    def prompt_state(self, motivo: str, personalidade: Dict, emocional: Dict,
+                     situacional: Dict) -> tuple:
+        """
+        O que distingue um prompt de outro (a menos da memória recente):
+        motivo, restrições ativas do prompt do sistema e presença/estado
+        """
+        return (motivo,
+                self._quantize_personality(personalidade) + self._quantize_emotional(emocional),
+                (bool(situacional.get("usuario_presente")), situacional.get("usuario_estado")))
+    
+    @property
+    def busy(self) -> bool:
+        """Há uma geração de fala em andamento"""
+        return self._inflight is not None and not self._inflight.done()
+    
+    async def generate_candidate(self,
+                                 decisao: Dict,
+                                 personalidade: Dict,
+                                 emocional: Dict,
+                                 situacional: Dict,
+                                 memoria_recente: List = None,
+                                 deadline: Optional[float] = None) -> Optional[str]:
+        """
+        Texto cru do LLM para uma decisão hipotética (pré-geração), sem
+        imperfeição e sem cancelar nem ser cancelado por pedidos reais
+        None se falhar ou estourar o prazo
+        """
+        messages = self._build_messages(decisao, personalidade, emocional,
+                                        situacional, memoria_recente or [])
+        try:
+            texto = await asyncio.wait_for(
+                self._chat(messages), self.deadline if deadline is None else deadline
+            )
+        except (asyncio.TimeoutError, LLMUnavailable):
+            return None
+        except Exception as e:
+            print(f"Erro ao pré-gerar resposta com LLM: {e}")
+            return None
+        return texto or None
+    
+    async def speak_prepared(self, texto: str) -> str:
+        """
+        Fala um texto já gerado (pré-geração): aplica a imperfeição e
+        manda frase a frase para o TTS. Como nas falas geradas, um pedido
+        novo ou um barge-in interrompe; retorna só as frases faladas
+        """
+        anterior = self._inflight
+        if anterior is not None and not anterior.done():
+            anterior.cancel()
+        self.tts.clear(self.SPEECH_GROUP)
+        
+        texto = self._apply_imperfection(texto)
+        segmentador = SentenceSegmenter()
+        segmentos = segmentador.feed(texto)
+        resto = segmentador.flush()
+        if resto:
+            segmentos.append(resto)
+        if not segmentos:
+            return ""
+        
+        t0 = time.perf_counter()
+        falas = [self._say(segmento, t0 if i == 0 else None)
+                 for i, segmento in enumerate(segmentos)]
+        # asyncio.wait não cancela as falas junto com a tarefa: interrompidas,
+        # elas ainda resolvem com o status final (o TTS sempre chama on_done)
+        task = asyncio.create_task(asyncio.wait(falas))
+        self._inflight = task
+        
+        try:
+            await task
+        except asyncio.CancelledError:
+            if self._inflight is task:
+                raise
+            self.superseded += 1
+            await asyncio.wait(falas)
+        finally:
+            if self._inflight is task:
+                self._inflight = None
+        
+        return " ".join(segmento for segmento, fala in zip(segmentos, falas)
+                        if fala.result() == "spoken")
+    
+    def cancel_pending(self):
+        """Cancela a geração em andamento (encerramento)"""
+        if self._inflight is not None and not self._inflight.done():
+            self._inflight.cancel()
+    
+    def _silent_response(self, decisao: Dict, emocional: Dict) -> str:
+        """Silêncio ou nada: às vezes fala algo mínimo, às vezes não"""
+        import random
+        if random.random() < 0.3:  # 30% de chance de falar algo mínimo
             return self._generate_minimal_response(decisao, emocional)
+        return ""
     
     def _build_user_prompt(self, decisao: Dict, situacional: Dict, 
                           memoria_recente: List) -> str:
@@ -144,11 +673,18 @@ class ExpressionSystem:
         # Motivo da decisão
         contexto.append(f"Motivo: {decisao.get('motivo', 'decisão autônoma')}")
         
-        # Situação atual
-        if situacional.get("usuario_presente"):
-            contexto.append("Usuário está presente.")
-            if situacional.get("usuario_estado") != "desconhecido":
-                contexto.append(f"Estado: {situacional.get('usuario_estado')}")
+        # Situação atual (trecho em cache por presença/estado)
+        chave = (bool(situacional.get("usuario_presente")), situacional.get("usuario_estado"))
+        situacao = self._situational_cache.get(chave)
+        if situacao is None:
+            situacao = []
+            if chave[0]:
+                situacao.append("Usuário está presente.")
+                if chave[1] != "desconhecido":
+                    situacao.append(f"Estado: {chave[1]}")
+            if len(self._situational_cache) < 256:
+                self._situational_cache[chave] = situacao
+        contexto.extend(situacao)
         
         # Memória recente (últimas 2-3 interações)
         if memoria_recente:
@@ -162,36 +698,64 @@ class ExpressionSystem:
         
         return "\n".join(contexto)
     
-    def _generate_minimal_response(self, decisao: Dict, emocional: Dict) -> str:
-        """Gera resposta mínima sem LLM (fallback)"""
+    def bank_constraints(self) -> Dict[str, list]:
+        """Restrições que definem a chave do banco de respostas (vão nos metadados)"""
+        return {
+            "personality": [[campo, limite, acima]
+                            for campo, limite, acima, _ in self.PERSONALITY_CONSTRAINTS],
+            "emotional": [[campo, limite, acima]
+                          for campo, limite, acima, _ in self.EMOTIONAL_CONSTRAINTS]
+        }
+    
+    def _bank_response(self, decisao: Dict, personalidade: Optional[Dict],
+                       emocional: Dict) -> Optional[str]:
+        """Fala do banco de respostas para a decisão e o estado atual, ou None"""
+        if self.response_bank is None or personalidade is None:
+            return None
+        estado = self._quantize_personality(personalidade) + self._quantize_emotional(emocional)
+        return self.response_bank.lookup(decisao.get("tipo", ""), decisao.get("motivo", ""),
+                                         estado)
+    
+    def _generate_minimal_response(self, decisao: Dict, emocional: Dict,
+                                   personalidade: Optional[Dict] = None) -> str:
+        """
+        Gera resposta mínima sem LLM (fallback)
+        Com a personalidade, tenta antes o banco de respostas
+        """
         import random
         
-        # Respostas mínimas possíveis
-        minimas = [
-            "...",
-            "Hmm...",
-            "Ok.",
-            "Entendi.",
-        ]
+        texto = self._bank_response(decisao, personalidade, emocional)
+        if texto:
+            return texto
         
         # Às vezes retorna vazio mesmo
         if random.random() < 0.5:
             return ""
         
-        return random.choice(minimas)
+        return random.choice(self.MINIMAL_RESPONSES)
     
-    def _apply_imperfection(self, texto: str) -> str:
-        """Aplica imperfeição controlada ao texto"""
+    def _imperfection_plan(self) -> Tuple[bool, bool]:
+        """Sorteia a imperfeição de uma fala: (cortar no meio, tirar pontuação final)"""
         import random
         
         # Às vezes corta frase no meio (10% de chance)
-        if random.random() < 0.1 and len(texto) > 20:
-            # Corta em algum ponto e adiciona "..."
-            cut_point = random.randint(len(texto) // 2, len(texto) - 5)
-            texto = texto[:cut_point] + "..."
-        
         # Remove pontuação final às vezes (5% de chance)
-        if random.random() < 0.05 and texto.endswith(('.', '!', '?')):
+        return random.random() < 0.1, random.random() < 0.05
+    
+    def _cut(self, texto: str) -> str:
+        """Corta em algum ponto da segunda metade e adiciona "..." """
+        import random
+        cut_point = random.randint(len(texto) // 2, len(texto) - 5)
+        return texto[:cut_point] + "..."
+    
+    def _apply_imperfection(self, texto: str) -> str:
+        """Aplica imperfeição controlada ao texto"""
+        cortar, sem_pontuacao = self._imperfection_plan()
+        
+        if cortar and len(texto) > 20:
+            texto = self._cut(texto)
+        
+        if sem_pontuacao and texto.endswith(('.', '!', '?')):
             texto = texto[:-1]
         
         return texto
@@ -199,19 +763,66 @@ class ExpressionSystem:
     def speak(self, texto: str, async_mode: bool = True):
         """
         Fala o texto usando TTS
+        Enfileira no worker de TTS; com async_mode=False, espera terminar
         """
         if not texto or not self.tts_engine:
             return
         
-        def _speak_thread():
-            try:
-                self.tts_engine.say(texto)
-                self.tts_engine.runAndWait()
-            except Exception as e:
-                print(f"Erro ao falar: {e}")
-        
         if async_mode:
-            thread = threading.Thread(target=_speak_thread, daemon=True)
-            thread.start()
+            self.tts.submit(texto)
         else:
-            _speak_thread()
+            feito = threading.Event()
+            self.tts.submit(texto, on_done=lambda utterance: feito.set())
+            feito.wait()
+    
+    def close(self):
+        """Cancela a geração pendente, encerra o worker de TTS e solta o banco"""
+        self.cancel_pending()
+        self.close_resources()
+    
+    def close_resources(self):
+        """
+        Parte bloqueante do close (espera a thread do TTS): pode rodar fora do
+        loop, depois de cancel_pending() no loop
+        """
+        self.tts.stop()
+        if self.response_bank is not None:
+            self.response_bank.close()
+    
+    def get_stats(self) -> Dict:
+        """Retorna contadores e latências do LLM e da fala (caminho assíncrono)"""
+        return {
+            "model": self.model,
+            "llm": self.llm.get_stats(),
+            "deadline_s": self.deadline,
+            "requests": self.requests,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "superseded": self.superseded,
+            "errors": self.errors,
+            "short_circuits": self.short_circuits,
+            "pending": self._inflight is not None and not self._inflight.done(),
+            "last_llm_ms": round(self.last_llm_ms, 3),
+            "avg_llm_ms": round(self._total_llm_ms / self.completed, 3) if self.completed else 0.0,
+            "max_llm_ms": round(self.max_llm_ms, 3),
+            "last_first_token_ms": round(self.last_first_token_ms, 3),
+            "last_first_audio_ms": round(self.last_first_audio_ms, 3),
+            "avg_first_audio_ms": (
+                round(self._total_first_audio_ms / self._first_audio_count, 3)
+                if self._first_audio_count else 0.0
+            ),
+            "max_first_audio_ms": round(self.max_first_audio_ms, 3),
+            "barge_ins": self.barge_ins,
+            "last_prompt_eval_tokens": self.last_prompt_eval_tokens,
+            "last_prompt_eval_ms": round(self.last_prompt_eval_ms, 3),
+            "last_eval_tokens": self.last_eval_tokens,
+            "prompt_cache": {
+                "prefixes": len(self._prefix_cache),
+                "prompts": len(self._prompt_cache)
+            },
+            "response_bank": (
+                dict(self.response_bank.get_stats(), primary=self.bank_primary)
+                if self.response_bank else None
+            ),
+            "tts": self.tts.get_stats()
+        }
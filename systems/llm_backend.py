@@ -0,0 +1,149 @@
+"""
+Interface do LLM da expressão
+ExpressionSystem só conversa com um LLMBackend; o padrão é o Ollama.
+Respostas e pedaços do stream seguem o formato do chat do Ollama:
+{"message": {"content": ...}, "done": ..., "prompt_eval_count": ...,
+"prompt_eval_duration": ..., "eval_count": ...}
+"""
+
+from typing import AsyncIterator, Dict, List, Optional, Union
+import re
+import time
+
+import ollama
+
+_DURATION_RE = re.compile(r"(-?\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def keep_alive_seconds(keep_alive: Union[str, int, float, None]) -> Optional[float]:
+    """
+    keep_alive do Ollama em segundos: "30m", "1h30m", "300" ou 300;
+    negativo = para sempre (None); None = padrão do servidor (5 min)
+    """
+    if keep_alive is None:
+        return 300.0
+    if isinstance(keep_alive, (int, float)) or keep_alive.lstrip("-").replace(".", "", 1).isdigit():
+        segundos = float(keep_alive)
+    else:
+        partes = _DURATION_RE.findall(keep_alive)
+        if not partes or "".join(n + u for n, u in partes) != keep_alive.replace(" ", ""):
+            raise ValueError(f"keep_alive inválido: {keep_alive}")
+        segundos = sum(float(n) * _DURATION_UNITS[u] for n, u in partes)
+    return None if segundos < 0 else segundos
+
+
+class LLMUnavailable(Exception):
+    """Backend indisponível (ex.: disjuntor aberto); o chamador usa o fallback"""
+
+
+class LLMBackend:
+    """
+    Contrato de um backend de LLM
+    Obrigatórios: chat, stream e chat_sync. O stream é um gerador
+    assíncrono; fechá-lo (aclose) cancela a geração
+    ready e set_keep_alive são opcionais (aquecimento do modelo)
+    keep_alive em chat/stream vale só para aquele pedido (None = o do
+    set_keep_alive); é assim que um servidor ou corretor repassa o do cliente
+    """
+    
+    name = "base"
+    model = ""
+    last_used = 0.0  # time.monotonic() do último pedido
+    
+    async def chat(self, messages: List[Dict], options: Optional[Dict] = None,
+                   keep_alive: Optional[str] = None) -> Dict:
+        """Resposta completa (último pedaço do Ollama, com as contagens)"""
+        raise NotImplementedError
+    
+    def stream(self, messages: List[Dict], options: Optional[Dict] = None,
+               keep_alive: Optional[str] = None) -> AsyncIterator[Dict]:
+        """Pedaços da resposta; o último tem done=True e as contagens"""
+        raise NotImplementedError
+    
+    def chat_sync(self, messages: List[Dict], options: Optional[Dict] = None) -> Dict:
+        """Como chat, bloqueando (fora do loop de eventos)"""
+        raise NotImplementedError
+    
+    async def ready(self) -> Dict:
+        """Servidor no ar e modelo disponível? {"server", "model", "error"}"""
+        return {"server": True, "model": True, "error": None}
+    
+    def set_keep_alive(self, keep_alive: Optional[str]):
+        """Quanto o servidor mantém o modelo carregado depois de cada pedido"""
+    
+    def get_stats(self) -> Dict:
+        return {"backend": self.name, "model": self.model}
+
+
+class OllamaBackend(LLMBackend):
+    """
+    Servidor Ollama (ou qualquer servidor que fale o protocolo de chat dele)
+    headers vão em todo pedido (ex.: X-Prime-Agent para o corretor)
+    """
+    
+    name = "ollama"
+    
+    def __init__(self, model: str = "phi3", base_url: str = "http://localhost:11434",
+                 keep_alive: Optional[str] = "30m", headers: Optional[Dict[str, str]] = None):
+        self.model = model
+        self.base_url = base_url
+        self.keep_alive = keep_alive  # Quanto o Ollama mantém o modelo (e o KV cache) carregado
+        self._client = ollama.AsyncClient(host=base_url, headers=headers)
+        self._sync_client = ollama.Client(host=base_url, headers=headers)
+    
+    async def chat(self, messages: List[Dict], options: Optional[Dict] = None,
+                   keep_alive: Optional[str] = None) -> Dict:
+        self.last_used = time.monotonic()
+        return await self._client.chat(
+            model=self.model,
+            messages=messages,
+            options=options,
+            keep_alive=keep_alive if keep_alive is not None else self.keep_alive
+        )
+    
+    async def stream(self, messages: List[Dict], options: Optional[Dict] = None,
+                     keep_alive: Optional[str] = None) -> AsyncIterator[Dict]:
+        self.last_used = time.monotonic()
+        chunks = await self._client.chat(
+            model=self.model,
+            messages=messages,
+            options=options,
+            stream=True,
+            keep_alive=keep_alive if keep_alive is not None else self.keep_alive
+        )
+        try:
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            # Fechar a resposta HTTP faz o servidor parar de gerar
+            await chunks.aclose()
+    
+    def chat_sync(self, messages: List[Dict], options: Optional[Dict] = None) -> Dict:
+        self.last_used = time.monotonic()
+        return self._sync_client.chat(
+            model=self.model,
+            messages=messages,
+            options=options,
+            keep_alive=self.keep_alive
+        )
+    
+    async def ready(self) -> Dict:
+        try:
+            modelos = (await self._client.list()).get("models", [])
+        except Exception as e:
+            return {"server": False, "model": False, "error": str(e) or type(e).__name__}
+        # "phi3" casa com "phi3:latest"
+        nomes = {m.get("name", "") for m in modelos}
+        nomes |= {nome.split(":")[0] for nome in nomes if nome.endswith(":latest")}
+        if self.model not in nomes:
+            return {"server": True, "model": False,
+                    "error": f"Modelo {self.model} não encontrado (ollama pull {self.model})"}
+        return {"server": True, "model": True, "error": None}
+    
+    def set_keep_alive(self, keep_alive: Optional[str]):
+        self.keep_alive = keep_alive
+    
+    def get_stats(self) -> Dict:
+        return {"backend": self.name, "model": self.model, "base_url": self.base_url,
+                "keep_alive": self.keep_alive}
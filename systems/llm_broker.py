@@ -0,0 +1,420 @@
+"""
+Corretor de pedidos ao LLM entre agentes
+Vários PrimeCore (salas, casas) no mesmo servidor de modelo: em vez de
+cada um chamar o Ollama por conta própria, os pedidos passam por uma
+fila única que
+- junta pedidos iguais (ou, com merge="near", iguais a menos de caixa e
+  espaços) num só pedido ao servidor; todos recebem a mesma resposta
+- limita os pedidos simultâneos ao que o servidor aguenta
+- atende primeiro o prazo mais próximo (EDF) e não deixa um agente ocupar
+  todas as vagas enquanto outro espera
+- mede espera na fila e latência por agente
+Em processo, ExpressionBroker.client(agente) é o LLMBackend de cada
+agente. Entre processos, llm_broker.py serve o protocolo do Ollama e os
+agentes apontam OLLAMA_BASE_URL para ele (AGENT_ID identifica cada um)
+"""
+
+from collections import defaultdict
+from typing import AsyncIterator, Callable, Dict, List, Optional
+import asyncio
+import hashlib
+import heapq
+import itertools
+import json
+import re
+import time
+
+from .llm_backend import LLMBackend, keep_alive_seconds
+from .llm_resilience import LatencyWindow
+
+_SPACE_RE = re.compile(r"\s+")
+
+MERGE_MODES = ("off", "exact", "near")
+
+
+def prompt_key(model: str, messages: List[Dict], options: Optional[Dict], stream: bool,
+               merge: str = "exact") -> Optional[bytes]:
+    """
+    Chave de junção de um pedido (None com merge="off")
+    near: ignora só caixa e espaços; o conteúdo (memória recente inclusive)
+    conta, senão um agente receberia a fala gerada com a memória de outro
+    """
+    if merge == "off":
+        return None
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{model}\x1e{int(stream)}\x1e{json.dumps(options or {}, sort_keys=True)}"
+             .encode("utf-8"))
+    for m in messages:
+        conteudo = m.get("content", "")
+        if merge == "near":
+            conteudo = _SPACE_RE.sub(" ", conteudo).strip().casefold()
+        h.update(f"\x1e{m.get('role')}\x1f{conteudo}".encode("utf-8"))
+    return h.digest()
+
+
+def _longer_keep_alive(a: Optional[str], b: Optional[str]) -> Optional[str]:
+    """
+    O keep_alive mais longo (None = o do upstream): o modelo é um só, então
+    um pedido juntado mantém o modelo pelo tempo de quem mais precisa dele
+    """
+    if a is None or b is None:
+        return a if b is None else b
+    segundos_a, segundos_b = keep_alive_seconds(a), keep_alive_seconds(b)
+    if segundos_a is None or (segundos_b is not None and segundos_a >= segundos_b):
+        return a
+    return b
+
+
+class _Job:
+    """Um pedido ao servidor e quantos agentes esperam por ele"""
+    
+    def __init__(self, key: Optional[bytes], agent: str, model: str, messages: List[Dict],
+                 options: Optional[Dict], stream: bool, deadline: float,
+                 keep_alive: Optional[str] = None):
+        self.key = key
+        self.agent = agent  # Dono (quem pediu primeiro): conta para o limite por agente
+        self.model = model
+        self.messages = messages
+        self.options = options
+        self.stream = stream
+        self.keep_alive = keep_alive  # Repassado ao upstream (None = o dele)
+        self.deadline = deadline  # Prioridade: o prazo mais próximo entre os que esperam
+        self.expires = deadline  # Vence na fila só quando nenhum que espera tem prazo
+        self.waiters = 1
+        self.started_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self.abandoned = False
+        self.done = False
+        self.result: Optional[Dict] = None
+        self.chunks: List[Dict] = []
+        self.error: Optional[BaseException] = None
+        self.finished = asyncio.Event()
+        self.changed = asyncio.Event()  # Trocado a cada pedaço novo
+    
+    def notify(self):
+        evento, self.changed = self.changed, asyncio.Event()
+        evento.set()
+
+
+class _AgentStats:
+    def __init__(self):
+        self.requests = 0
+        self.merged = 0
+        self.expired = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.service_s = 0.0  # Tempo de servidor dos pedidos de que foi dono
+        self.wait = LatencyWindow()  # Na fila até o pedido sair para o servidor
+        self.latency = LatencyWindow()  # chat: resposta completa
+        self.first_token = LatencyWindow()  # stream: primeiro pedaço
+    
+    def to_dict(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "merged": self.merged,
+            "expired": self.expired,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "service_s": round(self.service_s, 3),
+            "wait_ms": self.wait.percentiles(),
+            "latency_ms": self.latency.percentiles(),
+            "first_token_ms": self.first_token.percentiles()
+        }
+
+
+class ExpressionBroker:
+    """
+    Fila única de pedidos ao LLM para vários agentes
+    concurrency: pedidos simultâneos no servidor (OLLAMA_NUM_PARALLEL)
+    max_per_agent: vagas que um agente ocupa enquanto outros esperam
+    merge: off | exact | near
+    deadline: prazo padrão (s) de um pedido na fila
+    upstream_factory: backend de outros modelos (padrão: só o de `upstream`)
+    """
+    
+    def __init__(self, upstream: LLMBackend, concurrency: int = 1, max_per_agent: int = 1,
+                 merge: str = "exact", deadline: float = 8.0,
+                 upstream_factory: Optional[Callable[[str], LLMBackend]] = None):
+        if merge not in MERGE_MODES:
+            raise ValueError(f"Modo de junção desconhecido: {merge}")
+        self.upstream = upstream
+        self.concurrency = max(1, concurrency)
+        self.max_per_agent = max(1, max_per_agent)
+        self.merge = merge
+        self.deadline = deadline
+        self.upstream_factory = upstream_factory
+        self._upstreams: Dict[str, LLMBackend] = {upstream.model: upstream}
+        self._heap: List = []  # (prazo, ordem, pedido); entradas velhas são puladas
+        self._seq = itertools.count()
+        self._pending: Dict[bytes, _Job] = {}  # Chave → pedido na fila ou em andamento
+        self._running: set = set()
+        self._running_by_agent: Dict[str, int] = defaultdict(int)
+        self._agents: Dict[str, _AgentStats] = defaultdict(_AgentStats)
+        
+        # Métricas
+        self.jobs = 0
+        self.queued = 0
+        self.max_queue = 0
+        self.upstream_calls = 0
+        self.merged = 0
+        self.expired = 0
+        self.bypassed = 0
+    
+    def client(self, agent: str, model: Optional[str] = None,
+               deadline: Optional[float] = None) -> "BrokerClient":
+        """LLMBackend de um agente; os pedidos dele passam pela fila"""
+        return BrokerClient(self, agent, model or self.upstream.model, deadline or self.deadline)
+    
+    def _upstream_for(self, model: str) -> LLMBackend:
+        backend = self._upstreams.get(model)
+        if backend is None:
+            backend = self.upstream_factory(model) if self.upstream_factory else self.upstream
+            self._upstreams[model] = backend
+        return backend
+    
+    def _submit(self, agent: str, model: str, messages: List[Dict], options: Optional[Dict],
+                stream: bool, deadline: float, keep_alive: Optional[str] = None) -> _Job:
+        agora = time.monotonic()
+        prazo = agora + deadline
+        self._agents[agent].requests += 1
+        key = prompt_key(model, messages, options, stream, self.merge)
+        job = self._pending.get(key) if key is not None else None
+        if job is not None and not job.abandoned and (job.started_at is not None
+                                                      or job.expires > agora):
+            # Mesmo pedido já na fila ou no servidor: espera a mesma resposta
+            job.waiters += 1
+            job.expires = max(job.expires, prazo)
+            if job.started_at is None:
+                job.keep_alive = _longer_keep_alive(job.keep_alive, keep_alive)
+            self.merged += 1
+            self._agents[agent].merged += 1
+            if job.started_at is None and prazo < job.deadline:
+                job.deadline = prazo
+                heapq.heappush(self._heap, (prazo, next(self._seq), job))
+            return job
+        
+        job = _Job(key, agent, model, messages, options, stream, prazo, keep_alive)
+        if key is not None:
+            self._pending[key] = job
+        heapq.heappush(self._heap, (prazo, next(self._seq), job))
+        self.jobs += 1
+        self.queued += 1
+        self.max_queue = max(self.max_queue, self.queued)
+        self._dispatch()
+        return job
+    
+    def _leave(self, job: _Job, agent: str):
+        """Um agente desistiu (fala superada, prazo); sem ninguém esperando, cancela"""
+        self._agents[agent].cancelled += 1
+        job.waiters -= 1
+        if job.waiters > 0 or job.done:
+            return
+        job.abandoned = True
+        self._forget(job)
+        if job.task is not None:
+            job.task.cancel()
+        else:
+            self.queued -= 1
+            job.done = True
+            job.finished.set()
+    
+    def _forget(self, job: _Job):
+        if job.key is not None and self._pending.get(job.key) is job:
+            del self._pending[job.key]
+    
+    def _dispatch(self):
+        """Ocupa as vagas livres com os pedidos de prazo mais próximo"""
+        agora = time.monotonic()
+        adiados = []  # Donos já no limite de vagas
+        while len(self._running) < self.concurrency and self._heap:
+            entrada = heapq.heappop(self._heap)
+            prazo, _, job = entrada
+            if job.started_at is not None or job.done or prazo != job.deadline:
+                continue  # Entrada velha
+            if agora > job.expires:
+                self._expire(job)
+                continue
+            if self._running_by_agent[job.agent] >= self.max_per_agent:
+                adiados.append(entrada)
+                continue
+            self._start(job)
+        
+        # Só sobraram agentes no limite: melhor usar a vaga do que deixá-la ociosa
+        while adiados and len(self._running) < self.concurrency:
+            self._start(adiados.pop(0)[2])
+        for entrada in adiados:
+            heapq.heappush(self._heap, entrada)
+    
+    def _expire(self, job: _Job):
+        self.queued -= 1
+        self.expired += 1
+        self._agents[job.agent].expired += 1
+        job.error = asyncio.TimeoutError("Prazo vencido na fila do LLM")
+        self._finish(job)
+    
+    def _start(self, job: _Job):
+        self.queued -= 1
+        self.upstream_calls += 1
+        job.started_at = time.monotonic()
+        self._running.add(job)
+        self._running_by_agent[job.agent] += 1
+        job.task = asyncio.ensure_future(self._run(job))
+    
+    async def _run(self, job: _Job):
+        upstream = self._upstream_for(job.model)
+        try:
+            if job.stream:
+                stream = upstream.stream(job.messages, job.options, job.keep_alive)
+                try:
+                    async for chunk in stream:
+                        job.chunks.append(chunk)
+                        job.notify()
+                finally:
+                    await stream.aclose()
+            else:
+                job.result = await upstream.chat(job.messages, job.options, job.keep_alive)
+        except asyncio.CancelledError:
+            job.error = asyncio.CancelledError()  # Ninguém mais esperava
+        except Exception as e:
+            job.error = e
+        finally:
+            self._running.discard(job)
+            self._running_by_agent[job.agent] -= 1
+            self._agents[job.agent].service_s += time.monotonic() - job.started_at
+            self._finish(job)
+            self._dispatch()
+    
+    def _finish(self, job: _Job):
+        job.done = True
+        self._forget(job)
+        job.finished.set()
+        job.notify()
+    
+    def _record(self, agent: str, job: _Job, submitted: float, window: LatencyWindow,
+                first: float):
+        stats = self._agents[agent]
+        if job.error is not None:
+            if job.started_at is None:
+                return  # Vencido na fila (contado em _expire)
+            stats.failed += 1
+            return
+        stats.wait.add(max(0.0, job.started_at - submitted) * 1000)
+        window.add((first - submitted) * 1000)
+    
+    def fairness(self) -> float:
+        """Índice de Jain da espera média por agente (1 = todos esperam igual)"""
+        medias = [s.wait.mean() for s in self._agents.values() if len(s.wait)]
+        if not medias or not any(medias):
+            return 1.0
+        return round(sum(medias) ** 2 / (len(medias) * sum(m * m for m in medias)), 3)
+    
+    def get_stats(self) -> Dict:
+        return {
+            "concurrency": self.concurrency,
+            "max_per_agent": self.max_per_agent,
+            "merge": self.merge,
+            "queued": self.queued,
+            "running": len(self._running),
+            "max_queue": self.max_queue,
+            "jobs": self.jobs,
+            "upstream_calls": self.upstream_calls,
+            "merged": self.merged,
+            "expired": self.expired,
+            "bypassed": self.bypassed,
+            "fairness": self.fairness(),
+            "agents": {agente: s.to_dict() for agente, s in self._agents.items()},
+            "upstreams": {modelo: b.get_stats() for modelo, b in self._upstreams.items()}
+        }
+
+
+class BrokerClient(LLMBackend):
+    """
+    LLMBackend de um agente atrás do ExpressionBroker
+    O keep_alive do agente (set_keep_alive ou o do pedido) vai com cada
+    pedido até o upstream; None = o keep_alive do upstream
+    """
+    
+    name = "broker"
+    
+    def __init__(self, broker: ExpressionBroker, agent: str, model: str, deadline: float):
+        self.broker = broker
+        self.agent = agent
+        self.model = model
+        self.deadline = deadline
+        self.keep_alive: Optional[str] = None
+    
+    async def chat(self, messages: List[Dict], options: Optional[Dict] = None,
+                   keep_alive: Optional[str] = None) -> Dict:
+        submitted = time.monotonic()
+        if keep_alive is None:
+            keep_alive = self.keep_alive
+        job = self.broker._submit(self.agent, self.model, messages, options, False,
+                                  self.deadline, keep_alive)
+        try:
+            await job.finished.wait()
+        except asyncio.CancelledError:
+            self.broker._leave(job, self.agent)
+            raise
+        self.broker._record(self.agent, job, submitted, self.broker._agents[self.agent].latency,
+                            time.monotonic())
+        if job.error is not None:
+            raise job.error
+        return job.result
+    
+    async def stream(self, messages: List[Dict], options: Optional[Dict] = None,
+                     keep_alive: Optional[str] = None) -> AsyncIterator[Dict]:
+        submitted = time.monotonic()
+        if keep_alive is None:
+            keep_alive = self.keep_alive
+        job = self.broker._submit(self.agent, self.model, messages, options, True,
+                                  self.deadline, keep_alive)
+        primeiro = None
+        lidos = 0
+        completo = False
+        try:
+            while True:
+                evento = job.changed
+                while lidos < len(job.chunks):
+                    if primeiro is None:
+                        primeiro = time.monotonic()
+                    # Quem chegou depois recebe desde o começo
+                    yield job.chunks[lidos]
+                    lidos += 1
+                if job.done:
+                    break
+                await evento.wait()
+            completo = True
+        finally:
+            if not completo:
+                self.broker._leave(job, self.agent)
+        self.broker._record(self.agent, job, submitted,
+                            self.broker._agents[self.agent].first_token,
+                            primeiro or time.monotonic())
+        if job.error is not None:
+            raise job.error
+    
+    async def ready(self) -> Dict:
+        return await self.broker._upstream_for(self.model).ready()
+    
+    @property
+    def last_used(self) -> float:
+        # O modelo é do servidor: qualquer agente usando mantém carregado
+        return self.broker._upstream_for(self.model).last_used
+    
+    def set_keep_alive(self, keep_alive: Optional[str]):
+        self.keep_alive = keep_alive
+    
+    def chat_sync(self, messages: List[Dict], options: Optional[Dict] = None) -> Dict:
+        """Fora do loop de eventos não há fila: vai direto ao servidor"""
+        self.broker.bypassed += 1
+        return self.broker._upstream_for(self.model).chat_sync(messages, options)
+    
+    def get_stats(self) -> Dict:
+        return {
+            "backend": self.name,
+            "model": self.model,
+            "agent": self.agent,
+            "deadline_s": self.deadline,
+            "keep_alive": self.keep_alive,
+            "broker": self.broker._agents[self.agent].to_dict()
+        }
@@ -0,0 +1,316 @@
+"""
+Resiliência do LLM da expressão
+ResilientBackend envolve outro backend e limita a cauda de latência:
+- SLO por pedido: resposta completa (chat) ou primeiro token (stream)
+  no prazo, senão TimeoutError
+- Pedido de reserva (hedge): se o principal não respondeu em `hedge_after`,
+  um segundo pedido sai (menos tokens ou um modelo menor) e vale o que
+  responder primeiro
+- Disjuntor: falhas seguidas abrem o circuito e os pedidos falham na hora
+  (LLMUnavailable → resposta mínima ou banco de respostas); de tempos em
+  tempos um pedido passa como sonda e, se der certo, o circuito fecha
+"""
+
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+import time
+
+from .llm_backend import LLMBackend, LLMUnavailable
+
+
+class LatencyWindow:
+    """Últimas N latências (ms) e seus percentis"""
+    
+    def __init__(self, size: int = 256):
+        self._values: deque = deque(maxlen=size)
+    
+    def add(self, ms: float):
+        self._values.append(ms)
+    
+    def percentiles(self, ps=(50, 95, 99)) -> Dict[str, float]:
+        if not self._values:
+            return {f"p{p}": 0.0 for p in ps}
+        ordenados = sorted(self._values)
+        return {f"p{p}": round(ordenados[min(len(ordenados) - 1, len(ordenados) * p // 100)], 3)
+                for p in ps}
+    
+    def mean(self) -> float:
+        return sum(self._values) / len(self._values) if self._values else 0.0
+    
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+class CircuitBreaker:
+    """
+    closed: pedidos passam; `failure_threshold` falhas seguidas abrem
+    open: pedidos barrados; depois de `reset_timeout` s, um passa como sonda
+    half_open: sonda em andamento; sucesso fecha, falha reabre
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0  # Falhas seguidas
+        self.opened_at = 0.0
+        
+        # Métricas
+        self.trips = 0
+        self.probes = 0
+        self.rejected = 0
+    
+    def allow(self) -> bool:
+        """O pedido pode ir ao backend?"""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self.probes += 1
+            return True
+        self.rejected += 1
+        return False
+    
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+    
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.trips += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+    
+    def release(self):
+        """Sonda cancelada sem resultado: a próxima tentativa sonda de novo"""
+        if self.state == self.HALF_OPEN:
+            self.state = self.OPEN
+    
+    def get_stats(self) -> Dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "trips": self.trips,
+            "probes": self.probes,
+            "rejected": self.rejected,
+            "retry_in_s": (
+                round(max(0.0, self.opened_at + self.reset_timeout - time.monotonic()), 1)
+                if self.state == self.OPEN else 0.0
+            )
+        }
+
+
+async def _discard(future: asyncio.Future, stream=None):
+    """Cancela um pedido perdedor e fecha o stream dele"""
+    future.cancel()
+    await asyncio.gather(future, return_exceptions=True)
+    if stream is not None:
+        await stream.aclose()
+
+
+class ResilientBackend(LLMBackend):
+    """
+    Backend com SLO, hedge e disjuntor em volta de `primary`
+    hedge: backend do pedido de reserva (padrão: o próprio primary, com
+    `hedge_max_tokens`); hedge_after=None desliga o hedge
+    """
+    
+    name = "resilient"
+    
+    def __init__(self, primary: LLMBackend, slo: float = 4.0,
+                 hedge: Optional[LLMBackend] = None, hedge_after: Optional[float] = None,
+                 hedge_max_tokens: Optional[int] = 32, failure_threshold: int = 3,
+                 reset_timeout: float = 30.0):
+        self.primary = primary
+        self.model = primary.model
+        self.slo = slo  # s até a resposta (chat) ou o primeiro token (stream)
+        self.hedge = hedge or primary
+        self.hedge_after = hedge_after
+        self.hedge_max_tokens = hedge_max_tokens
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.latency = LatencyWindow()  # chat: resposta completa
+        self.first_token = LatencyWindow()  # stream: primeiro token
+        
+        # Métricas
+        self.requests = 0
+        self.slo_violations = 0
+        self.failures = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+    
+    def _admit(self):
+        self.requests += 1
+        if not self.breaker.allow():
+            raise LLMUnavailable(f"LLM indisponível (disjuntor {self.breaker.state})")
+    
+    def _hedge_options(self, options: Optional[Dict]) -> Optional[Dict]:
+        if self.hedge_max_tokens is None:
+            return options
+        return dict(options or {}, num_predict=self.hedge_max_tokens)
+    
+    def _success(self, window: LatencyWindow, start: float, hedge_won: bool):
+        window.add((time.perf_counter() - start) * 1000)
+        if hedge_won:
+            self.hedge_wins += 1
+        self.breaker.record_success()
+    
+    def _failure(self, erro: BaseException):
+        if isinstance(erro, asyncio.CancelledError):
+            # Cancelado por quem pediu (fala superada): não diz nada do backend
+            self.breaker.release()
+            return
+        if isinstance(erro, asyncio.TimeoutError):
+            self.slo_violations += 1
+        self.failures += 1
+        self.breaker.record_failure()
+    
+    def _wait_time(self, start: float, hedge_started: bool) -> float:
+        """Espera até o próximo evento: fim do SLO ou hora do hedge"""
+        agora = time.perf_counter()
+        restante = start + self.slo - agora
+        if restante <= 0:
+            raise asyncio.TimeoutError(f"LLM sem resposta no SLO ({self.slo}s)")
+        if self.hedge_after is not None and not hedge_started:
+            restante = min(restante, max(0.0, start + self.hedge_after - agora))
+        return restante
+    
+    def _hedge_due(self, start: float) -> bool:
+        return self.hedge_after is not None and time.perf_counter() - start >= self.hedge_after
+    
+    async def chat(self, messages: List[Dict], options: Optional[Dict] = None,
+                   keep_alive: Optional[str] = None) -> Dict:
+        self._admit()
+        start = time.perf_counter()
+        pedidos = {
+            asyncio.ensure_future(self.primary.chat(messages, options, keep_alive)): False
+        }
+        hedge_started = False
+        erro: Optional[BaseException] = None
+        try:
+            while True:
+                feitos, _ = await asyncio.wait(pedidos, timeout=self._wait_time(start, hedge_started),
+                                               return_when=asyncio.FIRST_COMPLETED)
+                for pedido in feitos:
+                    do_hedge = pedidos.pop(pedido)
+                    if pedido.exception() is None:
+                        for perdedor in pedidos:
+                            await _discard(perdedor)
+                        self._success(self.latency, start, do_hedge)
+                        return pedido.result()
+                    erro = pedido.exception()
+                if not pedidos and (hedge_started or self.hedge_after is None):
+                    raise erro
+                if not hedge_started and (self._hedge_due(start) or not pedidos):
+                    # Principal atrasado (ou falhou antes da hora): sai a reserva
+                    hedge_started = True
+                    self.hedged += 1
+                    pedidos[asyncio.ensure_future(
+                        self.hedge.chat(messages, self._hedge_options(options), keep_alive)
+                    )] = True
+        except BaseException as e:
+            for pedido in pedidos:
+                await _discard(pedido)
+            self._failure(e)
+            raise
+    
+    async def stream(self, messages: List[Dict], options: Optional[Dict] = None,
+                     keep_alive: Optional[str] = None) -> AsyncIterator[Dict]:
+        self._admit()
+        start = time.perf_counter()
+        principal = self.primary.stream(messages, options, keep_alive)
+        pedidos: Dict[asyncio.Future, Tuple[AsyncIterator[Dict], bool]] = {
+            asyncio.ensure_future(principal.__anext__()): (principal, False)
+        }
+        hedge_started = False
+        erro: Optional[BaseException] = None
+        vencedor = primeiro = None
+        try:
+            while vencedor is None:
+                feitos, _ = await asyncio.wait(pedidos, timeout=self._wait_time(start, hedge_started),
+                                               return_when=asyncio.FIRST_COMPLETED)
+                for pedido in feitos:
+                    stream, do_hedge = pedidos.pop(pedido)
+                    erro = pedido.exception()
+                    if erro is None or isinstance(erro, StopAsyncIteration):
+                        # Primeiro pedaço (ou stream vazio, que também é resposta)
+                        vencedor = stream
+                        primeiro = pedido.result() if erro is None else None
+                        self._success(self.first_token, start, do_hedge)
+                        break
+                    await stream.aclose()
+                if vencedor is not None:
+                    break
+                if not pedidos and (hedge_started or self.hedge_after is None):
+                    raise erro
+                if not hedge_started and (self._hedge_due(start) or not pedidos):
+                    # Principal atrasado (ou falhou antes da hora): sai a reserva
+                    hedge_started = True
+                    self.hedged += 1
+                    reserva = self.hedge.stream(messages, self._hedge_options(options), keep_alive)
+                    pedidos[asyncio.ensure_future(reserva.__anext__())] = (reserva, True)
+        except BaseException as e:
+            self._failure(e)
+            raise
+        finally:
+            # Perdedores (ou todos, se falhou)
+            for pedido, (stream, _) in pedidos.items():
+                await _discard(pedido, stream)
+        
+        try:
+            if primeiro is None:
+                return
+            yield primeiro
+            async for chunk in vencedor:
+                yield chunk
+        finally:
+            await vencedor.aclose()
+    
+    def chat_sync(self, messages: List[Dict], options: Optional[Dict] = None) -> Dict:
+        """Sem hedge; estourar o SLO conta como falha para o disjuntor"""
+        self._admit()
+        start = time.perf_counter()
+        try:
+            resposta = self.primary.chat_sync(messages, options)
+        except Exception as e:
+            self._failure(e)
+            raise
+        if time.perf_counter() - start > self.slo:
+            self._failure(asyncio.TimeoutError())
+        else:
+            self._success(self.latency, start, False)
+        return resposta
+    
+    async def ready(self) -> Dict:
+        return await self.primary.ready()
+    
+    def set_keep_alive(self, keep_alive: Optional[str]):
+        self.primary.set_keep_alive(keep_alive)
+        if self.hedge is not self.primary:
+            self.hedge.set_keep_alive(keep_alive)
+    
+    @property
+    def last_used(self) -> float:
+        return max(self.primary.last_used, self.hedge.last_used)
+    
+    def get_stats(self) -> Dict:
+        return {
+            "backend": self.name,
+            "primary": self.primary.get_stats(),
+            "slo_s": self.slo,
+            "hedge_after_s": self.hedge_after,
+            "requests": self.requests,
+            "failures": self.failures,
+            "slo_violations": self.slo_violations,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "latency_ms": self.latency.percentiles(),
+            "first_token_ms": self.first_token.percentiles(),
+            "breaker": self.breaker.get_stats()
+        }
@@ -0,0 +1,145 @@
+"""
+Servidor HTTP com o protocolo de chat do Ollama
+Põe qualquer LLMBackend atrás de um endereço que o cliente do Ollama
+entende: o LLM substituto (llm_standin.py) e o corretor entre agentes
+(llm_broker.py) usam este servidor
+"""
+
+from typing import AsyncIterator, Callable, Dict, List, Optional
+import asyncio
+import json
+import logging
+
+from .llm_backend import LLMBackend
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaProtocolServer:
+    """
+    Servidor HTTP/1.1 mínimo (asyncio, uma resposta por conexão) que
+    responde como o Ollama: GET /, /api/version, /api/tags e POST /api/chat
+    (NDJSON em chunked quando stream=true). Cliente que desconecta
+    interrompe a geração
+    resolve(headers, modelo) escolhe o backend de cada pedido; stats, se
+    houver, responde em GET /stats
+    """
+    
+    def __init__(self, resolve: Callable[[Dict[str, str], Optional[str]], LLMBackend],
+                 models: List[str], host: str = "127.0.0.1", port: int = 11434,
+                 version: str = "0.0.0", stats: Optional[Callable[[], Dict]] = None):
+        self.resolve = resolve
+        self.models = models
+        self.host = host
+        self.port = port
+        self.version = version
+        self.stats = stats
+        self._server: Optional[asyncio.AbstractServer] = None
+    
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        # Porta 0: o sistema escolhe
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Protocolo do Ollama em http://{self.host}:{self.port}")
+    
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+    
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+    
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            linha = (await reader.readline()).decode("latin-1").split()
+            if len(linha) < 2:
+                return
+            metodo, caminho = linha[0], linha[1].split("?")[0]
+            headers = {}
+            while True:
+                header = await reader.readline()
+                if header in (b"\r\n", b"\n", b""):
+                    break
+                nome, _, valor = header.decode("latin-1").partition(":")
+                headers[nome.strip().lower()] = valor.strip()
+            corpo = await reader.readexactly(int(headers.get("content-length", 0) or 0))
+            
+            if metodo == "GET" and caminho == "/":
+                await self._respond(writer, 200, b"Ollama is running", "text/plain")
+            elif metodo == "GET" and caminho == "/api/version":
+                await self._respond_json(writer, 200, {"version": self.version})
+            elif metodo == "GET" and caminho == "/api/tags":
+                await self._respond_json(writer, 200, {"models": [
+                    {"name": modelo, "model": modelo} for modelo in self.models
+                ]})
+            elif metodo == "GET" and caminho == "/stats" and self.stats is not None:
+                await self._respond_json(writer, 200, self.stats())
+            elif metodo == "POST" and caminho == "/api/chat":
+                await self._chat(writer, headers, json.loads(corpo or b"{}"))
+            else:
+                await self._respond_json(writer, 404, {"error": f"{metodo} {caminho} não existe"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # Cliente desistiu
+        except Exception as e:
+            logger.error(f"Erro no servidor de LLM: {e}")
+        finally:
+            writer.close()
+    
+    async def _chat(self, writer: asyncio.StreamWriter, headers: Dict[str, str], pedido: Dict):
+        backend = self.resolve(headers, pedido.get("model"))
+        messages = pedido.get("messages", [])
+        options = pedido.get("options")
+        keep_alive = pedido.get("keep_alive")  # O do cliente segue até o servidor de modelo
+        if not pedido.get("stream", True):
+            try:
+                resposta = await backend.chat(messages, options, keep_alive)
+            except Exception as e:
+                await self._respond_json(writer, 503, {"error": str(e) or type(e).__name__})
+                return
+            await self._respond_json(writer, 200, resposta)
+            return
+        stream = backend.stream(messages, options, keep_alive)
+        try:
+            # Erro antes do primeiro pedaço ainda vira status HTTP
+            try:
+                primeiro = await stream.__anext__()
+            except StopAsyncIteration:
+                primeiro = None
+            except Exception as e:
+                await self._respond_json(writer, 503, {"error": str(e) or type(e).__name__})
+                return
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                         b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n")
+            async for chunk in self._chain(primeiro, stream):
+                dados = json.dumps(chunk, ensure_ascii=False).encode("utf-8") + b"\n"
+                writer.write(b"%x\r\n%s\r\n" % (len(dados), dados))
+                await writer.drain()
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        finally:
+            await stream.aclose()
+    
+    @staticmethod
+    async def _chain(primeiro: Optional[Dict], stream) -> AsyncIterator[Dict]:
+        if primeiro is None:
+            return
+        yield primeiro
+        async for chunk in stream:
+            yield chunk
+    
+    async def _respond_json(self, writer: asyncio.StreamWriter, status: int, dados: Dict):
+        await self._respond(writer, status, json.dumps(dados, ensure_ascii=False).encode("utf-8"),
+                            "application/json")
+    
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, corpo: bytes,
+                       content_type: str):
+        motivo = {200: "OK", 404: "Not Found", 503: "Service Unavailable"}.get(status, "Error")
+        writer.write(f"HTTP/1.1 {status} {motivo}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(corpo)}\r\nConnection: close\r\n\r\n"
+                     .encode("latin-1") + corpo)
+        await writer.drain()
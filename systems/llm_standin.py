@@ -0,0 +1,256 @@
+"""
+LLM substituto determinístico
+Simula o Ollama sem modelo nem GPU, para medir o caminho da expressão
+(tick, primeira frase, resposta completa) de forma repetível:
+- StandInBackend: em processo, direto no ExpressionSystem
+- StandInServer: servidor HTTP mínimo com o protocolo de chat do Ollama
+  (/api/chat com e sem stream), para testar também o cliente HTTP
+Latência até o primeiro token sorteada de uma distribuição configurável,
+tokens a uma taxa fixa e respostas escolhidas pelo conteúdo do pedido;
+`parallel` limita os pedidos atendidos ao mesmo tempo (como o
+OLLAMA_NUM_PARALLEL), os outros esperam a vez
+"""
+
+from datetime import datetime, timezone
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+import math
+import random
+import re
+import time
+import zlib
+
+from .llm_backend import LLMBackend, keep_alive_seconds
+from .llm_server import OllamaProtocolServer
+
+_TOKEN_RE = re.compile(r"\s*\S+")
+
+# Falas no registro do Prime (curtas, às vezes incompletas)
+DEFAULT_REPLIES = [
+    "Hmm... você chegou.",
+    "Tá quieto hoje. Tudo bem?",
+    "Eu estava aqui pensando. Nada importante.",
+    "Oi. Demorou.",
+    "Esse silêncio é bom, às vezes.",
+    "Você parece cansado. Ou é impressão minha?",
+    "Fiquei curiosa com uma coisa... depois eu falo.",
+    "Ok. Só queria ver se você estava aí.",
+]
+
+
+class LatencyModel:
+    """
+    Distribuição de latência em ms, a partir de uma especificação:
+    fixed:MS | uniform:MIN:MAX | normal:MEDIA:DESVIO | lognormal:MEDIANA:SIGMA
+    """
+    
+    _KINDS = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+    
+    def __init__(self, spec: str = "fixed:0"):
+        kind, *params = spec.split(":")
+        if kind not in self._KINDS or len(params) != self._KINDS[kind]:
+            raise ValueError(f"Distribuição de latência inválida: {spec}")
+        self.spec = spec
+        self.kind = kind
+        self.params = [float(p) for p in params]
+    
+    def sample(self, rng: random.Random) -> float:
+        """Uma amostra em segundos (nunca negativa)"""
+        if self.kind == "fixed":
+            ms = self.params[0]
+        elif self.kind == "uniform":
+            ms = rng.uniform(*self.params)
+        elif self.kind == "normal":
+            ms = rng.gauss(*self.params)
+        else:
+            mediana, sigma = self.params
+            ms = rng.lognormvariate(math.log(max(mediana, 1e-6)), sigma)
+        return max(0.0, ms) / 1000
+
+
+class StandInBackend(LLMBackend):
+    """
+    Backend em processo: mesmas respostas e tempos para a mesma semente e
+    a mesma sequência de pedidos
+    Simula o reaproveitamento do prefixo (KV cache): um prompt do sistema
+    igual ao anterior não é reavaliado
+    parallel: pedidos gerados ao mesmo tempo (0 = sem limite)
+    load_time: carga do modelo (ms), paga no primeiro pedido e sempre que
+    o keep_alive vence sem pedidos
+    """
+    
+    name = "standin"
+    
+    def __init__(self, model: str = "standin", first_token: str = "lognormal:300:0.4",
+                 tokens_per_s: float = 20.0, prompt_tokens_per_s: float = 0.0,
+                 seed: int = 0, replies: Optional[List[str]] = None, parallel: int = 0,
+                 load_time: str = "fixed:0", keep_alive: Optional[str] = "30m"):
+        self.model = model
+        self.first_token = LatencyModel(first_token)
+        self.tokens_per_s = tokens_per_s  # 0 = todos os tokens de uma vez
+        self.prompt_tokens_per_s = prompt_tokens_per_s  # 0 = avaliação do prompt grátis
+        self.seed = seed
+        self.replies = list(replies or DEFAULT_REPLIES)
+        self._last_system: Optional[str] = None
+        self.parallel = parallel
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.load_time = LatencyModel(load_time)
+        self.keep_alive = keep_alive
+        self._loaded_until: Optional[float] = 0.0  # time.monotonic(); None = para sempre
+        
+        # Métricas
+        self.requests = 0
+        self.tokens = 0
+        self.cancelled = 0
+        self.loads = 0
+    
+    def _load(self, rng: random.Random, keep_alive: Optional[str] = None) -> float:
+        """Espera para carregar o modelo (s), se ele não está residente"""
+        agora = time.monotonic()
+        carga = 0.0
+        if self._loaded_until is not None and agora >= self._loaded_until:
+            carga = self.load_time.sample(rng)
+            self.loads += 1
+        duracao = keep_alive_seconds(keep_alive if keep_alive is not None else self.keep_alive)
+        self._loaded_until = None if duracao is None else agora + carga + duracao
+        return carga
+    
+    def _plan(self, messages: List[Dict], options: Optional[Dict] = None,
+              keep_alive: Optional[str] = None) -> Tuple[List[str], float, int, float]:
+        """
+        (tokens da resposta, espera até o primeiro token em s, tokens de
+        prompt avaliados, carga do modelo em s); options["num_predict"]
+        limita os tokens
+        """
+        self.requests += 1
+        self.last_used = time.monotonic()
+        rng = random.Random(f"{self.seed}:{self.requests}")
+        system = "".join(m["content"] for m in messages if m.get("role") == "system")
+        pedido = "".join(m["content"] for m in messages if m.get("role") != "system")
+        espera = self.first_token.sample(rng)
+        carga = self._load(rng, keep_alive)
+        if carga:
+            self._last_system = None  # Modelo recém-carregado: KV cache vazio
+        avaliados = len(_TOKEN_RE.findall(pedido))
+        if system != self._last_system:
+            avaliados += len(_TOKEN_RE.findall(system))
+            self._last_system = system
+        if self.prompt_tokens_per_s > 0:
+            espera += avaliados / self.prompt_tokens_per_s
+        espera += carga
+        resposta = self.replies[(zlib.crc32(pedido.encode("utf-8")) + self.requests)
+                                % len(self.replies)]
+        tokens = _TOKEN_RE.findall(resposta)
+        limite = (options or {}).get("num_predict")
+        if limite is not None and limite >= 0:
+            tokens = tokens[:limite]
+        return tokens, espera, avaliados, carga
+    
+    def _chunk(self, content: str, done: bool = False, tokens: int = 0,
+               avaliados: int = 0, espera: float = 0.0, total: float = 0.0,
+               carga: float = 0.0) -> Dict:
+        chunk = {
+            "model": self.model,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "message": {"role": "assistant", "content": content},
+            "done": done
+        }
+        if done:
+            chunk.update({
+                "done_reason": "stop",
+                "total_duration": int(total * 1e9),
+                "load_duration": int(carga * 1e9),
+                "prompt_eval_count": avaliados,
+                "prompt_eval_duration": int((espera - carga) * 1e9),
+                "eval_count": tokens,
+                "eval_duration": int(max(0.0, total - espera) * 1e9)
+            })
+        return chunk
+    
+    def _interval(self) -> float:
+        return 1 / self.tokens_per_s if self.tokens_per_s > 0 else 0.0
+    
+    @asynccontextmanager
+    async def _slot(self):
+        """Vaga de geração; sem vaga, o pedido espera na fila do servidor"""
+        if self.parallel <= 0:
+            yield
+            return
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.parallel)
+        async with self._slots:
+            yield
+    
+    async def chat(self, messages: List[Dict], options: Optional[Dict] = None,
+                   keep_alive: Optional[str] = None) -> Dict:
+        if not messages:
+            # Como no Ollama: só carrega o modelo e reaplica o keep_alive
+            self.last_used = time.monotonic()
+            carga = self._load(random.Random(f"{self.seed}:carga:{self.loads}"), keep_alive)
+            await asyncio.sleep(carga)
+            return self._chunk("", True, total=carga, carga=carga)
+        try:
+            async with self._slot():
+                tokens, espera, avaliados, carga = self._plan(messages, options, keep_alive)
+                total = espera + len(tokens) * self._interval()
+                await asyncio.sleep(total)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        self.tokens += len(tokens)
+        return self._chunk("".join(tokens), True, len(tokens), avaliados, espera, total,
+                           carga)
+    
+    async def stream(self, messages: List[Dict], options: Optional[Dict] = None,
+                     keep_alive: Optional[str] = None) -> AsyncIterator[Dict]:
+        completo = False
+        try:
+            async with self._slot():
+                tokens, espera, avaliados, carga = self._plan(messages, options, keep_alive)
+                start = time.perf_counter()
+                await asyncio.sleep(espera)
+                for token in tokens:
+                    yield self._chunk(token)
+                    self.tokens += 1
+                    await asyncio.sleep(self._interval())
+                completo = True
+                yield self._chunk("", True, len(tokens), avaliados, espera,
+                                  time.perf_counter() - start, carga)
+        finally:
+            if not completo:
+                self.cancelled += 1
+    
+    def chat_sync(self, messages: List[Dict], options: Optional[Dict] = None) -> Dict:
+        tokens, espera, avaliados, carga = self._plan(messages, options)
+        total = espera + len(tokens) * self._interval()
+        time.sleep(total)
+        self.tokens += len(tokens)
+        return self._chunk("".join(tokens), True, len(tokens), avaliados, espera, total,
+                           carga)
+    
+    def set_keep_alive(self, keep_alive: Optional[str]):
+        self.keep_alive = keep_alive
+    
+    def get_stats(self) -> Dict:
+        return {
+            "backend": self.name,
+            "model": self.model,
+            "first_token": self.first_token.spec,
+            "tokens_per_s": self.tokens_per_s,
+            "parallel": self.parallel,
+            "requests": self.requests,
+            "tokens": self.tokens,
+            "cancelled": self.cancelled,
+            "loads": self.loads,
+            "keep_alive": self.keep_alive
+        }
+
+
+class StandInServer(OllamaProtocolServer):
+    """Servidor HTTP com o protocolo do Ollama na frente de um StandInBackend"""
+    
+    def __init__(self, backend: StandInBackend, host: str = "127.0.0.1", port: int = 11435):
+        super().__init__(lambda headers, model: backend, [backend.model], host, port,
+                         version="0.0.0-standin")
+        self.backend = backend
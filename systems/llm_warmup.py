@@ -0,0 +1,220 @@
+"""
+Aquecimento do modelo da expressão
+- Na inicialização, confere servidor e modelo e manda um pedido mínimo
+  (o prompt do sistema de verdade, 1 token): o modelo carrega e o prefixo
+  entra no KV cache antes do primeiro FALAR
+- keep_alive pela atividade prevista: longo com o usuário presente ou
+  perto de uma hora em que ele costuma aparecer, curto no resto. Quando a
+  atividade acaba, um pedido vazio reenvia o keep_alive curto e o servidor
+  descarrega o modelo mais cedo (a memória da GPU volta para o sistema)
+- Reaquece quando a atividade volta e o modelo já deve ter sido
+  descarregado; reconfere a prontidão de tempos em tempos
+- Mede a latência fria (com a carga do modelo) e a quente (logo depois)
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+import time
+
+from .llm_backend import LLMBackend, keep_alive_seconds
+from .llm_resilience import LatencyWindow
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityForecast:
+    """
+    Chegadas e interações por hora do dia; há atividade prevista se a hora
+    atual ou as próximas `horizon_h` têm pelo menos `threshold` do pico
+    """
+    
+    def __init__(self, threshold: float = 0.25, horizon_h: int = 1):
+        self.threshold = threshold
+        self.horizon_h = horizon_h
+        self.counts = [0] * 24
+    
+    def add(self, quando: Optional[datetime] = None, n: int = 1):
+        self.counts[(quando or datetime.now()).hour] += n
+    
+    def expected(self, quando: Optional[datetime] = None) -> bool:
+        pico = max(self.counts)
+        if pico == 0:
+            return False
+        hora = (quando or datetime.now()).hour
+        return any(self.counts[(hora + h) % 24] >= self.threshold * pico
+                   for h in range(self.horizon_h + 1))
+
+
+class ModelWarmer:
+    """
+    Mantém o modelo da expressão carregado quando ele vai ser usado
+    llm: backend sem a camada de resiliência (carregar o modelo demora
+    mais que o SLO de uma fala)
+    """
+    
+    def __init__(self, expression, llm: LLMBackend, active_keep_alive: str = "30m",
+                 idle_keep_alive: str = "5m", timeout: float = 120.0, recheck: float = 30.0,
+                 forecast: Optional[ActivityForecast] = None):
+        self.expression = expression
+        self.llm = llm
+        self.active_keep_alive = active_keep_alive
+        self.idle_keep_alive = idle_keep_alive
+        self.timeout = timeout  # s para o servidor responder e o modelo carregar
+        self.recheck = recheck  # s entre conferências de prontidão
+        self.forecast = forecast or ActivityForecast()
+        self.keep_alive: Optional[str] = None  # Em vigor
+        self.ready = False
+        self.server_ok = False
+        self.model_ok = False
+        self.error: Optional[str] = None
+        self._state: Optional[Tuple[Dict, Dict, Dict]] = None
+        self._presente = False
+        self._warming = False
+        self.pending: Optional[str] = None  # "warm" | "release", feito por run()
+        self._wake = asyncio.Event()
+        self._last_seen = 0.0  # last_used do backend na última olhada
+        self._used_keep_alive: Optional[str] = None  # keep_alive com que esse pedido saiu
+        
+        # Métricas
+        self.warmups = 0
+        self.rewarms = 0
+        self.releases = 0
+        self.failures = 0
+        self.cold = LatencyWindow(32)  # ms, com a carga do modelo
+        self.warm = LatencyWindow(32)  # ms, modelo já residente
+        self.last_load_ms = 0.0
+    
+    def loaded(self) -> bool:
+        """O modelo ainda deve estar residente (keep_alive desde o último pedido)?"""
+        ultimo = self.llm.last_used
+        if not ultimo:
+            return False
+        if ultimo != self._last_seen:
+            # Pedido novo desde a última olhada: saiu com o keep_alive em vigor
+            self._last_seen = ultimo
+            self._used_keep_alive = self.keep_alive
+        duracao = keep_alive_seconds(self._used_keep_alive)
+        return duracao is None or time.monotonic() - ultimo < duracao
+    
+    def observe(self, presente: bool, personalidade: Dict, emocional: Dict,
+                situacional: Dict, quando: Optional[datetime] = None):
+        """A cada tick: ajusta o keep_alive e pede reaquecimento se for preciso"""
+        self._state = (personalidade, emocional, situacional)
+        if presente and not self._presente:
+            self.forecast.add(quando)
+        self._presente = presente
+        carregado = self.loaded()  # Antes de trocar o keep_alive
+        
+        ativo = presente or self.forecast.expected(quando)
+        keep_alive = self.active_keep_alive if ativo else self.idle_keep_alive
+        if keep_alive != self.keep_alive:
+            if self.keep_alive is not None and not ativo and carregado:
+                # Atividade acabou: o modelo sai da memória depois do keep_alive curto
+                self._request("release")
+            self.keep_alive = keep_alive
+            self.llm.set_keep_alive(keep_alive)
+        if ativo and self.ready and not self._warming and not carregado and self.pending != "warm":
+            # Atividade voltando e o modelo já descarregado: carrega antes do FALAR
+            self.rewarms += 1
+            self._request("warm")
+    
+    def _request(self, pedido: str):
+        self.pending = pedido
+        self._wake.set()
+    
+    def warmup_messages(self) -> List[Dict]:
+        personalidade, emocional, situacional = self._state or ({}, {}, {})
+        return self.expression.warmup_messages(personalidade, emocional, situacional)
+    
+    async def check(self) -> bool:
+        """Servidor no ar e modelo disponível?"""
+        try:
+            estado = await asyncio.wait_for(self.llm.ready(), self.timeout)
+        except Exception as e:
+            estado = {"server": False, "model": False, "error": str(e) or type(e).__name__}
+        self.server_ok = estado["server"]
+        self.model_ok = estado["model"]
+        self.error = estado.get("error")
+        if not (self.server_ok and self.model_ok):
+            self.ready = False
+        return self.server_ok and self.model_ok
+    
+    async def _ping(self, mensagens: List[Dict]) -> Tuple[float, float]:
+        """(latência, carga do modelo) em ms de um pedido de 1 token"""
+        start = time.perf_counter()
+        resposta = await asyncio.wait_for(self.llm.chat(mensagens, {"num_predict": 1}),
+                                          self.timeout)
+        return (time.perf_counter() - start) * 1000, (resposta.get("load_duration") or 0) / 1e6
+    
+    async def release(self):
+        """Pedido vazio: não gera nada, só reaplica o keep_alive em vigor"""
+        try:
+            await asyncio.wait_for(self.llm.chat([]), self.timeout)
+            self.releases += 1
+        except Exception as e:
+            logger.debug(f"keep_alive não reaplicado: {e}")
+    
+    async def warm_up(self) -> bool:
+        """Confere a prontidão e carrega o modelo; mede frio e quente"""
+        erro_anterior = self.error
+        if not await self.check():
+            self.failures += 1
+            if self.error != erro_anterior:
+                logger.warning(f"LLM não está pronto: {self.error}")
+            return False
+        self._warming = True
+        try:
+            mensagens = self.warmup_messages()
+            frio, self.last_load_ms = await self._ping(mensagens)
+            quente, _ = await self._ping(mensagens)
+        except Exception as e:
+            self.ready = False
+            self.failures += 1
+            self.error = str(e) or type(e).__name__
+            logger.warning(f"Falha ao aquecer o modelo: {self.error}")
+            return False
+        finally:
+            self._warming = False
+        self.cold.add(frio)
+        self.warm.add(quente)
+        self.warmups += 1
+        self.ready = True
+        self.error = None
+        logger.info(f"Modelo aquecido: frio {frio:.0f} ms (carga {self.last_load_ms:.0f} ms), "
+                    f"quente {quente:.0f} ms")
+        return True
+    
+    async def run(self):
+        """Em segundo plano: aquece, reconfere a prontidão e atende os pedidos de observe"""
+        while True:
+            pedido, self.pending = self.pending, None
+            self._wake.clear()
+            if pedido == "release":
+                await self.release()
+            elif not self.ready or pedido == "warm":
+                await self.warm_up()
+            else:
+                await self.check()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.recheck)
+            except asyncio.TimeoutError:
+                pass
+    
+    def get_stats(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "server": self.server_ok,
+            "model": self.model_ok,
+            "error": self.error,
+            "keep_alive": self.keep_alive,
+            "loaded": self.loaded(),
+            "warmups": self.warmups,
+            "rewarms": self.rewarms,
+            "releases": self.releases,
+            "failures": self.failures,
+            "cold_ms": self.cold.percentiles((50, 95)),
+            "warm_ms": self.warm.percentiles((50, 95)),
+            "last_load_ms": round(self.last_load_ms, 1)
+        }
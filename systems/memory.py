@@ -4,173 +4,1568 @@ Armazena eventos com peso emocional
 Diferencia memória de curto, médio e longo prazo
 """
 
+from collections import deque
+from contextlib import asynccontextmanager
+from array import array
+from itertools import islice
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
-from dataclasses import dataclass, asdict
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+import asyncio
 import json
+import logging
+import re
+import time
 import aiosqlite
 import os
 
+from .contexto_codec import CODEC_JSON, CodecDictionary, ContextoCodecs
+from .event_log import EventLogBackend
+from .memory_backend import MemoryBackend
+from .memory_consolidation import MemoryArchive, MemoryConsolidator
+from .semantic_memory import SemanticMemory
+
+logger = logging.getLogger(__name__)
+
+# Versão atual do schema (PRAGMA user_version)
+# 0/1: timestamp ISO-8601 em TEXT | 2: ts INTEGER (epoch em ms)
+# 3: memory_summaries (resumos da consolidação)
+# 4: count/first_ts (eventos repetidos agrupados numa linha; ts = última ocorrência)
+# 5: memory_fts (busca textual FTS5 sobre evento e resposta_dada)
+# 6: codec (tag do codec do contexto; 0 = JSON) e memory_codec_dicts
+SCHEMA_VERSION = 6
+
+# Memórias de longo prazo (índice parcial)
+LONG_TERM_WEIGHT = 0.7
+
+# Agregados de padrões são mantidos em buckets de 1 hora
+PATTERN_BUCKET_MS = 3600 * 1000
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Colunas na ordem esperada por MemoryEvent._from_row
+_EVENT_COLUMNS = ("id, ts, tipo, evento, resposta_dada, resultado, peso_emocional, contexto, "
+                  "count, first_ts, codec")
+
+# Tamanho dos lotes de cópia na migração online
+MIGRATION_CHUNK_SIZE = 5000
+
+# Decodifica contextos de eventos sem registro de codecs (sem dicionários)
+_DEFAULT_CODECS = ContextoCodecs()
+
+
+def _to_epoch_ms(timestamp: datetime) -> int:
+    """datetime (naive = hora local) → epoch em milissegundos"""
+    return int(timestamp.timestamp() * 1000)
+
+
+def _from_epoch_ms(ts: int) -> datetime:
+    """Epoch em milissegundos → datetime local (naive)"""
+    return datetime.fromtimestamp(ts / 1000)
+
+
+def _pattern_bucket(ts: int) -> int:
+    """Bucket horário de um timestamp em epoch ms"""
+    return ts // PATTERN_BUCKET_MS
+
 
-@dataclass
 class MemoryEvent:
-    """Evento armazenado na memória"""
-    id: Optional[int] = None
-    timestamp: datetime = None
-    tipo: str = ""  # "interacao", "presenca", "evento_emocional"
-    evento: str = ""
-    resposta_dada: str = ""
-    resultado: str = ""  # "aceita", "ignorada", "negativa"
-    peso_emocional: float = 0.5
-    contexto: Dict = None
-    
-    def __post_init__(self):
-        if self.timestamp is None:
-            self.timestamp = datetime.now()
-        if self.contexto is None:
-            self.contexto = {}
+    """
+    Evento armazenado na memória
+    Compacto (__slots__, sem __dict__ por instância); o contexto vindo do
+    banco só é decodificado quando acessado, pelo codec da sua tag
+    Repetições consecutivas viram um único evento: `count` ocorrências entre
+    `first_timestamp` e `timestamp` (a última)
+    """
+    
+    __slots__ = ("id", "timestamp", "tipo", "evento", "resposta_dada", "resultado",
+                 "peso_emocional", "count", "first_timestamp", "_contexto", "_contexto_raw",
+                 "_codec", "_codecs")
+    
+    _FIELDS = ("id", "timestamp", "tipo", "evento", "resposta_dada", "resultado",
+               "peso_emocional", "count", "first_timestamp", "contexto")
+    
+    def __init__(self, id: Optional[int] = None, timestamp: datetime = None,
+                 tipo: str = "", evento: str = "", resposta_dada: str = "",
+                 resultado: str = "", peso_emocional: float = 0.5,
+                 contexto: Dict = None, count: int = 1,
+                 first_timestamp: Optional[datetime] = None):
+        self.id = id
+        self.timestamp = timestamp if timestamp is not None else datetime.now()
+        self.tipo = tipo  # "interacao", "presenca", "evento_emocional"
+        self.evento = evento
+        self.resposta_dada = resposta_dada
+        self.resultado = resultado  # "aceita", "ignorada", "negativa"
+        self.peso_emocional = peso_emocional
+        self.count = count
+        self.first_timestamp = first_timestamp if first_timestamp is not None else self.timestamp
+        self._contexto = contexto if contexto is not None else {}
+        self._contexto_raw: Union[str, bytes, None] = None
+        self._codec = CODEC_JSON
+        self._codecs: Optional[ContextoCodecs] = None
+    
+    @classmethod
+    def _from_row(cls, id: int, ts: int, tipo: str, evento: str, resposta_dada: Optional[str],
+                  resultado: Optional[str], peso_emocional: float,
+                  contexto_raw: Union[str, bytes, None], count: int = 1,
+                  first_ts: Optional[int] = None, codec: Optional[int] = CODEC_JSON,
+                  codecs: Optional[ContextoCodecs] = None) -> "MemoryEvent":
+        """
+        Constrói a partir de uma linha do banco sem decodificar o contexto
+        `codecs` tem os dicionários do armazenamento de origem
+        """
+        event = cls.__new__(cls)
+        event.id = id
+        event.timestamp = _from_epoch_ms(ts)
+        event.tipo = tipo
+        event.evento = evento
+        event.resposta_dada = resposta_dada or ""
+        event.resultado = resultado or ""
+        event.peso_emocional = peso_emocional
+        event.count = count
+        event.first_timestamp = _from_epoch_ms(first_ts) if first_ts is not None else event.timestamp
+        event._contexto = None
+        event._contexto_raw = contexto_raw
+        event._codec = codec or CODEC_JSON
+        event._codecs = codecs
+        return event
+    
+    @property
+    def contexto(self) -> Dict:
+        if self._contexto is None:
+            self._contexto = (self._codecs or _DEFAULT_CODECS).decode(self._contexto_raw, self._codec)
+        return self._contexto
+    
+    @contexto.setter
+    def contexto(self, value: Dict):
+        self._contexto = value if value is not None else {}
+        self._contexto_raw = None
+        self._codec = CODEC_JSON
+    
+    def coalesce_key(self) -> tuple:
+        """Eventos com a mesma chave podem ser agrupados"""
+        return (self.tipo, self.evento, self.resposta_dada, self.resultado)
+    
+    def encode_contexto(self) -> str:
+        """Contexto em JSON (reaproveita o texto original se não foi decodificado)"""
+        if self._contexto is None and self._codec == CODEC_JSON:
+            return self._contexto_raw or '{}'
+        return json.dumps(self.contexto)
+    
+    def pack_contexto(self, codecs: ContextoCodecs) -> Tuple[Union[str, bytes, None], int]:
+        """
+        (payload, tag) para gravar com o codec padrão de `codecs`
+        Reaproveita o payload já codificado (lido ou selado) com os mesmos codecs
+        """
+        if self._contexto_raw is not None and self._codecs is codecs:
+            return self._contexto_raw, self._codec
+        return codecs.encode(self.contexto)
+    
+    def seal_contexto(self, codecs: ContextoCodecs):
+        """
+        Codifica o contexto agora: contexto inválido falha para quem grava
+        A gravação usa esse payload; trocar o contexto (setter) descarta o selo
+        """
+        self._contexto_raw, self._codec = self.pack_contexto(codecs)
+        self._codecs = codecs
+    
+    def to_dict(self) -> Dict:
+        """Converte para dicionário"""
+        return {name: getattr(self, name) for name in self._FIELDS}
+    
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, MemoryEvent):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+    
+    def __repr__(self) -> str:
+        campos = ", ".join(
+            f"{name}={getattr(self, name)!r}" for name in self._FIELDS if name != "contexto"
+        )
+        return f"MemoryEvent({campos})"
 
 
-class MemorySystem:
+class SQLiteConnectionManager:
     """
-    Sistema de memória com três níveis:
-    - Curto prazo: últimas falas e emoções
-    - Médio prazo: hábitos e padrões
-    - Longo prazo: momentos marcantes
+    Conexões persistentes com o SQLite
+    Um escritor (serializado por lock) e um pool pequeno de leitores
+    Em modo WAL leitores e escritor não se bloqueiam
     """
     
-    def __init__(self, db_path: str = "./data/prime.db"):
+    def __init__(self, db_path: str, reader_pool_size: int = 2,
+                 cache_size_kb: int = 8192, mmap_size: int = 64 * 1024 * 1024):
+        self.db_path = db_path
+        self.reader_pool_size = max(1, reader_pool_size)
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._readers: List[aiosqlite.Connection] = []
+        self._reader_queue: Optional[asyncio.Queue] = None
+        self._write_lock = asyncio.Lock()
+        self._open_lock = asyncio.Lock()
+        self._closed = False  # close() explícito: só open() reabre
+    
+    @property
+    def is_open(self) -> bool:
+        return self._writer is not None
+    
+    async def _connect(self, read_only: bool = False) -> aiosqlite.Connection:
+        """Abre uma conexão e aplica os pragmas de desempenho"""
+        conn = await aiosqlite.connect(self.db_path)
+        conn.row_factory = aiosqlite.Row
+        pragmas = [
+            "PRAGMA busy_timeout = 5000",
+            "PRAGMA synchronous = NORMAL",
+            f"PRAGMA cache_size = -{int(self.cache_size_kb)}",
+            f"PRAGMA mmap_size = {int(self.mmap_size)}",
+            "PRAGMA temp_store = MEMORY",
+        ]
+        if read_only:
+            pragmas.append("PRAGMA query_only = ON")
+        # executescript consome os resultados, sem deixar statements abertos
+        await conn.executescript(";\n".join(pragmas) + ";")
+        return conn
+    
+    async def open(self):
+        """Abre escritor e leitores (idempotente)"""
+        async with self._open_lock:
+            self._closed = False
+            if self._writer is not None:
+                return
+            writer = await self._connect()
+            # journal_mode é persistente no arquivo; basta o escritor definir
+            async with writer.execute("PRAGMA journal_mode = WAL") as cursor:
+                await cursor.fetchall()
+            self._writer = writer
+            self._reader_queue = asyncio.Queue()
+            for _ in range(self.reader_pool_size):
+                conn = await self._connect(read_only=True)
+                self._readers.append(conn)
+                self._reader_queue.put_nowait(conn)
+    
+    async def close(self):
+        """Fecha todas as conexões"""
+        async with self._open_lock:
+            self._closed = True
+            for conn in self._readers:
+                await conn.close()
+            self._readers = []
+            self._reader_queue = None
+            if self._writer is not None:
+                await self._writer.close()
+                self._writer = None
+    
+    async def _reopen(self):
+        """Abre no primeiro uso; depois de close() é erro de quem chamou"""
+        if self._closed:
+            raise RuntimeError(f"Conexões com {self.db_path} já foram fechadas")
+        await self.open()
+    
+    @asynccontextmanager
+    async def writer(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Conexão de escrita (uma transação por vez)"""
+        if self._writer is None:
+            await self._reopen()
+        async with self._write_lock:
+            yield self._writer
+    
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Empresta uma conexão de leitura do pool"""
+        if self._writer is None:
+            await self._reopen()
+        queue = self._reader_queue
+        conn = await queue.get()
+        try:
+            yield conn
+        finally:
+            queue.put_nowait(conn)
+
+
+class WriteBehindQueue:
+    """
+    Fila de escrita assíncrona (write-behind) com group commit
+    Acumula eventos e grava em lote numa única transação quando
+    atinge o tamanho do lote ou o intervalo máximo de espera
+    Fila limitada: quando cheia, quem grava espera (backpressure)
+    Lote que falha é regravado um evento por vez: só os que falham de novo
+    são descartados. Depois de stop(), put() é erro
+    """
+    
+    _STOP = object()
+    
+    def __init__(self, write_batch: Callable[[List], Awaitable[None]],
+                 batch_size: int = 64, flush_interval: float = 0.5,
+                 max_size: int = 1024):
+        self._write_batch = write_batch
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_size = max(1, max_size)
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopped = False
+        
+        # Métricas
+        self.flushes = 0
+        self.events_written = 0
+        self.errors = 0  # Lotes que falharam inteiros
+        self.dropped = 0  # Eventos que falharam também sozinhos
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+    
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def start(self):
+        """Inicia a tarefa de gravação (requer loop em execução)"""
+        if self.is_running:
+            return
+        self._stopped = False
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._task = asyncio.create_task(self._run())
+    
+    async def put(self, event):
+        """Enfileira evento; aguarda se a fila estiver cheia"""
+        if self._stopped:
+            raise RuntimeError("Fila de escrita da memória já foi encerrada")
+        if not self.is_running:
+            self.start()
+        await self._queue.put(event)
+    
+    async def flush(self):
+        """Força a gravação de tudo o que já foi enfileirado"""
+        if not self.is_running:
+            return
+        barrier = asyncio.get_running_loop().create_future()
+        await self._queue.put(barrier)
+        await barrier
+    
+    async def stop(self):
+        """Grava o que estiver pendente e encerra a tarefa"""
+        self._stopped = True
+        if not self.is_running:
+            return
+        await self._queue.put(self._STOP)
+        await self._task
+        self._task = None
+    
+    async def _run(self):
+        """Loop de coleta e gravação em lote"""
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            batch = []
+            barriers = []
+            item = await self._queue.get()
+            deadline = loop.time() + self.flush_interval
+            while True:
+                if item is self._STOP:
+                    stopping = True
+                    break
+                if isinstance(item, asyncio.Future):
+                    barriers.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            
+            if stopping:
+                # Quem já esperava vaga quando stop() chegou entra depois do _STOP
+                while not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    if isinstance(item, asyncio.Future):
+                        barriers.append(item)
+                    elif item is not self._STOP:
+                        batch.append(item)
+            if batch:
+                await self._flush(batch)
+            for barrier in barriers:
+                if not barrier.done():
+                    barrier.set_result(None)
+    
+    async def _flush(self, batch: List):
+        """Grava um lote e atualiza métricas; se falhar, grava um a um"""
+        start = time.perf_counter()
+        try:
+            await self._write_batch(batch)
+            written = len(batch)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Erro ao gravar lote de {len(batch)} eventos, gravando um a um: {e}")
+            written = await self._flush_one_by_one(batch)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.flushes += 1
+        self.events_written += written
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self._total_flush_ms += elapsed_ms
+    
+    async def _flush_one_by_one(self, batch: List) -> int:
+        """Um evento por escrita: um evento ruim não leva os outros junto"""
+        written = 0
+        for event in batch:
+            try:
+                await self._write_batch([event])
+                written += 1
+            except Exception as e:
+                self.dropped += 1
+                logger.error(f"Evento descartado pela memória: {e} ({event!r})")
+        return written
+    
+    def get_stats(self) -> Dict:
+        """Retorna profundidade da fila e latência de gravação"""
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_size": self.max_size,
+            "flushes": self.flushes,
+            "events_written": self.events_written,
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "avg_flush_ms": round(self._total_flush_ms / self.flushes, 3) if self.flushes else 0.0,
+            "max_flush_ms": round(self.max_flush_ms, 3)
+        }
+
+
+class SQLiteMemoryBackend(MemoryBackend):
+    """
+    Backend padrão: SQLite em WAL (um escritor + pool de leitores)
+    Schema versionado (PRAGMA user_version), agregados de padrões
+    materializados, busca FTS5 e consolidação com resumos diários
+    Contexto em TEXT (JSON) ou BLOB (packed), conforme a coluna codec
+    """
+    
+    name = "sqlite"
+    
+    def __init__(self, db_path: str = "./data/prime.db", reader_pool_size: int = 2,
+                 cache_size_kb: int = 8192, mmap_size: int = 64 * 1024 * 1024,
+                 archive: Optional[MemoryArchive] = None, hot_days: int = 30,
+                 summary_weight: float = 0.3):
         self.db_path = db_path
         self._ensure_db_dir()
-        self._short_term: List[MemoryEvent] = []  # Últimas 20 interações
-        self._max_short_term = 20
+        self._db = SQLiteConnectionManager(
+            db_path,
+            reader_pool_size=reader_pool_size,
+            cache_size_kb=cache_size_kb,
+            mmap_size=mmap_size
+        )
+        # Consolidação: arquiva eventos antigos fora da tabela quente
+        self._consolidator = MemoryConsolidator(
+            self._db,
+            _EVENT_COLUMNS,
+            archive or MemoryArchive(os.path.join(os.path.dirname(db_path), "archive")),
+            hot_days=hot_days,
+            summary_weight=summary_weight,
+            keep_weight=LONG_TERM_WEIGHT
+        )
     
     def _ensure_db_dir(self):
         """Garante que o diretório do banco existe"""
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
     
-    async def initialize(self):
-        """Inicializa banco de dados"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS memory_events (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT NOT NULL,
-                    tipo TEXT NOT NULL,
-                    evento TEXT NOT NULL,
-                    resposta_dada TEXT,
-                    resultado TEXT,
-                    peso_emocional REAL DEFAULT 0.5,
-                    contexto TEXT
+    async def open(self):
+        """Abre o banco (cria ou migra o schema)"""
+        await self._db.open()
+        async with self._db.writer() as db:
+            async with db.execute("PRAGMA user_version") as cursor:
+                version = (await cursor.fetchone())[0]
+            async with db.execute("""
+                SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'memory_events'
+            """) as cursor:
+                exists = await cursor.fetchone() is not None
+        
+        if not exists:
+            async with self._db.writer() as db:
+                # Só tem efeito antes da primeira tabela; permite VACUUM incremental
+                await db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                await db.execute("BEGIN IMMEDIATE")
+                await self._create_schema(db)
+                await db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                await db.commit()
+        elif version < SCHEMA_VERSION:
+            for target in range(max(version, 1) + 1, SCHEMA_VERSION + 1):
+                logger.info(f"Migrando memória para schema v{target}...")
+                await self._MIGRATIONS[target](self)
+    
+    async def close(self):
+        await self._db.close()
+    
+    @staticmethod
+    async def _create_schema(db):
+        """Cria as tabelas do schema atual"""
+        await SQLiteMemoryBackend._create_events_table(db)
+        # Agregado materializado de padrões (contagem por hora, tipo e resultado)
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS memory_patterns (
+                bucket INTEGER NOT NULL,
+                tipo TEXT NOT NULL,
+                resultado TEXT NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (bucket, tipo, resultado)
+            ) WITHOUT ROWID
+        """)
+        # Resumos diários de eventos antigos de baixo peso (consolidação)
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS memory_summaries (
+                dia TEXT NOT NULL,
+                tipo TEXT NOT NULL,
+                evento TEXT NOT NULL,
+                resultado TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                peso_total REAL NOT NULL,
+                first_ts INTEGER NOT NULL,
+                last_ts INTEGER NOT NULL,
+                PRIMARY KEY (dia, tipo, evento, resultado)
+            ) WITHOUT ROWID
+        """)
+        await SQLiteMemoryBackend._create_codec_table(db)
+        await SQLiteMemoryBackend._create_indexes(db)
+        await SQLiteMemoryBackend._create_fts(db)
+    
+    @staticmethod
+    async def _create_events_table(db, table: str = "memory_events"):
+        """Cria a tabela de eventos no formato atual"""
+        await db.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts INTEGER NOT NULL,
+                tipo TEXT NOT NULL,
+                evento TEXT NOT NULL,
+                resposta_dada TEXT,
+                resultado TEXT,
+                peso_emocional REAL DEFAULT 0.5,
+                contexto TEXT,
+                count INTEGER NOT NULL DEFAULT 1,
+                first_ts INTEGER,
+                codec INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+    
+    @staticmethod
+    async def _create_codec_table(db):
+        """Dicionários treinados do codec de contexto (imutáveis, por id)"""
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS memory_codec_dicts (
+                id INTEGER PRIMARY KEY,
+                data BLOB NOT NULL,
+                created_ts INTEGER NOT NULL
+            )
+        """)
+    
+    @staticmethod
+    async def _create_indexes(db):
+        """Índices de memory_events"""
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_ts ON memory_events(ts)")
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_tipo_ts ON memory_events(tipo, ts)")
+        await db.execute("""
+            CREATE INDEX IF NOT EXISTS idx_peso_ts ON memory_events(peso_emocional, ts)
+        """)
+        # Longo prazo: índice parcial só com os momentos marcantes
+        await db.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_longo_prazo
+            ON memory_events(peso_emocional DESC, ts DESC)
+            WHERE peso_emocional >= {LONG_TERM_WEIGHT}
+        """)
+    
+    @staticmethod
+    async def _create_fts(db):
+        """
+        Índice FTS5 (conteúdo externo: o texto fica só em memory_events)
+        Mantido em sincronia por triggers; atualizações que não mudam o texto
+        (agrupamento de repetições) não tocam no índice
+        """
+        await db.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS memory_fts USING fts5(
+                evento, resposta_dada,
+                content='memory_events', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        """)
+        await db.execute("""
+            CREATE TRIGGER IF NOT EXISTS memory_fts_insert AFTER INSERT ON memory_events BEGIN
+                INSERT INTO memory_fts (rowid, evento, resposta_dada)
+                VALUES (new.id, new.evento, new.resposta_dada);
+            END
+        """)
+        await db.execute("""
+            CREATE TRIGGER IF NOT EXISTS memory_fts_delete AFTER DELETE ON memory_events BEGIN
+                INSERT INTO memory_fts (memory_fts, rowid, evento, resposta_dada)
+                VALUES ('delete', old.id, old.evento, old.resposta_dada);
+            END
+        """)
+        await db.execute("""
+            CREATE TRIGGER IF NOT EXISTS memory_fts_update
+            AFTER UPDATE OF evento, resposta_dada ON memory_events BEGIN
+                INSERT INTO memory_fts (memory_fts, rowid, evento, resposta_dada)
+                VALUES ('delete', old.id, old.evento, old.resposta_dada);
+                INSERT INTO memory_fts (rowid, evento, resposta_dada)
+                VALUES (new.id, new.evento, new.resposta_dada);
+            END
+        """)
+    
+    async def _migrate_to_v2(self):
+        """
+        v1 → v2: timestamp TEXT → ts INTEGER (epoch ms)
+        Migração online: copia em lotes para uma tabela nova, com commit a
+        cada lote (leitores continuam usando a tabela antiga), e troca as
+        tabelas numa transação curta no final
+        """
+        async with self._db.writer() as db:
+            await db.execute("DROP TABLE IF EXISTS memory_events_v2")
+            await self._create_events_table(db, "memory_events_v2")
+            await db.commit()
+        
+        last_id = 0
+        while True:
+            async with self._db.writer() as db:
+                copied = await self._copy_v1_rows(db, last_id, MIGRATION_CHUNK_SIZE)
+                await db.commit()
+            if not copied:
+                break
+            last_id = copied
+        
+        async with self._db.writer() as db:
+            await db.execute("BEGIN IMMEDIATE")
+            # Linhas gravadas durante a cópia
+            while True:
+                copied = await self._copy_v1_rows(db, last_id, MIGRATION_CHUNK_SIZE)
+                if not copied:
+                    break
+                last_id = copied
+            await db.execute("DROP TABLE memory_events")
+            await db.execute("ALTER TABLE memory_events_v2 RENAME TO memory_events")
+            await self._create_schema(db)
+            await self._rebuild_patterns(db, commit=False)
+            await db.execute("PRAGMA user_version = 2")
+            await db.commit()
+        logger.info("Memória migrada para schema v2")
+    
+    @staticmethod
+    async def _copy_v1_rows(db, after_id: int, limit: int) -> int:
+        """Copia um lote de linhas v1 convertendo o timestamp; retorna o último id"""
+        async with db.execute("""
+            SELECT id, timestamp, tipo, evento, resposta_dada, resultado,
+                   peso_emocional, contexto
+            FROM memory_events
+            WHERE id > ?
+            ORDER BY id
+            LIMIT ?
+        """, (after_id, limit)) as cursor:
+            rows = await cursor.fetchall()
+        if not rows:
+            return 0
+        await db.executemany("""
+            INSERT INTO memory_events_v2
+            (id, ts, tipo, evento, resposta_dada, resultado, peso_emocional, contexto)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(
+            row['id'],
+            _to_epoch_ms(datetime.fromisoformat(row['timestamp'])),
+            row['tipo'],
+            row['evento'],
+            row['resposta_dada'],
+            row['resultado'],
+            row['peso_emocional'],
+            row['contexto']
+        ) for row in rows])
+        return rows[-1]['id']
+    
+    async def _migrate_to_v3(self):
+        """v2 → v3: tabela de resumos da consolidação"""
+        async with self._db.writer() as db:
+            await db.execute("BEGIN IMMEDIATE")
+            await self._create_schema(db)
+            await db.execute("PRAGMA user_version = 3")
+            await db.commit()
+    
+    async def _migrate_to_v4(self):
+        """v3 → v4: colunas count e first_ts (ALTER sem reescrever a tabela)"""
+        async with self._db.writer() as db:
+            async with db.execute("PRAGMA table_info(memory_events)") as cursor:
+                colunas = {row['name'] for row in await cursor.fetchall()}
+            await db.execute("BEGIN IMMEDIATE")
+            if "count" not in colunas:
+                await db.execute(
+                    "ALTER TABLE memory_events ADD COLUMN count INTEGER NOT NULL DEFAULT 1"
                 )
-            """)
-            await db.execute("""
-                CREATE INDEX IF NOT EXISTS idx_timestamp ON memory_events(timestamp)
-            """)
+            if "first_ts" not in colunas:
+                await db.execute("ALTER TABLE memory_events ADD COLUMN first_ts INTEGER")
+            await db.execute("PRAGMA user_version = 4")
+            await db.commit()
+    
+    async def _migrate_to_v5(self):
+        """v4 → v5: índice FTS5, populado a partir de memory_events"""
+        async with self._db.writer() as db:
+            await db.execute("BEGIN IMMEDIATE")
+            await self._create_fts(db)
+            await db.execute("INSERT INTO memory_fts (memory_fts) VALUES ('rebuild')")
+            await db.execute("PRAGMA user_version = 5")
+            await db.commit()
+    
+    async def _migrate_to_v6(self):
+        """
+        v5 → v6: coluna codec (ALTER sem reescrever a tabela) e dicionários
+        Linhas existentes ficam com codec 0: o contexto continua em JSON
+        """
+        async with self._db.writer() as db:
+            async with db.execute("PRAGMA table_info(memory_events)") as cursor:
+                colunas = {row['name'] for row in await cursor.fetchall()}
+            await db.execute("BEGIN IMMEDIATE")
+            if "codec" not in colunas:
+                await db.execute(
+                    "ALTER TABLE memory_events ADD COLUMN codec INTEGER NOT NULL DEFAULT 0"
+                )
+            await self._create_codec_table(db)
+            await db.execute("PRAGMA user_version = 6")
+            await db.commit()
+    
+    async def schema_version(self) -> int:
+        """Versão do schema gravada no banco"""
+        async with self._db.reader() as db:
+            async with db.execute("PRAGMA user_version") as cursor:
+                return (await cursor.fetchone())[0]
+    
+    _MIGRATIONS = {
+        2: _migrate_to_v2,
+        3: _migrate_to_v3,
+        4: _migrate_to_v4,
+        5: _migrate_to_v5,
+        6: _migrate_to_v6,
+    }
+    
+    async def _fetch_events(self, clauses: str, params: tuple = ()) -> List[tuple]:
+        """Executa SELECT das colunas de evento e retorna tuplas cruas"""
+        async with self._db.reader() as db:
+            async with db.execute(
+                f"SELECT {_EVENT_COLUMNS} FROM memory_events {clauses}", params
+            ) as cursor:
+                # Tuplas simples: evita um sqlite3.Row por linha
+                cursor.row_factory = None
+                return await cursor.fetchall()
+    
+    async def write_batch(self, rows: List[tuple],
+                          merge_into: Optional[int] = None) -> Tuple[bool, List[int]]:
+        """Grava o lote (e os agregados de padrões) numa única transação"""
+        async with self._db.writer() as db:
+            try:
+                return await self._write_rows(db, rows, merge_into)
+            except Exception:
+                # Sem isso o próximo commit gravaria a metade do lote que entrou
+                await db.rollback()
+                raise
+    
+    async def _write_rows(self, db, rows: List[tuple],
+                          merge_into: Optional[int]) -> Tuple[bool, List[int]]:
+        merged = False
+        novos = rows
+        if merge_into is not None and rows:
+            ts, _, _, _, _, peso, _, count, _, _ = rows[0]
+            async with db.execute("""
+                UPDATE memory_events
+                SET count = count + ?, ts = ?,
+                    peso_emocional = MAX(peso_emocional, ?)
+                WHERE id = ?
+            """, (count, ts, peso, merge_into)) as cursor:
+                merged = cursor.rowcount > 0
+            if merged:
+                novos = rows[1:]
+        
+        ids: List[int] = []
+        if novos:
+            await db.executemany("""
+                INSERT INTO memory_events 
+                (ts, tipo, evento, resposta_dada, resultado, peso_emocional, contexto,
+                 count, first_ts, codec)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, novos)
+            # AUTOINCREMENT com um único escritor: ids do lote são contíguos
+            async with db.execute("SELECT last_insert_rowid()") as cursor:
+                last_id = (await cursor.fetchone())[0]
+            ids = list(range(last_id - len(novos) + 1, last_id + 1))
+        
+        await self._update_patterns(db, rows)
+        await db.commit()
+        return merged, ids
+    
+    @staticmethod
+    async def _update_patterns(db, rows: List[tuple]):
+        """
+        Incrementa os agregados de padrões (na mesma transação da escrita)
+        Cada linha conta no bucket do seu ts, como em _rebuild_patterns
+        """
+        counts: Dict[tuple, int] = {}
+        for row in rows:
+            ts, tipo, resultado, count = row[0], row[1], row[4], row[7]
+            key = (_pattern_bucket(ts), tipo, resultado or "")
+            counts[key] = counts.get(key, 0) + count
+        await db.executemany("""
+            INSERT INTO memory_patterns (bucket, tipo, resultado, count)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (bucket, tipo, resultado)
+            DO UPDATE SET count = count + excluded.count
+        """, [(*key, count) for key, count in counts.items()])
+    
+    @staticmethod
+    async def _rebuild_patterns(db, commit: bool = True):
+        """
+        Recalcula os agregados de padrões a partir de memory_events
+        Repetições agrupadas contam no bucket da última ocorrência; eventos
+        já arquivados pela consolidação ficam de fora (ver rebuild_patterns)
+        """
+        await db.execute("DELETE FROM memory_patterns")
+        await db.execute(f"""
+            INSERT INTO memory_patterns (bucket, tipo, resultado, count)
+            SELECT ts / {PATTERN_BUCKET_MS}, tipo, COALESCE(resultado, ''), SUM(count)
+            FROM memory_events
+            GROUP BY 1, 2, 3
+        """)
+        if commit:
+            await db.commit()
+    
+    async def rebuild_patterns(self):
+        """
+        Tabela quente + partições arquivadas: a consolidação tira os eventos
+        da tabela, mas eles continuam contando nos padrões
+        """
+        archive = self._consolidator.archive
+        async with self._db.writer() as db:
+            await self._rebuild_patterns(db, commit=False)
+            for mes in archive.list():
+                # Linhas do arquivo sem o id, na ordem de write_batch
+                await self._update_patterns(db, [row[1:] for row in await archive.read(mes)])
+            await db.commit()
+    
+    async def scan(self, tipo: Optional[str] = None, since_ms: Optional[int] = None,
+                   until_ms: Optional[int] = None, after: Optional[Tuple[int, int]] = None,
+                   limit: int = 500) -> List[tuple]:
+        condicoes = []
+        params: list = []
+        if tipo is not None:
+            condicoes.append("tipo = ?")
+            params.append(tipo)
+        if since_ms is not None:
+            condicoes.append("ts >= ?")
+            params.append(since_ms)
+        if until_ms is not None:
+            condicoes.append("ts < ?")
+            params.append(until_ms)
+        if after is not None:
+            condicoes.append("(ts, id) > (?, ?)")
+            params.extend(after)
+        where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        return await self._fetch_events(f"{where} ORDER BY ts, id LIMIT ?", (*params, limit))
+    
+    async def fetch_last(self, limit: int) -> List[tuple]:
+        return await self._fetch_events("ORDER BY id DESC LIMIT ?", (limit,))
+    
+    async def fetch_ids(self, ids: List[int]) -> List[tuple]:
+        placeholders = ", ".join("?" * len(ids))
+        return await self._fetch_events(f"WHERE id IN ({placeholders})", tuple(ids))
+    
+    async def fetch_after_id(self, after_id: int, limit: int) -> List[tuple]:
+        return await self._fetch_events("WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit))
+    
+    async def fetch_by_type(self, tipo: str, since_ms: int) -> List[tuple]:
+        return await self._fetch_events("""
+            WHERE tipo = ? AND ts > ?
+            ORDER BY ts DESC
+        """, (tipo, since_ms))
+    
+    async def count(self, tipo: str, since_ms: int) -> int:
+        async with self._db.reader() as db:
+            async with db.execute("""
+                SELECT COALESCE(SUM(count), 0) FROM memory_events
+                WHERE tipo = ? AND ts > ?
+            """, (tipo, since_ms)) as cursor:
+                return (await cursor.fetchone())[0]
+    
+    async def fetch_emotional(self, min_weight: float, limit: int = 50) -> List[tuple]:
+        # Condição literal permite ao SQLite usar o índice parcial de longo prazo
+        long_term = f"AND peso_emocional >= {LONG_TERM_WEIGHT}" if min_weight >= LONG_TERM_WEIGHT else ""
+        return await self._fetch_events(f"""
+            WHERE peso_emocional >= ? {long_term}
+            ORDER BY peso_emocional DESC, ts DESC
+            LIMIT ?
+        """, (min_weight, limit))
+    
+    async def patterns(self, since_ms: int) -> List[tuple]:
+        """Soma apenas os buckets horários da janela (custo independe do histórico)"""
+        async with self._db.reader() as db:
+            async with db.execute("""
+                SELECT tipo, resultado, SUM(count) as count
+                FROM memory_patterns
+                WHERE bucket >= ?
+                GROUP BY tipo, resultado
+                ORDER BY count DESC
+            """, (_pattern_bucket(since_ms),)) as cursor:
+                cursor.row_factory = None
+                return await cursor.fetchall()
+    
+    async def columns(self, tipo: Optional[str], since_ms: int) -> Dict:
+        where = "WHERE ts > ?"
+        params: tuple = (since_ms,)
+        if tipo is not None:
+            where = "WHERE tipo = ? AND ts > ?"
+            params = (tipo, since_ms)
+        
+        colunas = {
+            "id": array("q"),
+            "ts": array("q"),
+            "tipo": [],
+            "evento": [],
+            "resultado": [],
+            "peso_emocional": array("d"),
+            "count": array("q"),
+        }
+        async with self._db.reader() as db:
+            async with db.execute(f"""
+                SELECT id, ts, tipo, evento, resultado, peso_emocional, count
+                FROM memory_events {where}
+                ORDER BY ts
+            """, params) as cursor:
+                cursor.row_factory = None
+                for row in await cursor.fetchall():
+                    colunas["id"].append(row[0])
+                    colunas["ts"].append(row[1])
+                    colunas["tipo"].append(row[2])
+                    colunas["evento"].append(row[3])
+                    colunas["resultado"].append(row[4] or "")
+                    colunas["peso_emocional"].append(row[5])
+                    colunas["count"].append(row[6])
+        return colunas
+    
+    async def search(self, texto: str, limit: int,
+                     since_ms: Optional[int] = None) -> List[tuple]:
+        """FTS5 com ranking BM25: [(linha, score, trecho)], score maior = mais relevante"""
+        termos = _TOKEN_RE.findall(texto)
+        if not termos:
+            return []
+        # Cada termo entre aspas: o texto do usuário nunca vira sintaxe FTS
+        consulta = " ".join('"' + termo.replace('"', '""') + '"' for termo in termos)
+        params: list = [consulta]
+        filtro = ""
+        if since_ms is not None:
+            filtro = "AND e.ts >= ?"
+            params.append(since_ms)
+        params.append(limit)
+        colunas = ", ".join(f"e.{coluna.strip()}" for coluna in _EVENT_COLUMNS.split(","))
+        async with self._db.reader() as db:
+            async with db.execute(f"""
+                SELECT {colunas}, bm25(memory_fts) AS rank_bm25,
+                       snippet(memory_fts, -1, '[', ']', '…', 10) AS trecho
+                FROM memory_fts
+                JOIN memory_events e ON e.id = memory_fts.rowid
+                WHERE memory_fts MATCH ? {filtro}
+                ORDER BY rank_bm25
+                LIMIT ?
+            """, params) as cursor:
+                cursor.row_factory = None
+                rows = await cursor.fetchall()
+        return [(row[:-2], -row[-2], row[-1]) for row in rows]
+    
+    async def import_rows(self, rows: List[tuple]) -> List[int]:
+        async with self._db.writer() as db:
+            inseridos = []
+            for row in rows:
+                async with db.execute(f"""
+                    INSERT OR IGNORE INTO memory_events ({_EVENT_COLUMNS})
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, row) as cursor:
+                    if cursor.rowcount > 0:
+                        inseridos.append(row)
+            await self._update_patterns(db, [row[1:] for row in inseridos])
+            await db.commit()
+        return [row[0] for row in inseridos]
+    
+    async def codec_dictionaries(self) -> List[bytes]:
+        async with self._db.reader() as db:
+            async with db.execute("SELECT data FROM memory_codec_dicts ORDER BY id") as cursor:
+                return [row[0] for row in await cursor.fetchall()]
+    
+    async def save_codec_dictionary(self, dict_id: int, data: bytes):
+        async with self._db.writer() as db:
             await db.execute("""
-                CREATE INDEX IF NOT EXISTS idx_tipo ON memory_events(tipo)
-            """)
+                INSERT INTO memory_codec_dicts (id, data, created_ts) VALUES (?, ?, ?)
+            """, (dict_id, data, _to_epoch_ms(datetime.now())))
             await db.commit()
     
+    async def consolidate(self, now: Optional[datetime] = None) -> Dict:
+        return await self._consolidator.consolidate(now)
+    
+    async def summaries(self, since_day: str) -> List[Dict]:
+        async with self._db.reader() as db:
+            async with db.execute("""
+                SELECT dia, tipo, evento, resultado, count,
+                       peso_total / count AS peso_medio, first_ts, last_ts
+                FROM memory_summaries
+                WHERE dia >= ?
+                ORDER BY dia DESC, count DESC
+            """, (since_day,)) as cursor:
+                return [dict(row) for row in await cursor.fetchall()]
+    
+    async def vacuum(self):
+        await self._consolidator.full_vacuum()
+    
+    def get_stats(self) -> Dict:
+        return {
+            "backend": self.name,
+            "consolidation": self._consolidator.get_stats()
+        }
+
+
+class MemorySystem:
+    """
+    Sistema de memória com três níveis:
+    - Curto prazo: últimas falas e emoções
+    - Médio prazo: hábitos e padrões
+    - Longo prazo: momentos marcantes
+    
+    Escritas passam por uma fila write-behind: consultas ao armazenamento
+    enxergam um evento após o próximo flush (ou após flush())
+    O armazenamento é um MemoryBackend: "sqlite" (padrão) ou "log"
+    (log segmentado append-only, para taxas altas de eventos)
+    O contexto é gravado com o codec `contexto_codec` ("auto", "packed" ou
+    "json"; auto = json até haver um dicionário, packed depois); com
+    codec_auto_train > 0, o dicionário do packed é treinado sozinho quando
+    já há esse número de eventos gravados
+    """
+    
+    def __init__(self, db_path: str = "./data/prime.db", reader_pool_size: int = 2,
+                 cache_size_kb: int = 8192, mmap_size: int = 64 * 1024 * 1024,
+                 write_batch_size: int = 64, write_flush_interval: float = 0.5,
+                 write_queue_size: int = 1024, short_term_size: int = 20,
+                 semantic_index_path: Optional[str] = None, semantic_dim: int = 128,
+                 archive_path: Optional[str] = None, hot_days: int = 30,
+                 summary_weight: float = 0.3,
+                 consolidation_interval: Optional[float] = None,
+                 coalesce_window: float = 300.0,
+                 backend: Union[str, MemoryBackend] = "sqlite",
+                 log_path: Optional[str] = None, log_segment_records: int = 65536,
+                 log_segment_bytes: int = 32 * 1024 * 1024,
+                 contexto_codec: str = "auto", codec_auto_train: int = 0):
+        self.db_path = db_path
+        # Codecs do contexto (dicionários treinados são carregados em initialize())
+        self._codecs = ContextoCodecs(contexto_codec)
+        self.codec_auto_train = codec_auto_train
+        # Partições mensais de eventos consolidados (comuns a todos os backends)
+        self._archive = MemoryArchive(
+            archive_path or os.path.join(os.path.dirname(db_path), "archive"),
+            codecs=self._codecs
+        )
+        if isinstance(backend, MemoryBackend):
+            self._backend = backend
+        elif backend == "sqlite":
+            self._backend = SQLiteMemoryBackend(
+                db_path,
+                reader_pool_size=reader_pool_size,
+                cache_size_kb=cache_size_kb,
+                mmap_size=mmap_size,
+                archive=self._archive,
+                hot_days=hot_days,
+                summary_weight=summary_weight
+            )
+        elif backend == "log":
+            self._backend = EventLogBackend(
+                log_path or os.path.join(os.path.dirname(db_path), "event_log"),
+                segment_records=log_segment_records,
+                segment_bytes=log_segment_bytes,
+                archive=self._archive,
+                hot_days=hot_days,
+                keep_weight=LONG_TERM_WEIGHT
+            )
+        else:
+            raise ValueError(f"Backend de memória desconhecido: {backend}")
+        self._write_queue = WriteBehindQueue(
+            self._write_batch,
+            batch_size=write_batch_size,
+            flush_interval=write_flush_interval,
+            max_size=write_queue_size
+        )
+        # Buffer circular: append e descarte do mais antigo em O(1)
+        self._max_short_term = short_term_size
+        self._short_term: deque = deque(maxlen=short_term_size)
+        # Recordação semântica (opcional): índice vetorial ao lado do banco
+        self._semantic: Optional[SemanticMemory] = None
+        if semantic_index_path:
+            self._semantic = SemanticMemory(semantic_index_path, dim=semantic_dim)
+        self._consolidation_interval = consolidation_interval
+        self._consolidation_task: Optional[asyncio.Task] = None
+        self._initialized = False
+        # Agrupamento de repetições: janela máxima entre ocorrências (0 desliga)
+        self.coalesce_window_ms = int(coalesce_window * 1000)
+        self._last_row: Optional[tuple] = None  # (id, chave, ts) da última linha gravada
+        self.coalesced = 0
+    
+    @property
+    def backend(self) -> MemoryBackend:
+        return self._backend
+    
+    async def initialize(self):
+        """
+        Abre o armazenamento (cria ou migra) e reconstrói o curto prazo
+        Idempotente até close(): a consolidação e o resto rodam uma vez só
+        """
+        if self._initialized:
+            return
+        self._initialized = True
+        await self._backend.open()
+        for data in await self._backend.codec_dictionaries():
+            self._codecs.add_dictionary(CodecDictionary.from_bytes(data))
+        if (self.codec_auto_train > 0 and self._codecs.dictionary is None
+                and (self._codecs.auto or self._codecs.default is self._codecs.packed)):
+            await self._auto_train_codec()
+        await self._load_short_term()
+        rows = await self._backend.fetch_last(1)
+        if rows:
+            ultimo = self._hydrate(rows)[0]
+            self._last_row = (ultimo.id, ultimo.coalesce_key(), _to_epoch_ms(ultimo.timestamp))
+        if self._semantic is not None:
+            await asyncio.to_thread(self._semantic.open)
+            await self._index_semantic_backlog()
+        self._write_queue.start()
+        if self._consolidation_interval:
+            self._consolidation_task = asyncio.create_task(
+                self._consolidation_loop(self._consolidation_interval)
+            )
+    
+    async def _consolidation_loop(self, interval: float):
+        """Consolidação periódica em background"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self._backend.consolidate()
+            except NotImplementedError as e:
+                logger.warning(f"Consolidação periódica desativada: {e}")
+                return
+            except Exception as e:
+                logger.error(f"Erro na consolidação da memória: {e}", exc_info=True)
+    
+    async def _auto_train_codec(self):
+        """Primeiro dicionário do codec, assim que houver amostras suficientes"""
+        try:
+            dictionary = await self.train_codec(self.codec_auto_train,
+                                                min_samples=self.codec_auto_train)
+        except NotImplementedError as e:
+            logger.warning(f"Treino do codec de contexto desativado: {e}")
+            return
+        if dictionary is not None:
+            logger.info(f"Dicionário do codec de contexto treinado: {dictionary.get_stats()}")
+    
+    async def train_codec(self, sample_size: int = 5000,
+                          min_samples: int = 1) -> Optional[CodecDictionary]:
+        """
+        Treina um dicionário novo do codec packed com os contextos mais recentes
+        e passa a usá-lo nas gravações; linhas antigas mantêm o dicionário delas
+        Retorna None se houver menos de min_samples eventos
+        """
+        await self.flush()
+        rows = await self._backend.fetch_last(sample_size)
+        if len(rows) < max(1, min_samples):
+            return None
+        samples = [event.contexto for event in self._hydrate(rows)]
+        atual = self._codecs.dictionary
+        dictionary = CodecDictionary.train((atual.id if atual is not None else 0) + 1, samples)
+        # Gravado antes de ser usado: nenhuma linha referencia dicionário que não está no disco
+        await self._backend.save_codec_dictionary(dictionary.id, dictionary.to_bytes())
+        self._codecs.add_dictionary(dictionary)
+        return dictionary
+    
+    async def get_schema_version(self) -> int:
+        """Versão do schema (ou formato) gravado pelo backend"""
+        return await self._backend.schema_version()
+    
+    async def _load_short_term(self):
+        """Reconstrói a memória de curto prazo a partir dos últimos eventos gravados"""
+        rows = await self._backend.fetch_last(self._max_short_term)
+        self._short_term.clear()
+        self._short_term.extend(self._hydrate(reversed(rows)))
+    
+    def _hydrate(self, rows) -> List[MemoryEvent]:
+        """Caminho único de hidratação: linhas cruas → MemoryEvent"""
+        from_row = MemoryEvent._from_row
+        codecs = self._codecs
+        return [from_row(*row, codecs=codecs) for row in rows]
+    
     async def store_event(self, event: MemoryEvent):
-        """Armazena evento na memória"""
-        # Adiciona à memória de curto prazo
+        """
+        Armazena evento na memória
+        O contexto é codificado aqui: contexto não serializável levanta
+        para quem chamou, em vez de derrubar o lote na fila
+        """
+        event.seal_contexto(self._codecs)
+        
+        # Enfileira para o armazenamento (médio e longo prazo)
+        await self._write_queue.put(event)
+        
+        # Adiciona à memória de curto prazo (descarta o mais antigo se cheia)
         self._short_term.append(event)
-        if len(self._short_term) > self._max_short_term:
-            self._short_term.pop(0)
+    
+    def _within_window(self, anterior_ts: int, ts: int) -> bool:
+        """Ocorrência seguinte dentro da janela (eventos fora de ordem não agrupam)"""
+        return 0 <= ts - anterior_ts <= self.coalesce_window_ms
+    
+    def _coalesce(self, events: List[MemoryEvent]) -> List[List[MemoryEvent]]:
+        """Agrupa eventos consecutivos equivalentes (mesma chave, dentro da janela)"""
+        runs: List[List[MemoryEvent]] = []
+        for event in events:
+            if runs and self.coalesce_window_ms > 0:
+                anterior = runs[-1][-1]
+                if (event.coalesce_key() == anterior.coalesce_key()
+                        and self._within_window(_to_epoch_ms(anterior.timestamp),
+                                                _to_epoch_ms(event.first_timestamp))):
+                    runs[-1].append(event)
+                    continue
+            runs.append([event])
+        return runs
+    
+    async def _write_batch(self, events: List[MemoryEvent]):
+        """
+        Grava um lote de eventos numa única operação do backend
+        Repetições consecutivas viram uma linha (count, first_ts, ts); se o
+        lote começa repetindo a última linha gravada, ela é atualizada
+        """
+        runs = self._coalesce(events)
+        merge_into = None
+        if self._last_row is not None and self.coalesce_window_ms > 0:
+            row_id, key, last_ts = self._last_row
+            primeiro = runs[0][0]
+            if (primeiro.coalesce_key() == key
+                    and self._within_window(last_ts, _to_epoch_ms(primeiro.first_timestamp))):
+                merge_into = row_id
         
-        # Armazena no banco (médio e longo prazo)
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
-                INSERT INTO memory_events 
-                (timestamp, tipo, evento, resposta_dada, resultado, peso_emocional, contexto)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
-                event.timestamp.isoformat(),
-                event.tipo,
-                event.evento,
-                event.resposta_dada,
-                event.resultado,
-                event.peso_emocional,
-                json.dumps(event.contexto)
+        codecs = self._codecs
+        rows = []
+        for run in runs:
+            contexto, codec = run[0].pack_contexto(codecs)
+            rows.append((
+                _to_epoch_ms(run[-1].timestamp),
+                run[0].tipo,
+                run[0].evento,
+                run[0].resposta_dada,
+                run[0].resultado,
+                max(event.peso_emocional for event in run),
+                contexto,
+                sum(event.count for event in run),
+                _to_epoch_ms(run[0].first_timestamp),
+                codec
             ))
-            await db.commit()
+        merged, ids = await self._backend.write_batch(rows, merge_into)
+        if merged:
+            for event in runs[0]:
+                event.id = merge_into
+            runs = runs[1:]
+        novos: List[MemoryEvent] = []
+        for run_id, run in zip(ids, runs):
+            for event in run:
+                event.id = run_id
+            novos.append(run[0])
+        
+        ultimo = events[-1]
+        self._last_row = (ultimo.id, ultimo.coalesce_key(), _to_epoch_ms(ultimo.timestamp))
+        self.coalesced += len(events) - len(novos)
+        
+        await self._index_semantic(novos)
+    
+    async def _index_semantic(self, events: List[MemoryEvent], backfill: bool = False):
+        """Indexa eventos recém-gravados na memória semântica (se ativa)"""
+        if self._semantic is None or not events:
+            return
+        try:
+            await asyncio.to_thread(self._semantic.add, [
+                (event.id, event.evento, event.resposta_dada) for event in events
+            ], backfill)
+        except Exception as e:
+            # O armazenamento já tem os eventos; o índice é completado no próximo initialize()
+            logger.error(f"Erro ao indexar memória semântica: {e}")
+    
+    async def rebuild_patterns(self):
+        """Reconstrói (backfill) os agregados de padrões do histórico inteiro"""
+        await self.flush()
+        await self._backend.rebuild_patterns()
+    
+    async def flush(self):
+        """Grava imediatamente os eventos pendentes na fila"""
+        await self._write_queue.flush()
     
     async def get_recent_events(self, limit: int = 10) -> List[MemoryEvent]:
-        """Retorna eventos recentes (curto prazo)"""
-        return self._short_term[-limit:]
+        """Retorna eventos recentes (curto prazo), do mais antigo ao mais novo"""
+        if limit <= 0:
+            return []
+        # Percorre só os últimos `limit` itens; a lista contém referências, não cópias
+        recentes = list(islice(reversed(self._short_term), limit))
+        recentes.reverse()
+        return recentes
     
     async def get_events_by_type(self, tipo: str, days: int = 30) -> List[MemoryEvent]:
         """Retorna eventos de um tipo específico"""
         cutoff = datetime.now() - timedelta(days=days)
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("""
-                SELECT * FROM memory_events 
-                WHERE tipo = ? AND timestamp > ?
-                ORDER BY timestamp DESC
-            """, (tipo, cutoff.isoformat())) as cursor:
-                rows = await cursor.fetchall()
-                events = []
-                for row in rows:
-                    event = MemoryEvent(
-                        id=row['id'],
-                        timestamp=datetime.fromisoformat(row['timestamp']),
-                        tipo=row['tipo'],
-                        evento=row['evento'],
-                        resposta_dada=row['resposta_dada'] or "",
-                        resultado=row['resultado'] or "",
-                        peso_emocional=row['peso_emocional'],
-                        contexto=json.loads(row['contexto'] or '{}')
-                    )
-                    events.append(event)
-                return events
+        return self._hydrate(await self._backend.fetch_by_type(tipo, _to_epoch_ms(cutoff)))
+    
+    async def search(self, texto: str, limit: int = 10,
+                     since: Optional[datetime] = None) -> List[tuple]:
+        """
+        Busca textual no que o agente disse e ouviu (FTS5, backend SQLite)
+        Retorna [(MemoryEvent, score, trecho)] ordenado por relevância (BM25);
+        score maior = mais relevante; o trecho marca os termos com [ ]
+        """
+        rows = await self._backend.search(
+            texto, limit, _to_epoch_ms(since) if since is not None else None
+        )
+        from_row = MemoryEvent._from_row
+        return [(from_row(*row, codecs=self._codecs), score, trecho)
+                for row, score, trecho in rows]
+    
+    async def count_events(self, tipo: str, days: int = 30) -> int:
+        """Total de ocorrências de um tipo (soma das repetições agrupadas)"""
+        cutoff = datetime.now() - timedelta(days=days)
+        return await self._backend.count(tipo, _to_epoch_ms(cutoff))
     
     async def get_emotional_memories(self, min_weight: float = 0.7) -> List[MemoryEvent]:
         """Retorna memórias com alto peso emocional (longo prazo)"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("""
-                SELECT * FROM memory_events 
-                WHERE peso_emocional >= ?
-                ORDER BY peso_emocional DESC, timestamp DESC
-                LIMIT 50
-            """, (min_weight,)) as cursor:
-                rows = await cursor.fetchall()
-                events = []
-                for row in rows:
-                    event = MemoryEvent(
-                        id=row['id'],
-                        timestamp=datetime.fromisoformat(row['timestamp']),
-                        tipo=row['tipo'],
-                        evento=row['evento'],
-                        resposta_dada=row['resposta_dada'] or "",
-                        resultado=row['resultado'] or "",
-                        peso_emocional=row['peso_emocional'],
-                        contexto=json.loads(row['contexto'] or '{}')
-                    )
-                    events.append(event)
-                return events
+        return self._hydrate(await self._backend.fetch_emotional(min_weight, 50))
+    
+    async def get_columns(self, tipo: Optional[str] = None, days: int = 30,
+                          as_numpy: bool = False):
+        """
+        Resultado colunar para análises: arrays paralelos em vez de objetos
+        Sem contexto. Com as_numpy=True retorna um record array do NumPy
+        """
+        cutoff = _to_epoch_ms(datetime.now() - timedelta(days=days))
+        colunas = await self._backend.columns(tipo, cutoff)
+        
+        if as_numpy:
+            import numpy as np
+            return np.rec.fromarrays(
+                [np.asarray(colunas["id"], dtype=np.int64),
+                 np.asarray(colunas["ts"], dtype=np.int64),
+                 np.array(colunas["tipo"], dtype=object),
+                 np.array(colunas["evento"], dtype=object),
+                 np.array(colunas["resultado"], dtype=object),
+                 np.asarray(colunas["peso_emocional"], dtype=np.float64),
+                 np.asarray(colunas["count"], dtype=np.int64)],
+                names=list(colunas)
+            )
+        return colunas
+    
+    async def iter_events(self, tipo: Optional[str] = None,
+                          since: Optional[datetime] = None,
+                          until: Optional[datetime] = None,
+                          page_size: int = 500) -> AsyncIterator[MemoryEvent]:
+        """
+        Percorre eventos em ordem cronológica com memória constante
+        Paginação por chave (ts, id): cada página é uma consulta indexada
+        curta, sem OFFSET e sem segurar a conexão entre páginas
+        """
+        since_ms = _to_epoch_ms(since) if since is not None else None
+        until_ms = _to_epoch_ms(until) if until is not None else None
+        last_key: Optional[tuple] = None
+        while True:
+            rows = await self._backend.scan(tipo, since_ms, until_ms, last_key, page_size)
+            if not rows:
+                return
+            for event in self._hydrate(rows):
+                yield event
+            if len(rows) < page_size:
+                return
+            last_key = (rows[-1][1], rows[-1][0])
+    
+    async def export_ndjson(self, path: str, tipo: Optional[str] = None,
+                            since: Optional[datetime] = None,
+                            until: Optional[datetime] = None,
+                            page_size: int = 1000) -> int:
+        """Exporta eventos em NDJSON (um evento JSON por linha), em streaming"""
+        total = 0
+        with open(path, "w", encoding="utf-8") as f:
+            async for event in self.iter_events(tipo=tipo, since=since, until=until,
+                                                page_size=page_size):
+                f.write(json.dumps({
+                    "id": event.id,
+                    "ts": _to_epoch_ms(event.timestamp),
+                    "first_ts": _to_epoch_ms(event.first_timestamp),
+                    "count": event.count,
+                    "tipo": event.tipo,
+                    "evento": event.evento,
+                    "resposta_dada": event.resposta_dada,
+                    "resultado": event.resultado,
+                    "peso_emocional": event.peso_emocional,
+                    "contexto": event.contexto
+                }, ensure_ascii=False))
+                f.write("\n")
+                total += 1
+        return total
+    
+    async def import_ndjson(self, path: str, batch_size: int = 1000,
+                            keep_ids: bool = False) -> int:
+        """
+        Importa um NDJSON gerado por export_ndjson, em lotes
+        Por padrão as linhas recebem ids novos (importar duas vezes duplica);
+        com keep_ids mantém os ids do arquivo e ignora os que já existem
+        Atualiza os agregados de padrões e o índice semântico
+        """
+        await self.flush()
+        total = 0
+        lidos = 0
+        lote: List[MemoryEvent] = []
+        with open(path, "r", encoding="utf-8") as f:
+            for linha in f:
+                if not linha.strip():
+                    continue
+                dados = json.loads(linha)
+                lote.append(MemoryEvent(
+                    id=dados.get("id"),
+                    timestamp=_from_epoch_ms(dados["ts"]),
+                    first_timestamp=_from_epoch_ms(dados.get("first_ts", dados["ts"])),
+                    count=dados.get("count", 1),
+                    tipo=dados["tipo"],
+                    evento=dados["evento"],
+                    resposta_dada=dados.get("resposta_dada", ""),
+                    resultado=dados.get("resultado", ""),
+                    peso_emocional=dados.get("peso_emocional", 0.5),
+                    contexto=dados.get("contexto")
+                ))
+                if len(lote) >= batch_size:
+                    lidos += len(lote)
+                    total += await self._import_batch(lote, keep_ids)
+                    lote = []
+        if lote:
+            lidos += len(lote)
+            total += await self._import_batch(lote, keep_ids)
+        # A última linha gravada pode ter mudado: a próxima escrita não agrupa com ela
+        self._last_row = None
+        if lidos > total:
+            logger.warning(f"{lidos - total} eventos de {path} ignorados: ids já existentes")
+        return total
+    
+    async def _import_batch(self, events: List[MemoryEvent], keep_ids: bool) -> int:
+        """Grava e indexa um lote importado; retorna quantos eventos entraram"""
+        codecs = self._codecs
+        rows = []
+        for event in events:
+            contexto, codec = event.pack_contexto(codecs)
+            rows.append((
+                _to_epoch_ms(event.timestamp),
+                event.tipo,
+                event.evento,
+                event.resposta_dada,
+                event.resultado,
+                event.peso_emocional,
+                contexto,
+                event.count,
+                _to_epoch_ms(event.first_timestamp),
+                codec
+            ))
+        if keep_ids:
+            por_id = {event.id: event for event in events}
+            ids = await self._backend.import_rows([
+                (event.id,) + row for event, row in zip(events, rows)
+            ])
+            novos = [por_id[row_id] for row_id in ids]
+        else:
+            _, ids = await self._backend.write_batch(rows)
+            for row_id, event in zip(ids, events):
+                event.id = row_id
+            novos = events
+        # Ids mantidos podem estar abaixo do último indexado
+        await self._index_semantic(novos, backfill=keep_ids)
+        return len(novos)
     
     async def get_patterns(self, days: int = 7) -> Dict:
-        """Identifica padrões recorrentes (médio prazo)"""
+        """
+        Identifica padrões recorrentes (médio prazo)
+        Granularidade de 1 hora no início da janela
+        """
         cutoff = datetime.now() - timedelta(days=days)
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("""
-                SELECT tipo, resultado, COUNT(*) as count
-                FROM memory_events
-                WHERE timestamp > ?
-                GROUP BY tipo, resultado
-                ORDER BY count DESC
-            """, (cutoff.isoformat(),)) as cursor:
-                rows = await cursor.fetchall()
-                patterns = {}
-                for row in rows:
-                    key = f"{row['tipo']}_{row['resultado']}"
-                    patterns[key] = row['count']
-                return patterns
+        since_ms = _pattern_bucket(_to_epoch_ms(cutoff)) * PATTERN_BUCKET_MS
+        return {
+            f"{tipo}_{resultado}": count
+            for tipo, resultado, count in await self._backend.patterns(since_ms)
+        }
+    
+    async def _index_semantic_backlog(self, chunk_size: int = MIGRATION_CHUNK_SIZE):
+        """Indexa eventos gravados que ainda não estão no índice semântico"""
+        while True:
+            rows = await self._backend.fetch_after_id(self._semantic.last_id, chunk_size)
+            if not rows:
+                break
+            await asyncio.to_thread(self._semantic.add, [(row[0], row[3], row[4]) for row in rows])
+    
+    async def recall(self, texto: str, k: int = 5, budget_ms: Optional[float] = 50.0,
+                     min_score: float = 0.0) -> List[tuple]:
+        """
+        Recordação semântica: eventos mais parecidos com o texto
+        Retorna [(MemoryEvent, score)], do mais parecido ao menos parecido
+        Com orçamento de latência, varre dos eventos mais novos aos mais
+        antigos e devolve o melhor encontrado até o limite
+        """
+        if self._semantic is None or not texto:
+            return []
+        ids, scores, _ = await asyncio.to_thread(self._semantic.search, texto, k, budget_ms)
+        if not ids:
+            return []
+        rows = await self._backend.fetch_ids(ids)
+        by_id = {event.id: event for event in self._hydrate(rows)}
+        return [(by_id[i], score) for i, score in zip(ids, scores)
+                if i in by_id and score > min_score]
+    
+    async def consolidate(self) -> Dict:
+        """Executa a consolidação agora (arquivamento, resumos/compactação)"""
+        await self.flush()
+        return await self._backend.consolidate()
+    
+    async def get_summaries(self, days: int = 30) -> List[Dict]:
+        """Resumos diários de eventos já consolidados"""
+        desde = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+        return await self._backend.summaries(desde)
+    
+    def list_archives(self) -> List[str]:
+        """Meses com eventos arquivados (AAAA-MM)"""
+        return self._archive.list()
+    
+    async def read_archive(self, mes: str) -> List[MemoryEvent]:
+        """Eventos arquivados de um mês (AAAA-MM)"""
+        return self._hydrate(await self._archive.read(mes))
+    
+    async def vacuum(self):
+        """VACUUM completo; converte bancos antigos para auto_vacuum incremental"""
+        await self.flush()
+        await self._backend.vacuum()
+    
+    async def close(self):
+        """Grava eventos pendentes e fecha o armazenamento"""
+        self._initialized = False
+        if self._consolidation_task is not None:
+            self._consolidation_task.cancel()
+            try:
+                await self._consolidation_task
+            except asyncio.CancelledError:
+                pass
+            self._consolidation_task = None
+        await self._write_queue.stop()
+        if self._semantic is not None:
+            await asyncio.to_thread(self._semantic.close)
+        await self._backend.close()
+    
+    def get_stats(self) -> Dict:
+        """Métricas da memória (fila de escrita, armazenamento e índice semântico)"""
+        stats = {
+            "short_term": len(self._short_term),
+            "write_queue": self._write_queue.get_stats(),
+            "coalesced": self.coalesced,
+            "storage": self._backend.get_stats(),
+            "codec": self._codecs.get_stats()
+        }
+        if self._semantic is not None:
+            stats["semantic"] = self._semantic.get_stats()
+        return stats
     
     def get_short_term_memory(self) -> List[MemoryEvent]:
         """Retorna memória de curto prazo (sem async)"""
-        return self._short_term.copy()
+        return list(self._short_term)
@@ -0,0 +1,155 @@
+"""
+Interface de armazenamento da memória
+MemorySystem cuida de curto prazo, fila de escrita, agrupamento e índice
+semântico; o backend só guarda e consulta linhas de evento
+Linhas são tuplas cruas na ordem de MemoryEvent._from_row:
+(id, ts, tipo, evento, resposta_dada, resultado, peso_emocional, contexto, count,
+first_ts, codec)
+Tempos em epoch ms; contexto é o payload do codec indicado pela tag `codec`
+(str para JSON, bytes para packed) e o backend o guarda sem interpretar
+"""
+
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import heapq
+
+
+class MemoryBackend:
+    """
+    Contrato de um backend de memória
+    Obrigatórios: open, close, write_batch, scan, fetch_last, fetch_ids e
+    fetch_after_id. As demais consultas têm implementação genérica por
+    varredura (scan); backends com índices próprios as sobrescrevem
+    """
+    
+    name = "base"
+    
+    async def open(self):
+        """Abre (ou cria/migra) o armazenamento"""
+        raise NotImplementedError
+    
+    async def close(self):
+        raise NotImplementedError
+    
+    async def schema_version(self) -> int:
+        """Versão do formato gravado"""
+        raise NotImplementedError
+    
+    async def write_batch(self, rows: List[tuple],
+                          merge_into: Optional[int] = None) -> Tuple[bool, List[int]]:
+        """
+        Grava linhas (ts, tipo, evento, resposta_dada, resultado, peso_emocional,
+        contexto, count, first_ts, codec) numa única operação
+        Com merge_into, tenta somar rows[0] à linha existente com esse id
+        (count += count, ts = ts, peso = máximo); retorna (agrupou, ids das
+        linhas inseridas, na ordem)
+        """
+        raise NotImplementedError
+    
+    async def scan(self, tipo: Optional[str] = None, since_ms: Optional[int] = None,
+                   until_ms: Optional[int] = None, after: Optional[Tuple[int, int]] = None,
+                   limit: int = 500) -> List[tuple]:
+        """
+        Linhas em ordem (ts, id) com since_ms <= ts < until_ms
+        `after` = (ts, id) da última linha da página anterior (paginação por chave)
+        """
+        raise NotImplementedError
+    
+    async def fetch_last(self, limit: int) -> List[tuple]:
+        """Últimas linhas gravadas, da mais nova para a mais antiga"""
+        raise NotImplementedError
+    
+    async def fetch_ids(self, ids: List[int]) -> List[tuple]:
+        """Linhas com os ids pedidos (ordem livre; ids ausentes são ignorados)"""
+        raise NotImplementedError
+    
+    async def fetch_after_id(self, after_id: int, limit: int) -> List[tuple]:
+        """Linhas com id > after_id, em ordem de id"""
+        raise NotImplementedError
+    
+    async def _scan_all(self, tipo: Optional[str] = None, since_ms: Optional[int] = None,
+                        until_ms: Optional[int] = None,
+                        page_size: int = 5000) -> AsyncIterator[tuple]:
+        """Percorre todas as linhas do intervalo, página a página"""
+        after = None
+        while True:
+            rows = await self.scan(tipo, since_ms, until_ms, after, page_size)
+            for row in rows:
+                yield row
+            if len(rows) < page_size:
+                return
+            after = (rows[-1][1], rows[-1][0])
+    
+    async def fetch_by_type(self, tipo: str, since_ms: int) -> List[tuple]:
+        """Linhas de um tipo com ts > since_ms, da mais nova para a mais antiga"""
+        rows = [row async for row in self._scan_all(tipo, since_ms + 1)]
+        rows.reverse()
+        return rows
+    
+    async def count(self, tipo: str, since_ms: int) -> int:
+        """Ocorrências de um tipo com ts > since_ms (soma de count)"""
+        return sum([row[8] async for row in self._scan_all(tipo, since_ms + 1)])
+    
+    async def fetch_emotional(self, min_weight: float, limit: int = 50) -> List[tuple]:
+        """Linhas com peso >= min_weight, por peso e ts decrescentes"""
+        rows = [row async for row in self._scan_all() if row[6] >= min_weight]
+        return heapq.nlargest(limit, rows, key=lambda row: (row[6], row[1]))
+    
+    async def patterns(self, since_ms: int) -> List[tuple]:
+        """[(tipo, resultado, count)] com ts >= since_ms, por count decrescente"""
+        counts: Dict[tuple, int] = {}
+        async for row in self._scan_all(since_ms=since_ms):
+            key = (row[2], row[5] or "")
+            counts[key] = counts.get(key, 0) + row[8]
+        return sorted(((*key, count) for key, count in counts.items()),
+                      key=lambda item: item[2], reverse=True)
+    
+    async def columns(self, tipo: Optional[str], since_ms: int) -> Dict[str, list]:
+        """
+        Colunas id, ts, tipo, evento, resultado, peso_emocional e count das
+        linhas com ts > since_ms, em ordem de ts
+        """
+        colunas = {name: [] for name in ("id", "ts", "tipo", "evento", "resultado",
+                                         "peso_emocional", "count")}
+        async for row in self._scan_all(tipo, since_ms + 1):
+            colunas["id"].append(row[0])
+            colunas["ts"].append(row[1])
+            colunas["tipo"].append(row[2])
+            colunas["evento"].append(row[3])
+            colunas["resultado"].append(row[5] or "")
+            colunas["peso_emocional"].append(row[6])
+            colunas["count"].append(row[8])
+        return colunas
+    
+    async def import_rows(self, rows: List[tuple]) -> List[int]:
+        """Grava linhas com id próprio (ignora ids existentes); retorna os ids gravados"""
+        raise NotImplementedError(f"Backend '{self.name}' não suporta importação")
+    
+    async def search(self, consulta: str, limit: int,
+                     since_ms: Optional[int] = None) -> List[tuple]:
+        """Busca textual: [(linha, score, trecho)]"""
+        raise NotImplementedError(f"Backend '{self.name}' não tem busca textual")
+    
+    async def codec_dictionaries(self) -> List[bytes]:
+        """Dicionários do codec de contexto gravados, do mais antigo ao mais novo"""
+        return []
+    
+    async def save_codec_dictionary(self, dict_id: int, data: bytes):
+        """Grava um dicionário do codec de contexto (ver contexto_codec)"""
+        raise NotImplementedError(f"Backend '{self.name}' não guarda dicionários de codec")
+    
+    async def rebuild_patterns(self):
+        """Recalcula agregados persistidos (backends sem agregados: nada a fazer)"""
+    
+    async def consolidate(self, now=None) -> Dict:
+        """Retenção em camadas: arquiva eventos antigos de baixo peso"""
+        raise NotImplementedError(f"Backend '{self.name}' não suporta consolidação")
+    
+    async def summaries(self, since_day: str) -> List[Dict]:
+        """Resumos diários gerados pela consolidação (dia >= since_day)"""
+        return []
+    
+    async def vacuum(self):
+        raise NotImplementedError(f"Backend '{self.name}' não suporta VACUUM")
+    
+    def get_stats(self) -> Dict:
+        return {"backend": self.name}
@@ -0,0 +1,232 @@
+"""
+Consolidação da Memória
+Mantém a tabela quente pequena:
+- Eventos antigos saem da tabela quente para partições mensais comprimidas
+- Eventos antigos de baixo peso viram resumos diários
+- Momentos marcantes (peso emocional alto) ficam para sempre
+- VACUUM incremental devolve as páginas livres
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import json
+import logging
+import os
+import time
+import zlib
+
+import aiosqlite
+
+from .contexto_codec import ContextoCodecs
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryArchive:
+    """
+    Partições mensais comprimidas (memory-AAAA-MM.db)
+    Cada bloco é um zlib de JSON com linhas na ordem de memory_events, sem a
+    coluna codec: o contexto é guardado em JSON, então o arquivo não depende
+    do backend de armazenamento nem dos dicionários do codec
+    """
+    
+    def __init__(self, path: str, codecs: Optional[ContextoCodecs] = None):
+        self.path = path
+        self.codecs = codecs or ContextoCodecs()
+    
+    @staticmethod
+    def _month(ts: int) -> str:
+        return datetime.fromtimestamp(ts / 1000).strftime("%Y-%m")
+    
+    def _file(self, mes: str) -> str:
+        return os.path.join(self.path, f"memory-{mes}.db")
+    
+    async def write(self, rows: List[tuple]):
+        """Grava linhas nas partições dos seus meses (um bloco por mês)"""
+        meses: Dict[str, List[tuple]] = {}
+        for row in rows:
+            if len(row) > 10:
+                row = (*row[:7], self.codecs.to_json(row[7], row[10]), row[8], row[9])
+            meses.setdefault(self._month(row[1]), []).append(row)
+        for mes, linhas in meses.items():
+            await self._write_chunk(mes, linhas)
+    
+    async def _write_chunk(self, mes: str, rows: List[tuple]):
+        """Grava um bloco comprimido (zlib de JSON) na partição do mês"""
+        os.makedirs(self.path, exist_ok=True)
+        payload = zlib.compress(
+            json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6
+        )
+        async with aiosqlite.connect(self._file(mes)) as db:
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS archived_chunks (
+                    first_id INTEGER PRIMARY KEY,
+                    last_id INTEGER NOT NULL,
+                    first_ts INTEGER NOT NULL,
+                    last_ts INTEGER NOT NULL,
+                    count INTEGER NOT NULL,
+                    data BLOB NOT NULL
+                )
+            """)
+            # Reexecução após falha regrava o mesmo bloco
+            await db.execute("""
+                INSERT OR REPLACE INTO archived_chunks
+                (first_id, last_id, first_ts, last_ts, count, data)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (
+                min(row[0] for row in rows),
+                max(row[0] for row in rows),
+                min(row[1] for row in rows),
+                max(row[1] for row in rows),
+                len(rows),
+                payload
+            ))
+            await db.commit()
+    
+    def list(self) -> List[str]:
+        """Meses arquivados (AAAA-MM)"""
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(
+            nome[len("memory-"):-len(".db")]
+            for nome in os.listdir(self.path)
+            if nome.startswith("memory-") and nome.endswith(".db")
+        )
+    
+    async def read(self, mes: str) -> List[tuple]:
+        """Linhas arquivadas de um mês, na ordem de memory_events"""
+        path = self._file(mes)
+        if not os.path.exists(path):
+            return []
+        rows: List[tuple] = []
+        async with aiosqlite.connect(path) as db:
+            async with db.execute("SELECT data FROM archived_chunks ORDER BY first_id") as cursor:
+                async for (data,) in cursor:
+                    rows.extend(tuple(row) for row in json.loads(zlib.decompress(data)))
+        return rows
+
+
+class MemoryConsolidator:
+    """
+    Job de consolidação e retenção em camadas do backend SQLite
+    Trabalha em lotes, cada um numa transação curta, para não travar
+    as gravações do agente
+    """
+    
+    def __init__(self, db, columns: str, archive: MemoryArchive, hot_days: int = 30,
+                 summary_weight: float = 0.3, keep_weight: float = 0.7,
+                 chunk_size: int = 2000, vacuum_pages: int = 1000):
+        self._db = db  # SQLiteConnectionManager
+        self.columns = columns  # colunas de memory_events, na ordem de MemoryEvent._from_row
+        self.archive = archive
+        self.hot_days = hot_days
+        self.summary_weight = summary_weight
+        self.keep_weight = keep_weight
+        self.chunk_size = chunk_size
+        self.vacuum_pages = vacuum_pages
+        
+        # Métricas
+        self.runs = 0
+        self.last_run: Optional[str] = None
+        self.last_duration_ms = 0.0
+        self.archived = 0
+        self.summarized = 0
+    
+    async def consolidate(self, now: Optional[datetime] = None) -> Dict:
+        """Executa um ciclo completo de consolidação"""
+        start = time.perf_counter()
+        now = now or datetime.now()
+        cutoff = int((now - timedelta(days=self.hot_days)).timestamp() * 1000)
+        archived = summarized = 0
+        
+        while True:
+            async with self._db.reader() as db:
+                async with db.execute(f"""
+                    SELECT {self.columns}
+                    FROM memory_events
+                    WHERE ts < ? AND peso_emocional < ?
+                    ORDER BY ts
+                    LIMIT ?
+                """, (cutoff, self.keep_weight, self.chunk_size)) as cursor:
+                    cursor.row_factory = None
+                    rows = await cursor.fetchall()
+            if not rows:
+                break
+            
+            # 1. Arquivo comprimido primeiro: se cair no meio, nada se perde
+            await self.archive.write(rows)
+            
+            # 2. Resumos e remoção da tabela quente na mesma transação; os
+            # agregados de padrões continuam contando os eventos arquivados
+            baixo_peso = [row for row in rows if row[6] < self.summary_weight]
+            async with self._db.writer() as db:
+                await self._update_summaries(db, baixo_peso)
+                await db.executemany(
+                    "DELETE FROM memory_events WHERE id = ?", [(row[0],) for row in rows]
+                )
+                await db.commit()
+            archived += len(rows)
+            summarized += len(baixo_peso)
+        
+        await self._incremental_vacuum()
+        
+        self.runs += 1
+        self.archived += archived
+        self.summarized += summarized
+        self.last_run = now.isoformat()
+        self.last_duration_ms = (time.perf_counter() - start) * 1000
+        if archived:
+            logger.info(f"Memória consolidada: {archived} eventos arquivados, "
+                        f"{summarized} resumidos ({self.last_duration_ms:.0f}ms)")
+        return {"archived": archived, "summarized": summarized}
+    
+    @staticmethod
+    async def _update_summaries(db, rows: List[tuple]):
+        """Resumo diário por (tipo, evento, resultado) dos eventos de baixo peso"""
+        resumos: Dict[tuple, list] = {}
+        for row in rows:
+            _, ts, tipo, evento, _, resultado, peso, _, count, first_ts = row[:10]
+            first_ts = first_ts if first_ts is not None else ts
+            dia = datetime.fromtimestamp(ts / 1000).strftime("%Y-%m-%d")
+            key = (dia, tipo, evento, resultado or "")
+            acc = resumos.setdefault(key, [0, 0.0, first_ts, ts])
+            acc[0] += count
+            acc[1] += peso * count
+            acc[2] = min(acc[2], first_ts)
+            acc[3] = max(acc[3], ts)
+        await db.executemany("""
+            INSERT INTO memory_summaries
+            (dia, tipo, evento, resultado, count, peso_total, first_ts, last_ts)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (dia, tipo, evento, resultado) DO UPDATE SET
+                count = count + excluded.count,
+                peso_total = peso_total + excluded.peso_total,
+                first_ts = MIN(first_ts, excluded.first_ts),
+                last_ts = MAX(last_ts, excluded.last_ts)
+        """, [(*key, *acc) for key, acc in resumos.items()])
+    
+    async def _incremental_vacuum(self):
+        """Devolve páginas livres ao sistema de arquivos, em pedaços"""
+        async with self._db.writer() as db:
+            async with db.execute("PRAGMA auto_vacuum") as cursor:
+                modo = (await cursor.fetchone())[0]
+            if modo != 2:
+                # Bancos antigos: converter exige VACUUM completo (memory_admin.py vacuum)
+                return
+            async with db.execute(f"PRAGMA incremental_vacuum({int(self.vacuum_pages)})") as cursor:
+                await cursor.fetchall()
+    
+    async def full_vacuum(self):
+        """Ativa auto_vacuum incremental e reconstrói o arquivo (bloqueante)"""
+        async with self._db.writer() as db:
+            await db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            await db.execute("VACUUM")
+    
+    def get_stats(self) -> Dict:
+        return {
+            "runs": self.runs,
+            "last_run": self.last_run,
+            "last_duration_ms": round(self.last_duration_ms, 3),
+            "archived": self.archived,
+            "summarized": self.summarized
+        }
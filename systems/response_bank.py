@@ -0,0 +1,241 @@
+"""
+Banco de respostas pré-compilado
+Falas geradas offline pelo LLM (build_response_bank.py) para cada
+(tipo de decisão, motivo, estado quantizado), num arquivo só leitura
+mapeado em memória. Serve de fallback quando o LLM estoura o prazo ou
+falha e, em hardware fraco, como caminho principal (sem LLM por FALAR)
+O estado quantizado é a mesma chave do cache de prompts da expressão:
+restrições de personalidade + restrições emocionais ativas
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+import hashlib
+import itertools
+import json
+import logging
+import mmap
+import os
+import random
+import struct
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BANK_FORMAT_VERSION = 1
+
+# Cabeçalho: magic, versão, chaves, textos, bytes de metadados (JSON logo depois)
+_MAGIC = b"PRIMEBNK"
+_HEADER = struct.Struct("<8sIIII")
+
+# Tabela de chaves ordenada por hash: variantes em textos[first:first + count]
+_KEY = np.dtype([("hash", "<u8"), ("first", "<u4"), ("count", "<u4")])
+
+# Tabela de textos: posição e tamanho (UTF-8) no bloco de textos
+_TEXT = np.dtype([("off", "<u4"), ("len", "<u4")])
+
+
+def bank_key(tipo: str, motivo: str, estado: Tuple[bool, ...]) -> int:
+    """Hash estável de 64 bits da chave (hash() do Python muda entre execuções)"""
+    bits = "".join("1" if ativa else "0" for ativa in estado)
+    digest = hashlib.blake2b(f"{tipo}\0{motivo}\0{bits}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+class ResponseBank:
+    """
+    Leitura do banco: tabelas como visões NumPy sobre o mmap (sem cópia)
+    e busca binária pelo hash da chave
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.meta: Dict = {}
+        self._mm: Optional[mmap.mmap] = None
+        self._keys: Optional[np.ndarray] = None
+        self._texts: Optional[np.ndarray] = None
+        self._blob_start = 0
+        
+        # Métricas
+        self.hits = 0
+        self.misses = 0
+    
+    @property
+    def available(self) -> bool:
+        return self._mm is not None
+    
+    def open(self) -> bool:
+        """Mapeia o arquivo; False se não existe ou não é um banco válido"""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n_keys, n_texts, n_meta = _HEADER.unpack_from(mm, 0)
+        if magic != _MAGIC or version != BANK_FORMAT_VERSION:
+            mm.close()
+            logger.warning(f"{self.path} não é um banco de respostas v{BANK_FORMAT_VERSION}")
+            return False
+        start = _HEADER.size
+        self.meta = json.loads(mm[start:start + n_meta].decode("utf-8"))
+        start = _align(start + n_meta)
+        self._keys = np.frombuffer(mm, dtype=_KEY, count=n_keys, offset=start)
+        start += n_keys * _KEY.itemsize
+        self._texts = np.frombuffer(mm, dtype=_TEXT, count=n_texts, offset=start)
+        self._blob_start = start + n_texts * _TEXT.itemsize
+        self._mm = mm
+        return True
+    
+    def close(self):
+        self._keys = None
+        self._texts = None
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+    
+    def compatible(self, constraints: Dict[str, list]) -> bool:
+        """O banco foi gerado com as mesmas restrições (mesma quantização)?"""
+        return self.meta.get("constraints") == constraints
+    
+    def variants(self, tipo: str, motivo: str, estado: Tuple[bool, ...]) -> List[str]:
+        """Todas as falas de uma chave"""
+        if self._keys is None or not len(self._keys):
+            return []
+        h = bank_key(tipo, motivo, estado)
+        i = int(np.searchsorted(self._keys["hash"], h))
+        if i >= len(self._keys) or int(self._keys["hash"][i]) != h:
+            return []
+        first, count = int(self._keys["first"][i]), int(self._keys["count"][i])
+        falas = []
+        for off, size in self._texts[first:first + count].tolist():
+            start = self._blob_start + off
+            falas.append(self._mm[start:start + size].decode("utf-8"))
+        return falas
+    
+    def lookup(self, tipo: str, motivo: str, estado: Tuple[bool, ...]) -> Optional[str]:
+        """Uma fala sorteada entre as variantes da chave, ou None"""
+        falas = self.variants(tipo, motivo, estado)
+        if not falas:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return random.choice(falas)
+    
+    @staticmethod
+    def write(path: str, entries: Dict[Tuple[str, str, Tuple[bool, ...]], List[str]],
+              meta: Dict) -> int:
+        """
+        Grava o banco (arquivo temporário + rename); retorna quantas falas
+        entries: (tipo, motivo, estado) -> variantes
+        """
+        chaves = sorted((bank_key(*chave), falas) for chave, falas in entries.items() if falas)
+        keys = np.zeros(len(chaves), dtype=_KEY)
+        textos: List[bytes] = []
+        for i, (h, falas) in enumerate(chaves):
+            keys[i] = (h, len(textos), len(falas))
+            textos.extend(fala.encode("utf-8") for fala in falas)
+        texts = np.zeros(len(textos), dtype=_TEXT)
+        off = 0
+        for i, dados in enumerate(textos):
+            texts[i] = (off, len(dados))
+            off += len(dados)
+        
+        meta_bytes = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+        header = _HEADER.pack(_MAGIC, BANK_FORMAT_VERSION, len(keys), len(texts), len(meta_bytes))
+        cabecalho = header + meta_bytes
+        cabecalho += b"\0" * (_align(len(cabecalho)) - len(cabecalho))
+        
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(cabecalho)
+            f.write(keys.tobytes())
+            f.write(texts.tobytes())
+            f.write(b"".join(textos))
+        os.replace(temp_path, path)
+        return len(textos)
+    
+    def get_stats(self) -> Dict:
+        return {
+            "available": self.available,
+            "keys": len(self._keys) if self._keys is not None else 0,
+            "texts": len(self._texts) if self._texts is not None else 0,
+            "model": self.meta.get("model"),
+            "built_at": self.meta.get("built_at"),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+def representative_states(constraints: List[tuple],
+                          fixo: Optional[Dict] = None) -> Iterable[Tuple[Tuple[bool, ...], Dict]]:
+    """
+    Um estado contínuo para cada combinação de restrições ativas
+    (valor logo acima ou abaixo de cada limite). Com `fixo`, só a
+    combinação desse estado
+    """
+    if fixo is not None:
+        combinacoes = [tuple(
+            fixo.get(campo, 0) > limite if acima else fixo.get(campo, 0) < limite
+            for campo, limite, acima, _ in constraints
+        )]
+    else:
+        combinacoes = itertools.product((False, True), repeat=len(constraints))
+    for ativas in combinacoes:
+        estado = {}
+        for ativa, (campo, limite, acima, _) in zip(ativas, constraints):
+            valor = limite + 0.1 if ativa == acima else limite - 0.1
+            estado[campo] = min(1.0, max(0.0, valor))
+        yield tuple(ativas), estado
+
+
+async def build_bank(expression, path: str, motivos: Dict[str, List[str]],
+                     personalidade: Optional[Dict] = None, variants: int = 4,
+                     deadline: float = 60.0) -> Dict:
+    """
+    Roda o LLM sobre o espaço de estados e grava o banco
+    motivos: tipo de decisão -> motivos possíveis
+    personalidade: só o bucket dessa personalidade (None: todos)
+    Variantes repetidas são descartadas; chaves sem nenhuma fala ficam de fora
+    """
+    situacional = {"usuario_presente": True, "usuario_estado": "desconhecido"}
+    personalidades = list(representative_states(expression.PERSONALITY_CONSTRAINTS,
+                                                personalidade))
+    emocionais = list(representative_states(expression.EMOTIONAL_CONSTRAINTS))
+    entries: Dict[tuple, List[str]] = {}
+    chamadas = 0
+    start = time.perf_counter()
+    
+    for tipo, lista in motivos.items():
+        for motivo in lista:
+            for chave_p, pers in personalidades:
+                for chave_e, emo in emocionais:
+                    decisao = {"tipo": tipo, "intensidade": 0.7, "motivo": motivo}
+                    falas: List[str] = []
+                    for _ in range(variants):
+                        chamadas += 1
+                        texto = await expression.generate_candidate(
+                            decisao, pers, emo, situacional, deadline=deadline
+                        )
+                        if texto and texto not in falas:
+                            falas.append(texto)
+                    entries[(tipo, motivo, chave_p + chave_e)] = falas
+                    logger.info(f"{tipo}/{motivo}/{chave_p + chave_e}: {len(falas)} falas")
+    
+    meta = {
+        "model": expression.model,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "constraints": expression.bank_constraints(),
+        "variants": variants
+    }
+    total = ResponseBank.write(path, entries, meta)
+    return {
+        "keys": sum(1 for falas in entries.values() if falas),
+        "texts": total,
+        "llm_calls": chamadas,
+        "seconds": round(time.perf_counter() - start, 1)
+    }
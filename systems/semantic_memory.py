@@ -0,0 +1,268 @@
+"""
+Memória Semântica
+Recordação por similaridade de texto (evento + resposta)
+Embeddings locais em CPU e índice vetorial em arquivo mapeado em memória
+"""
+
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+import zlib
+
+import numpy as np
+
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class HashingEmbedder:
+    """
+    Embedder local por feature hashing (palavras + bigramas)
+    Determinístico, sem modelo e sem GPU
+    Qualquer objeto com `dim` e `embed(texto) -> np.ndarray` pode substituí-lo
+    """
+    
+    def __init__(self, dim: int = 128):
+        self.dim = dim
+    
+    @staticmethod
+    def _tokens(texto: str) -> List[str]:
+        # Remove acentos para "você" e "voce" caírem no mesmo bucket
+        texto = unicodedata.normalize("NFKD", texto.lower())
+        texto = "".join(c for c in texto if not unicodedata.combining(c))
+        return _TOKEN_RE.findall(texto)
+    
+    def embed(self, texto: str) -> np.ndarray:
+        """Vetor float32 normalizado (L2)"""
+        vec = np.zeros(self.dim, dtype=np.float32)
+        tokens = self._tokens(texto)
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        for feature in features:
+            # crc32 é estável entre execuções (hash() do Python não é)
+            h = zlib.crc32(feature.encode("utf-8"))
+            vec[h % self.dim] += -1.0 if h & 0x80000000 else 1.0
+        norm = np.linalg.norm(vec)
+        if norm > 0:
+            vec /= norm
+        return vec
+    
+    def embed_many(self, textos: Iterable[str]) -> np.ndarray:
+        """Matriz (n, dim) de vetores normalizados"""
+        textos = list(textos)
+        out = np.zeros((len(textos), self.dim), dtype=np.float32)
+        for i, texto in enumerate(textos):
+            out[i] = self.embed(texto)
+        return out
+
+
+class VectorIndex:
+    """
+    Índice vetorial append-only em arquivos mapeados em memória
+    - vectors.f32: matriz (capacidade, dim) em float32 (produto direto via BLAS)
+    - ids.i64: id do evento de cada linha
+    - index.json: dimensão, quantidade de vetores e último id indexado
+    Busca exata por produto interno, da linha mais nova para a mais antiga,
+    em blocos, respeitando um orçamento de latência
+    """
+    
+    _INITIAL_CAPACITY = 4096
+    _SEARCH_BLOCK = 16384
+    
+    def __init__(self, path: str, dim: int = 128):
+        self.path = path
+        self.dim = dim
+        self.count = 0
+        self.last_id = 0
+        self._capacity = 0
+        self._vectors: Optional[np.memmap] = None
+        self._ids: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        
+        # Métricas da última busca
+        self.last_search_ms = 0.0
+        self.last_scanned = 0
+    
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.path, "index.json")
+    
+    def open(self):
+        """Abre (ou cria) os arquivos do índice"""
+        os.makedirs(self.path, exist_ok=True)
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("dim") != self.dim:
+                raise ValueError(
+                    f"Índice semântico em {self.path} tem dim={meta.get('dim')}, esperado {self.dim}"
+                )
+            self.count = meta["count"]
+            self.last_id = meta["last_id"]
+        self._map(max(self._INITIAL_CAPACITY, self.count))
+    
+    def close(self):
+        """Grava metadados e libera os mapeamentos"""
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._ids.flush()
+                self._write_meta()
+            self._vectors = None
+            self._ids = None
+    
+    def _map(self, capacity: int):
+        """(Re)mapeia os arquivos com a capacidade pedida"""
+        self._vectors = None
+        self._ids = None
+        vec_path = os.path.join(self.path, "vectors.f32")
+        ids_path = os.path.join(self.path, "ids.i64")
+        for file_path, row_bytes in ((vec_path, self.dim * 4), (ids_path, 8)):
+            size = capacity * row_bytes
+            with open(file_path, "ab") as f:
+                if f.tell() < size:
+                    f.truncate(size)
+        self._vectors = np.memmap(vec_path, dtype=np.float32, mode="r+",
+                                  shape=(capacity, self.dim))
+        self._ids = np.memmap(ids_path, dtype=np.int64, mode="r+", shape=(capacity,))
+        self._capacity = capacity
+    
+    def _write_meta(self):
+        tmp = self._meta_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "count": self.count, "last_id": self.last_id}, f)
+        os.replace(tmp, self._meta_path)
+    
+    def add(self, ids: List[int], vectors: np.ndarray):
+        """Acrescenta vetores (ids em ordem crescente)"""
+        if not ids:
+            return
+        with self._lock:
+            needed = self.count + len(ids)
+            if needed > self._capacity:
+                capacity = self._capacity
+                while capacity < needed:
+                    capacity *= 2
+                self._vectors.flush()
+                self._ids.flush()
+                self._map(capacity)
+            self._vectors[self.count:needed] = vectors
+            self._ids[self.count:needed] = ids
+            self.count = needed
+            self.last_id = max(self.last_id, int(ids[-1]))
+            self._vectors.flush()
+            self._ids.flush()
+            self._write_meta()
+    
+    def known_ids(self, ids: List[int]) -> Set[int]:
+        """Quais dos ids já estão no índice (varre todos os ids; uso em importação)"""
+        with self._lock:
+            if self._ids is None or self.count == 0:
+                return set()
+            atuais = np.asarray(self._ids[:self.count])
+        pedidos = np.asarray(ids, dtype=np.int64)
+        return {int(i) for i in pedidos[np.isin(pedidos, atuais)]}
+    
+    def search(self, query: np.ndarray, k: int = 5,
+               budget_ms: Optional[float] = None) -> Tuple[List[int], List[float], bool]:
+        """
+        Top-k por similaridade de cosseno (vetores já normalizados)
+        Retorna (ids, scores, completo); completo=False se o orçamento
+        acabou antes de varrer o índice inteiro (mais novos são varridos primeiro)
+        """
+        start = time.perf_counter()
+        with self._lock:
+            vectors, ids, count = self._vectors, self._ids, self.count
+        if count == 0 or k <= 0:
+            return [], [], True
+        
+        query = query.astype(np.float32)
+        best_ids = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        scanned = 0
+        complete = True
+        end = count
+        while end > 0:
+            begin = max(0, end - self._SEARCH_BLOCK)
+            scores = vectors[begin:end] @ query
+            cand_scores = np.concatenate([best_scores, scores])
+            cand_ids = np.concatenate([best_ids, np.asarray(ids[begin:end])])
+            if len(cand_scores) > k:
+                top = np.argpartition(-cand_scores, k - 1)[:k]
+                cand_scores, cand_ids = cand_scores[top], cand_ids[top]
+            best_scores, best_ids = cand_scores, cand_ids
+            scanned += end - begin
+            end = begin
+            if budget_ms is not None and end > 0:
+                if (time.perf_counter() - start) * 1000 >= budget_ms:
+                    complete = False
+                    break
+        
+        order = np.argsort(-best_scores)
+        self.last_search_ms = (time.perf_counter() - start) * 1000
+        self.last_scanned = scanned
+        return ([int(i) for i in best_ids[order]],
+                [float(s) for s in best_scores[order]],
+                complete)
+    
+    def get_stats(self) -> Dict:
+        return {
+            "vectors": self.count,
+            "dim": self.dim,
+            "last_id": self.last_id,
+            "last_search_ms": round(self.last_search_ms, 3),
+            "last_scanned": self.last_scanned
+        }
+
+
+class SemanticMemory:
+    """
+    Recordação semântica sobre memory_events
+    Indexa "evento + resposta_dada" de forma incremental
+    """
+    
+    def __init__(self, path: str, dim: int = 128, embedder=None):
+        self.embedder = embedder or HashingEmbedder(dim)
+        self.index = VectorIndex(path, dim=self.embedder.dim)
+    
+    @staticmethod
+    def event_text(evento: str, resposta_dada: str) -> str:
+        return f"{evento or ''} {resposta_dada or ''}".strip()
+    
+    def open(self):
+        self.index.open()
+    
+    def close(self):
+        self.index.close()
+    
+    @property
+    def last_id(self) -> int:
+        return self.index.last_id
+    
+    def add(self, rows: List[Tuple[int, str, str]], backfill: bool = False):
+        """
+        Indexa linhas (id, evento, resposta_dada) já gravadas no banco
+        backfill aceita ids abaixo de last_id (importação com ids mantidos)
+        """
+        if backfill:
+            conhecidos = self.index.known_ids([row[0] for row in rows])
+            rows = sorted((row for row in rows if row[0] not in conhecidos),
+                          key=lambda row: row[0])
+        else:
+            rows = [row for row in rows if row[0] > self.index.last_id]
+        if not rows:
+            return
+        vectors = self.embedder.embed_many(
+            self.event_text(evento, resposta) for _, evento, resposta in rows
+        )
+        self.index.add([row[0] for row in rows], vectors)
+    
+    def search(self, texto: str, k: int = 5,
+               budget_ms: Optional[float] = None) -> Tuple[List[int], List[float], bool]:
+        return self.index.search(self.embedder.embed(texto), k=k, budget_ms=budget_ms)
+    
+    def get_stats(self) -> Dict:
+        return self.index.get_stats()
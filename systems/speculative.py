@@ -0,0 +1,184 @@
+"""
+Pré-geração especulativa de falas
+Nos ticks em que o Prime não fala, mas o score de FALAR está chegando
+perto da decisão vencedora, uma fala candidata é gerada em segundo plano.
+Quando o FALAR vem com o mesmo estado de prompt, ela sai na hora, sem
+esperar o LLM. Candidatas envelhecem (TTL) e cada uma é usada uma vez
+"""
+
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SpeculativeGenerator:
+    """
+    Uma especulação por vez (o LLM local atende um pedido de cada vez):
+    um FALAR real com outro estado cancela a especulação em andamento
+    Chave: ExpressionSystem.prompt_state (motivo, restrições, presença)
+    """
+    
+    def __init__(self, expression, motivos: List[str], max_entries: int = 8,
+                 ttl: float = 60.0, margin: float = 0.25, window: int = 3,
+                 deadline: Optional[float] = None):
+        self.expression = expression
+        self.motivos = list(motivos)  # Motivos possíveis de um FALAR
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl  # Segundos até a candidata ficar velha
+        self.margin = margin  # Distância máxima do FALAR ao vencedor para especular
+        self.deadline = deadline  # Prazo da geração especulativa (padrão: o da expressão)
+        self._gaps: deque = deque(maxlen=max(2, window))
+        self._cache: "OrderedDict[tuple, Tuple[str, float]]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+        self._task_key: Optional[tuple] = None
+        self._next = 0  # Rodízio dos motivos
+        
+        # Métricas
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.hits = 0
+        self.misses = 0
+        self.joined = 0
+        self.expired = 0
+        self.cancelled = 0
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def observe(self, decisao: Dict, personalidade: Dict, emocional: Dict,
+                situacional: Dict, memoria_recente: List = None):
+        """
+        Chamado a cada tick depois da decisão; inicia uma especulação se o
+        FALAR está perto de vencer e se aproximando
+        """
+        self._expire()
+        if decisao.get("tipo") == "falar":
+            self._gaps.clear()
+            return
+        
+        scores = decisao.get("contexto", {}).get("scores") or {}
+        if "falar" not in scores:
+            return
+        outros = [score for tipo, score in scores.items() if tipo != "falar"]
+        gap = max(outros) - scores["falar"] if outros else 0.0
+        subindo = not self._gaps or gap <= self._gaps[-1]
+        self._gaps.append(gap)
+        if gap > self.margin or not subindo:
+            return
+        if self.running or self.expression.busy:
+            return
+        
+        for _ in range(len(self.motivos)):
+            motivo = self.motivos[self._next % len(self.motivos)]
+            self._next += 1
+            key = self.expression.prompt_state(motivo, personalidade, emocional, situacional)
+            if key in self._cache:
+                continue
+            hipotese = {"tipo": "falar", "intensidade": scores["falar"], "motivo": motivo}
+            self._task_key = key
+            self._task = asyncio.create_task(self._generate(
+                key, hipotese, personalidade, emocional, situacional, memoria_recente
+            ))
+            self.started += 1
+            return
+    
+    async def _generate(self, key: tuple, decisao: Dict, personalidade: Dict,
+                        emocional: Dict, situacional: Dict, memoria_recente: List):
+        texto = await self.expression.generate_candidate(
+            decisao, personalidade, emocional, situacional, memoria_recente,
+            deadline=self.deadline
+        )
+        if not texto:
+            self.failed += 1
+            return
+        self.completed += 1
+        self._cache.pop(key, None)
+        self._cache[key] = (texto, time.monotonic())
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+    
+    async def take(self, decisao: Dict, personalidade: Dict, emocional: Dict,
+                   situacional: Dict, deadline: Optional[float] = None) -> Optional[str]:
+        """
+        Candidata para um FALAR real (removida do cache) ou None
+        Se a especulação em andamento é do mesmo estado, espera por ela até
+        `deadline`; se é de outro, cancela para liberar o LLM
+        """
+        key = self.expression.prompt_state(decisao.get("motivo", ""), personalidade,
+                                           emocional, situacional)
+        texto = self._pop(key)
+        if texto is not None:
+            self.hits += 1
+            return texto
+        
+        if self.running:
+            task = self._task
+            if self._task_key == key:
+                self.joined += 1
+                try:
+                    await asyncio.wait_for(asyncio.shield(task), deadline)
+                except asyncio.TimeoutError:
+                    pass
+                texto = self._pop(key)
+                if texto is not None:
+                    self.hits += 1
+                    return texto
+            if not task.done():
+                task.cancel()
+                self.cancelled += 1
+        
+        self.misses += 1
+        return None
+    
+    def _pop(self, key: tuple) -> Optional[str]:
+        entrada = self._cache.pop(key, None)
+        if entrada is None:
+            return None
+        texto, criada = entrada
+        if time.monotonic() - criada > self.ttl:
+            self.expired += 1
+            return None
+        return texto
+    
+    def _expire(self):
+        agora = time.monotonic()
+        for key in [k for k, (_, criada) in self._cache.items() if agora - criada > self.ttl]:
+            del self._cache[key]
+            self.expired += 1
+    
+    def clear(self):
+        """Descarta as candidatas e cancela a especulação em andamento"""
+        self._cache.clear()
+        self._gaps.clear()
+        if self.running:
+            self._task.cancel()
+            self.cancelled += 1
+    
+    async def close(self):
+        """clear() e espera a especulação cancelada terminar (encerramento)"""
+        task = self._task
+        self.clear()
+        if task is not None:
+            await asyncio.gather(task, return_exceptions=True)
+    
+    def get_stats(self) -> Dict:
+        consultas = self.hits + self.misses
+        return {
+            "entries": len(self._cache),
+            "running": self.running,
+            "started": self.started,
+            "completed": self.completed,
+            "failed": self.failed,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / consultas, 3) if consultas else 0.0,
+            "joined": self.joined,
+            "expired": self.expired,
+            "cancelled": self.cancelled
+        }
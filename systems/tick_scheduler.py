@@ -0,0 +1,117 @@
+"""
+Agendador do loop principal
+Os ticks miram prazos fixos no relógio monotônico (início + n × intervalo):
+o período real é o intervalo, não intervalo + duração do tick, e o erro de
+um tick não se soma ao do próximo (vale para intervalos abaixo de 1 s)
+Quando um tick passa do próximo prazo (atraso), a política decide:
+- skip: descarta os prazos perdidos e espera o próximo da grade
+- catch_up: roda os perdidos em seguida, sem esperar (no máximo
+  `max_catch_up`; os mais antigos além disso são descartados)
+- coalesce: um tick logo em seguida vale por todos os perdidos e a grade
+  recomeça a partir dele
+"""
+
+from typing import Awaitable, Callable, Dict, Optional
+import asyncio
+import logging
+import time
+
+from .llm_resilience import LatencyWindow
+
+logger = logging.getLogger(__name__)
+
+OVERRUN_POLICIES = ("skip", "catch_up", "coalesce")
+
+
+class TickScheduler:
+    """
+    Roda `tick` nos prazos enquanto `running()` for verdadeiro
+    Métricas: atraso de início de cada tick em relação ao prazo, duração,
+    período entre inícios, ticks atrasados e prazos descartados
+    """
+    
+    def __init__(self, interval: float, policy: str = "skip", max_catch_up: int = 3,
+                 clock: Callable[[], float] = time.monotonic):
+        if interval <= 0:
+            raise ValueError(f"Intervalo do tick precisa ser positivo: {interval}")
+        if policy not in OVERRUN_POLICIES:
+            raise ValueError(f"Política de atraso desconhecida: {policy}")
+        self.interval = interval
+        self.policy = policy
+        self.max_catch_up = max(0, max_catch_up)
+        self.clock = clock
+        
+        # Métricas
+        self.ticks = 0
+        self.overruns = 0  # Ticks que terminaram depois do próximo prazo
+        self.skipped = 0  # Prazos descartados
+        self.caught_up = 0  # Ticks rodados sem espera para recuperar o atraso
+        self.coalesced = 0  # Ticks que valeram por vários prazos
+        self.lag = LatencyWindow()  # ms entre o prazo e o início do tick
+        self.duration = LatencyWindow()  # ms de cada tick
+        self.period = LatencyWindow()  # ms entre inícios consecutivos
+        self.max_lag_ms = 0.0
+        self._last_start: Optional[float] = None
+    
+    async def run(self, tick: Callable[[], Awaitable], running: Callable[[], bool]):
+        prazo = self.clock()
+        while running():
+            agora = self.clock()
+            while agora < prazo:
+                await asyncio.sleep(prazo - agora)
+                agora = self.clock()
+            if not running():
+                break
+            self._record_start(prazo, agora)
+            await tick()
+            self.ticks += 1
+            fim = self.clock()
+            self.duration.add((fim - agora) * 1000)
+            prazo = self._next(prazo, fim)
+    
+    def _record_start(self, prazo: float, agora: float):
+        atraso = (agora - prazo) * 1000
+        self.lag.add(atraso)
+        self.max_lag_ms = max(self.max_lag_ms, atraso)
+        if self._last_start is not None:
+            self.period.add((agora - self._last_start) * 1000)
+        self._last_start = agora
+    
+    def _next(self, prazo: float, agora: float) -> float:
+        """Prazo do próximo tick, dado o prazo deste e o fim dele"""
+        proximo = prazo + self.interval
+        if proximo > agora:
+            return proximo
+        
+        self.overruns += 1
+        perdidos = int((agora - proximo) // self.interval) + 1  # Prazos já vencidos
+        logger.debug(f"Tick atrasado: {(agora - prazo) * 1000:.0f} ms desde o prazo, "
+                     f"{perdidos} prazo(s) vencido(s) ({self.policy})")
+        if self.policy == "skip":
+            self.skipped += perdidos
+            return proximo + perdidos * self.interval
+        if self.policy == "catch_up":
+            descartados = max(0, perdidos - self.max_catch_up)
+            self.skipped += descartados
+            if descartados < perdidos:
+                self.caught_up += 1
+                return proximo + descartados * self.interval
+            return proximo + perdidos * self.interval
+        self.skipped += perdidos - 1
+        self.coalesced += 1
+        return agora
+    
+    def get_stats(self) -> Dict:
+        return {
+            "interval": self.interval,
+            "policy": self.policy,
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "skipped": self.skipped,
+            "caught_up": self.caught_up,
+            "coalesced": self.coalesced,
+            "lag_ms": self.lag.percentiles(),
+            "max_lag_ms": round(self.max_lag_ms, 3),
+            "tick_ms": self.duration.percentiles((50, 95)),
+            "period_ms": round(self.period.mean(), 3)
+        }
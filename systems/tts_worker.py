@@ -0,0 +1,346 @@
+"""
+Worker de TTS
+Uma única thread de longa duração é dona do engine (pyttsx3 não aceita
+chamadas concorrentes e, em alguns drivers, precisa ser usado na thread
+que o criou) e fala as falas de uma fila de prioridade limitada
+Falas velhas são descartadas, repetidas são agrupadas e a fala atual
+pode ser interrompida (barge-in)
+Com um AudioCache, falas já renderizadas tocam direto do WAV; as
+recorrentes são renderizadas quando a fila fica vazia
+"""
+
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+from .audio_cache import AudioCache, WavPlayer
+
+logger = logging.getLogger(__name__)
+
+# Prioridades (menor sai primeiro; mesma prioridade em ordem de chegada)
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+
+class Utterance:
+    """Uma fala na fila; `status` fica definido quando termina"""
+    
+    __slots__ = ("priority", "seq", "text", "group", "created", "max_age",
+                 "on_start", "on_done", "status")
+    
+    def __init__(self, priority: int, seq: int, text: str, group: Optional[str],
+                 max_age: float, on_start: Optional[Callable] = None,
+                 on_done: Optional[Callable] = None):
+        self.priority = priority
+        self.seq = seq
+        self.text = text
+        self.group = group
+        self.created = time.monotonic()
+        self.max_age = max_age
+        self.on_start = on_start  # on_start(utterance), na thread do worker
+        self.on_done = on_done  # on_done(utterance), sempre chamado uma vez
+        self.status: Optional[str] = None  # spoken, stale, coalesced, dropped, cancelled, error
+    
+    def __lt__(self, other: "Utterance") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class TTSWorker:
+    """
+    Thread única de fala com fila de prioridade limitada
+    Fila cheia: a fala nova toma o lugar da menos prioritária (mais nova
+    entre as de menor prioridade) se for mais prioritária que ela; senão é
+    descartada
+    """
+    
+    def __init__(self, engine_factory: Callable[[], Any], max_queue: int = 16,
+                 max_age: float = 10.0, audio_cache: Optional[AudioCache] = None):
+        self._engine_factory = engine_factory
+        self.audio_cache = audio_cache
+        self._player: Optional[WavPlayer] = None
+        self._renders: deque = deque()  # Falas a renderizar quando a fila esvaziar
+        self._voice = None
+        self._rate = None
+        self.max_queue = max(1, max_queue)
+        self.max_age = max_age  # Segundos na fila até a fala ficar velha
+        self._heap: List[Utterance] = []
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._stopping = False
+        self._cancel = threading.Event()
+        self._current: Optional[Utterance] = None
+        self.engine = None
+        
+        # Métricas
+        self.spoken = 0
+        self.stale = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.cancelled = 0
+        self.errors = 0
+        self.cached_plays = 0
+        self.last_wait_ms = 0.0
+        self.last_speak_ms = 0.0
+        self.max_speak_ms = 0.0
+        self._total_speak_ms = 0.0
+    
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self, timeout: float = 5.0) -> bool:
+        """Inicia a thread e espera o engine; retorna se há engine"""
+        if not self.is_running:
+            self._stopping = False
+            self._ready.clear()
+            self._thread = threading.Thread(target=self._run, name="tts-worker", daemon=True)
+            self._thread.start()
+            self._ready.wait(timeout)
+        return self.engine is not None
+    
+    def stop(self, timeout: float = 2.0):
+        """Descarta a fila, interrompe a fala atual e encerra a thread"""
+        if not self.is_running:
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self.clear()
+        self.cancel_current()
+        self._thread.join(timeout)
+        self._thread = None
+    
+    def submit(self, text: str, priority: int = PRIORITY_NORMAL, group: Optional[str] = None,
+               max_age: Optional[float] = None, on_start: Optional[Callable] = None,
+               on_done: Optional[Callable] = None) -> Optional[Utterance]:
+        """
+        Enfileira uma fala; retorna None se não entrou (repetida ou fila
+        cheia) — nesse caso on_done já foi chamado
+        Texto idêntico do mesmo grupo ainda na fila é agrupado (não repete)
+        """
+        utterance = Utterance(priority, next(self._seq), text, group,
+                              self.max_age if max_age is None else max_age,
+                              on_start, on_done)
+        if self.engine is None or not self.is_running:
+            self._finish(utterance, "dropped")
+            return None
+        
+        evicted = None
+        with self._cond:
+            if any(u.text == text and u.group == group for u in self._heap):
+                self.coalesced += 1
+                status = "coalesced"
+            elif len(self._heap) >= self.max_queue:
+                pior = max(self._heap)
+                if utterance < pior and utterance.priority < pior.priority:
+                    self._heap.remove(pior)
+                    heapq.heapify(self._heap)
+                    heapq.heappush(self._heap, utterance)
+                    evicted = pior
+                    status = None
+                else:
+                    status = "dropped"
+            else:
+                heapq.heappush(self._heap, utterance)
+                status = None
+            if status is None:
+                self._cond.notify()
+        
+        if evicted is not None:
+            self.dropped += 1
+            self._finish(evicted, "dropped")
+        if status is not None:
+            if status == "dropped":
+                self.dropped += 1
+            self._finish(utterance, status)
+            return None
+        return utterance
+    
+    def clear(self, group: Optional[str] = None) -> int:
+        """Descarta as falas na fila (todas ou só as de um grupo)"""
+        with self._cond:
+            removidas = [u for u in self._heap if group is None or u.group == group]
+            if not removidas:
+                return 0
+            self._heap = [u for u in self._heap if not (group is None or u.group == group)]
+            heapq.heapify(self._heap)
+        for utterance in removidas:
+            self._finish(utterance, "cancelled")
+        self.cancelled += len(removidas)
+        return len(removidas)
+    
+    def cancel_current(self, group: Optional[str] = None) -> bool:
+        """Barge-in: interrompe a fala em andamento (se for do grupo pedido)"""
+        current = self._current
+        if current is None or (group is not None and current.group != group):
+            return False
+        self._cancel.set()
+        return True
+    
+    def _create_engine(self):
+        try:
+            self.engine = self._engine_factory()
+            if self.engine is not None:
+                # Interrupção pelo caminho que o pyttsx3 suporta: stop() no callback
+                self.engine.connect("started-word", self._on_word)
+        except Exception as e:
+            logger.error(f"Erro ao inicializar TTS: {e}")
+            self.engine = None
+        else:
+            self._open_cache()
+        finally:
+            self._ready.set()
+    
+    def _open_cache(self):
+        """Abre o cache de áudio e agenda as falas fixadas que faltam"""
+        if self.audio_cache is None or self.engine is None:
+            return
+        try:
+            self._player = WavPlayer()
+            if not self._player.available:
+                logger.info("Sem player de WAV: cache de áudio desligado")
+                self.audio_cache = None
+                return
+            self._voice = self.engine.getProperty("voice")
+            self._rate = self.engine.getProperty("rate")
+            self.audio_cache.open()
+            self._renders.extend(self.audio_cache.pending(self._voice, self._rate))
+        except Exception as e:
+            logger.error(f"Erro ao abrir cache de áudio: {e}")
+            self.audio_cache = None
+    
+    def _on_word(self, name, location, length):
+        if self._cancel.is_set():
+            self.engine.stop()
+    
+    def _run(self):
+        """Loop da thread: tira a fala mais prioritária e fala"""
+        self._create_engine()
+        if self.engine is None:
+            return
+        while True:
+            with self._cond:
+                while not self._heap and not self._renders and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                utterance = heapq.heappop(self._heap) if self._heap else None
+            
+            if utterance is None:
+                # Fila vazia: hora de renderizar uma fala recorrente
+                self._render(self._renders.popleft())
+                continue
+            
+            waited = time.monotonic() - utterance.created
+            if waited > utterance.max_age:
+                self.stale += 1
+                self._finish(utterance, "stale")
+                continue
+            self.last_wait_ms = waited * 1000
+            self._speak(utterance)
+    
+    def _speak(self, utterance: Utterance):
+        self._cancel.clear()
+        self._current = utterance
+        if utterance.on_start is not None:
+            try:
+                utterance.on_start(utterance)
+            except Exception as e:
+                logger.error(f"Erro no início da fala: {e}")
+        start = time.perf_counter()
+        try:
+            if not self._play_cached(utterance.text):
+                self.engine.say(utterance.text)
+                self.engine.runAndWait()
+                self._note_synthesized(utterance.text)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Erro ao falar: {e}")
+            status = "error"
+        else:
+            status = "cancelled" if self._cancel.is_set() else "spoken"
+        finally:
+            self._current = None
+        
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if status == "spoken":
+            self.spoken += 1
+            self.last_speak_ms = elapsed_ms
+            self.max_speak_ms = max(self.max_speak_ms, elapsed_ms)
+            self._total_speak_ms += elapsed_ms
+        elif status == "cancelled":
+            self.cancelled += 1
+        self._finish(utterance, status)
+    
+    def _play_cached(self, text: str) -> bool:
+        """Toca o WAV da fala se estiver no cache; False se precisa sintetizar"""
+        if self.audio_cache is None:
+            return False
+        path = self.audio_cache.lookup(text, self._voice, self._rate)
+        if path is None:
+            return False
+        try:
+            self._player.play(path, self._cancel)
+        except Exception as e:
+            logger.error(f"Erro ao tocar áudio do cache: {e}")
+            return False
+        self.cached_plays += 1
+        return True
+    
+    def _note_synthesized(self, text: str):
+        """Conta a fala sintetizada; as recorrentes vão para a renderização"""
+        if self.audio_cache is None or text in self._renders:
+            return
+        if self.audio_cache.wants(text, self._voice, self._rate):
+            self._renders.append(text)
+    
+    def _render(self, text: str):
+        """Renderiza uma fala em WAV (sem tocar) e guarda no cache"""
+        if self.audio_cache is None:
+            return
+        temp_path = self.audio_cache.temp_path(text, self._voice, self._rate)
+        try:
+            self.engine.save_to_file(text, temp_path)
+            self.engine.runAndWait()
+            self.audio_cache.add(text, self._voice, self._rate, temp_path)
+        except Exception as e:
+            logger.error(f"Erro ao renderizar áudio: {e}")
+    
+    def _finish(self, utterance: Utterance, status: str):
+        utterance.status = status
+        if utterance.on_done is not None:
+            try:
+                utterance.on_done(utterance)
+            except Exception as e:
+                logger.error(f"Erro no fim da fala: {e}")
+    
+    def get_stats(self) -> Dict:
+        """Retorna profundidade da fila e latência da fala"""
+        with self._cond:
+            depth = len(self._heap)
+        return {
+            "running": self.is_running,
+            "engine": self.engine is not None,
+            "queue_depth": depth,
+            "max_queue": self.max_queue,
+            "speaking": self._current is not None,
+            "spoken": self.spoken,
+            "stale": self.stale,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled,
+            "errors": self.errors,
+            "cached_plays": self.cached_plays,
+            "last_wait_ms": round(self.last_wait_ms, 3),
+            "last_speak_ms": round(self.last_speak_ms, 3),
+            "avg_speak_ms": round(self._total_speak_ms / self.spoken, 3) if self.spoken else 0.0,
+            "max_speak_ms": round(self.max_speak_ms, 3),
+            "audio_cache": self.audio_cache.get_stats() if self.audio_cache else None
+        }
@@ -0,0 +1,88 @@
+"""
+Testes dos codecs de contexto: ida e volta com e sem dicionário e o modo auto
+"""
+
+from datetime import datetime, timedelta
+import random
+
+from systems.contexto_codec import CODEC_JSON, CODEC_PACKED, CodecDictionary, ContextoCodecs
+
+
+def contextos(n: int, seed: int = 0):
+    """Formatos da memória real (FALAR e decisões) mais alguns fora do padrão"""
+    rng = random.Random(seed)
+    inicio = datetime(2026, 1, 1)
+    out = []
+    for i in range(n):
+        emocional = {"energia": round(rng.random(), 3), "humor": round(rng.uniform(-1, 1), 3)}
+        if i % 3 == 0:
+            out.append({"decisao": rng.choice(["curiosidade ativa", "energia baixa"]),
+                        "emocional": emocional})
+        elif i % 3 == 1:
+            agora = inicio + timedelta(seconds=i, microseconds=rng.randint(0, 999_999))
+            out.append({
+                "emocional": emocional,
+                "situacional": {"luz": rng.choice(["clara", "escura"]),
+                                "usuario_presente": rng.random() < 0.5,
+                                "ultima_atualizacao": agora.isoformat(),
+                                "nota": None,
+                                "texto": f"livre {rng.random()}"},
+                "contagem": rng.randint(-10**12, 10**12),
+            })
+        else:
+            out.append({"lista": [1, 2.5, "três", None, True, {"x": -0.0}],
+                        "grande": 2 ** 70, "flutuante": rng.random(), "vazio": {}})
+    return out
+
+
+def test_ida_e_volta_sem_e_com_dicionario():
+    amostras = contextos(300)
+    codecs = ContextoCodecs("packed")
+    sem_dicionario = [codecs.encode(c) for c in amostras]
+    
+    codecs.add_dictionary(CodecDictionary.train(1, contextos(300, seed=1)))
+    com_dicionario = [codecs.encode(c) for c in amostras]
+    assert codecs.packed.template_hits > 0
+    
+    for contexto, (raw, tag), (raw_dict, tag_dict) in zip(amostras, sem_dicionario, com_dicionario):
+        assert tag == tag_dict == CODEC_PACKED
+        assert codecs.decode(raw, tag) == contexto
+        assert codecs.decode(raw_dict, tag_dict) == contexto
+        # O tipo também volta igual (decimal escalado não vira int, -0.0 não vira 0.0)
+        assert repr(codecs.decode(raw_dict, tag_dict)) == repr(contexto)
+
+
+def test_contexto_fora_do_modelo_usa_formato_generico():
+    codecs = ContextoCodecs("packed")
+    codecs.add_dictionary(CodecDictionary.train(1, contextos(300)))
+    # Mesmas chaves de um modelo, mas com tipos/ordem diferentes
+    for contexto in ({"decisao": 3, "emocional": {"energia": 0.5, "humor": 0.1}},
+                     {"emocional": {"energia": 0.5, "humor": 0.1}, "decisao": "energia baixa"},
+                     {"decisao": "energia baixa", "emocional": {"energia": 1e300, "humor": 0.1}}):
+        raw, tag = codecs.encode(contexto)
+        assert codecs.decode(raw, tag) == contexto
+
+
+def test_auto_grava_json_ate_haver_dicionario():
+    codecs = ContextoCodecs()
+    assert codecs.auto
+    raw, tag = codecs.encode({"a": 1})
+    assert tag == CODEC_JSON
+    
+    codecs.add_dictionary(CodecDictionary.train(1, contextos(100)))
+    raw_packed, tag_packed = codecs.encode({"a": 1})
+    assert tag_packed == CODEC_PACKED
+    # Linhas antigas em JSON continuam legíveis
+    assert codecs.decode(raw, tag) == codecs.decode(raw_packed, tag_packed) == {"a": 1}
+
+
+def test_dicionario_serializado_decodifica_linhas_antigas():
+    dictionary = CodecDictionary.train(1, contextos(300))
+    codecs = ContextoCodecs("packed")
+    codecs.add_dictionary(dictionary)
+    amostras = contextos(50, seed=2)
+    codificados = [codecs.encode(c) for c in amostras]
+    
+    outro = ContextoCodecs("packed")
+    outro.add_dictionary(CodecDictionary.from_bytes(dictionary.to_bytes()))
+    assert [outro.decode(raw, tag) for raw, tag in codificados] == amostras
@@ -0,0 +1,147 @@
+"""
+Testes do log segmentado: reabertura, compactação e trocas interrompidas
+"""
+
+from datetime import datetime, timedelta
+import asyncio
+import os
+import shutil
+
+import pytest
+
+from systems.memory import MemoryEvent, MemorySystem
+
+SEGMENTO = 256  # Registros por segmento (o mínimo)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def memoria(tmp_path) -> MemorySystem:
+    return MemorySystem(str(tmp_path / "prime.db"), backend="log",
+                        log_path=str(tmp_path / "log"), log_segment_records=SEGMENTO,
+                        write_flush_interval=0.01, coalesce_window=0,
+                        contexto_codec="json")
+
+
+async def gravar(memory: MemorySystem, n: int, dias: int = 0, peso: float = 0.5):
+    inicio = datetime.now() - timedelta(days=dias)
+    for i in range(n):
+        await memory.store_event(MemoryEvent(
+            timestamp=inicio + timedelta(seconds=i), tipo="interacao", evento=f"e{dias}-{i}",
+            resultado="aceita", peso_emocional=peso, contexto={"i": i}
+        ))
+    await memory.flush()
+
+
+async def ler(tmp_path) -> list:
+    memory = memoria(tmp_path)
+    await memory.initialize()
+    eventos = [event async for event in memory.iter_events()]
+    await memory.close()
+    return eventos
+
+
+def segmentos(tmp_path) -> list:
+    return sorted(nome for nome in os.listdir(tmp_path / "log") if nome.endswith(".rec"))
+
+
+def test_reabre_com_os_mesmos_eventos(tmp_path):
+    async def cenario():
+        memory = memoria(tmp_path)
+        await memory.initialize()
+        await gravar(memory, 3 * SEGMENTO + 10)
+        await memory.close()
+        return await ler(tmp_path)
+    
+    eventos = run(cenario())
+    assert len(eventos) == 3 * SEGMENTO + 10
+    assert [event.id for event in eventos] == sorted(event.id for event in eventos)
+    assert eventos[5].contexto == {"i": 5}
+    assert len(segmentos(tmp_path)) == 4
+
+
+def test_compactacao_arquiva_e_junta_segmentos(tmp_path):
+    async def cenario():
+        memory = memoria(tmp_path)
+        await memory.initialize()
+        await gravar(memory, 2 * SEGMENTO, dias=60)
+        await gravar(memory, 2 * SEGMENTO, dias=60, peso=0.9)
+        await gravar(memory, 10)
+        resultado = await memory.consolidate()
+        arquivados = 0
+        for mes in memory.list_archives():
+            arquivados += len(await memory.read_archive(mes))
+        await memory.close()
+        return resultado, arquivados, await ler(tmp_path)
+    
+    resultado, arquivados, eventos = run(cenario())
+    assert resultado["archived"] == arquivados == 2 * SEGMENTO
+    assert len(eventos) == 2 * SEGMENTO + 10
+    assert all(event.peso_emocional == 0.9 for event in eventos[:-10])
+    # Os segmentos selados viraram uma geração nova; os antigos sumiram
+    assert any("-" in nome for nome in segmentos(tmp_path))
+
+
+def test_compactacao_interrompida_antes_de_apagar_os_antigos(tmp_path):
+    async def cenario():
+        memory = memoria(tmp_path)
+        await memory.initialize()
+        for _ in range(3):
+            # Meio segmento arquivável: os que sobram cabem juntos num segmento
+            await gravar(memory, SEGMENTO // 2, dias=60, peso=0.1)
+            await gravar(memory, SEGMENTO // 2, dias=60, peso=0.9)
+        await gravar(memory, 10)
+        await memory.close()
+        
+        # Cópia dos segmentos antes: voltam como se a remoção não tivesse acontecido
+        copia = tmp_path / "antes"
+        shutil.copytree(tmp_path / "log", copia)
+        memory = memoria(tmp_path)
+        await memory.initialize()
+        resultado = await memory.consolidate()
+        await memory.close()
+        compactados = segmentos(tmp_path)
+        for nome in os.listdir(copia):
+            if not os.path.exists(tmp_path / "log" / nome):
+                shutil.copy(copia / nome, tmp_path / "log" / nome)
+        return resultado, compactados, await ler(tmp_path)
+    
+    resultado, compactados, eventos = run(cenario())
+    assert resultado["segments_rewritten"] == 3
+    assert len(compactados) == 3
+    ids = [event.id for event in eventos]
+    assert len(ids) == len(set(ids)) == 3 * SEGMENTO // 2 + 10
+    assert segmentos(tmp_path) == compactados
+
+
+def test_payload_menor_que_o_cabecalho_e_erro(tmp_path):
+    async def cenario():
+        memory = memoria(tmp_path)
+        await memory.initialize()
+        await gravar(memory, SEGMENTO + 1)
+        await memory.close()
+        primeiro = tmp_path / "log" / segmentos(tmp_path)[0].replace(".rec", ".dat")
+        with open(primeiro, "r+b") as f:
+            f.truncate(os.path.getsize(primeiro) // 2)
+        with pytest.raises(ValueError):
+            await ler(tmp_path)
+    
+    run(cenario())
+
+
+def test_compactacao_interrompida_antes_da_troca(tmp_path):
+    async def cenario():
+        memory = memoria(tmp_path)
+        await memory.initialize()
+        await gravar(memory, SEGMENTO + 1)
+        await memory.close()
+        # .dat da geração nova gravado, .rec ainda em .tmp
+        for nome in ("00000001-0001.dat", "00000001-0001.rec.tmp"):
+            (tmp_path / "log" / nome).write_bytes(bytes(128))
+        return await ler(tmp_path)
+    
+    eventos = run(cenario())
+    assert len(eventos) == SEGMENTO + 1
+    assert not [nome for nome in os.listdir(tmp_path / "log") if "-" in nome]
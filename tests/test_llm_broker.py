@@ -0,0 +1,117 @@
+"""
+Testes do corretor de pedidos ao LLM: chave de junção, junção, prazo e
+vagas por agente
+"""
+
+import asyncio
+
+import pytest
+
+from systems.llm_backend import LLMBackend
+from systems.llm_broker import ExpressionBroker, prompt_key
+from systems.llm_standin import StandInBackend
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def mensagens(memoria: str = "usuário chegou", pedido: str = "Fale algo.") -> list:
+    return [{"role": "system", "content": "Você é Prime."},
+            {"role": "user", "content": f"{pedido}\nContexto recente:\n- {memoria}"}]
+
+
+class Registro(LLMBackend):
+    """Upstream que anota a ordem de início e responde depois de `duracao` s"""
+    
+    name = "registro"
+    model = "registro"
+    
+    def __init__(self, duracao: float = 0.05):
+        self.duracao = duracao
+        self.inicios = []
+    
+    async def chat(self, messages, options=None, keep_alive=None):
+        self.inicios.append(messages[-1]["content"])
+        await asyncio.sleep(self.duracao)
+        return {"message": {"role": "assistant", "content": messages[-1]["content"]},
+                "done": True}
+
+
+def test_chave_de_juncao():
+    base = prompt_key("m", mensagens(), None, False)
+    assert prompt_key("m", mensagens(), None, False) == base
+    # O padrão é exact: memória recente diferente é outro pedido
+    assert prompt_key("m", mensagens("usuário saiu"), None, False) != base
+    assert prompt_key("m", mensagens(), None, False, merge="off") is None
+    
+    near = prompt_key("m", mensagens(), None, False, merge="near")
+    assert prompt_key("m", mensagens(pedido="  FALE   algo. "), None, False,
+                      merge="near") == near
+    assert prompt_key("m", mensagens("usuário saiu"), None, False, merge="near") != near
+
+
+def test_pedidos_iguais_viram_uma_chamada():
+    async def cenario():
+        broker = ExpressionBroker(StandInBackend(first_token="fixed:20", tokens_per_s=0),
+                                  concurrency=2)
+        a, b = broker.client("a"), broker.client("b")
+        respostas = await asyncio.gather(a.chat(mensagens()), b.chat(mensagens()),
+                                         a.chat(mensagens("usuário saiu")))
+        return broker.get_stats(), respostas
+    
+    stats, respostas = run(cenario())
+    assert stats["upstream_calls"] == 2
+    assert stats["merged"] == 1
+    assert respostas[0] == respostas[1]
+
+
+def test_agente_no_limite_cede_a_vaga():
+    async def cenario():
+        upstream = Registro()
+        broker = ExpressionBroker(upstream, concurrency=2, max_per_agent=1)
+        a, b = broker.client("a"), broker.client("b")
+        pedidos = [asyncio.ensure_future(a.chat(mensagens(pedido=f"a{i}"))) for i in range(3)]
+        await asyncio.sleep(0.01)
+        # Prazo mais distante que o de a2, mas "a" já ocupa uma vaga
+        pedidos.append(asyncio.ensure_future(b.chat(mensagens(pedido="b0"))))
+        await asyncio.gather(*pedidos)
+        return [inicio.split("\n")[0] for inicio in upstream.inicios]
+    
+    assert run(cenario()) == ["a0", "a1", "b0", "a2"]
+
+
+def test_prazo_vencido_na_fila_nao_chega_ao_servidor():
+    async def cenario():
+        upstream = Registro(duracao=0.1)
+        broker = ExpressionBroker(upstream, concurrency=1, deadline=0.05)
+        cliente = broker.client("a")
+        primeiro = asyncio.ensure_future(cliente.chat(mensagens(pedido="p0")))
+        await asyncio.sleep(0)
+        with pytest.raises(asyncio.TimeoutError):
+            await cliente.chat(mensagens(pedido="p1"))
+        await primeiro
+        return broker.get_stats(), upstream.inicios
+    
+    stats, inicios = run(cenario())
+    assert stats["expired"] == 1
+    assert stats["upstream_calls"] == 1
+    assert len(inicios) == 1
+
+
+def test_keep_alive_curto_do_agente_chega_ao_upstream():
+    async def cenario():
+        upstream = StandInBackend(first_token="fixed:0", tokens_per_s=0, load_time="fixed:50",
+                                  keep_alive="30m")
+        cliente = ExpressionBroker(upstream).client("a")
+        cliente.set_keep_alive("30m")
+        await cliente.chat(mensagens())
+        # Atividade acabou: o pedido vazio reaplica um keep_alive curto
+        cliente.set_keep_alive("100ms")
+        await cliente.chat([])
+        await asyncio.sleep(0.2)
+        await cliente.chat(mensagens())
+        return upstream.loads
+    
+    # Carga inicial + recarga depois que o keep_alive curto venceu
+    assert run(cenario()) == 2
@@ -0,0 +1,125 @@
+"""
+Testes da resiliência do LLM: estados do disjuntor, hedge e cancelamento
+do pedido perdedor
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from systems.llm_backend import LLMUnavailable
+from systems.llm_resilience import CircuitBreaker, ResilientBackend
+from systems.llm_standin import LatencyModel, StandInBackend
+
+MENSAGENS = [{"role": "user", "content": "Fale algo."}]
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def standin(first_token_ms: int, model: str = "standin") -> StandInBackend:
+    return StandInBackend(model=model, first_token=f"fixed:{first_token_ms}", tokens_per_s=0)
+
+
+def test_disjuntor_abre_sonda_e_fecha():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Só a sonda passa enquanto ela não termina
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    stats = breaker.get_stats()
+    assert (stats["trips"], stats["probes"], stats["rejected"]) == (2, 2, 2)
+
+
+def test_sonda_cancelada_nao_fecha_nem_reabre_o_prazo():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == CircuitBreaker.OPEN
+    # O prazo não recomeça: a próxima tentativa já sonda
+    assert breaker.allow()
+
+
+def test_backend_lento_abre_o_circuito_e_a_sonda_fecha():
+    async def cenario():
+        primary = standin(200)
+        backend = ResilientBackend(primary, slo=0.03, failure_threshold=2, reset_timeout=0.1)
+        for _ in range(2):
+            with pytest.raises(asyncio.TimeoutError):
+                await backend.chat(MENSAGENS)
+        estados = [backend.breaker.state]
+        with pytest.raises(LLMUnavailable):
+            await backend.chat(MENSAGENS)
+        
+        # Backend voltou: depois de reset_timeout a sonda passa e fecha
+        primary.first_token = LatencyModel("fixed:0")
+        await asyncio.sleep(0.11)
+        await backend.chat(MENSAGENS)
+        estados.append(backend.breaker.state)
+        return estados, backend.get_stats(), primary.requests
+    
+    estados, stats, requests = run(cenario())
+    assert estados == [CircuitBreaker.OPEN, CircuitBreaker.CLOSED]
+    assert (stats["slo_violations"], stats["breaker"]["rejected"]) == (2, 1)
+    # O pedido barrado não chegou ao backend
+    assert requests == 3
+
+
+def test_hedge_sai_depois_de_hedge_after_e_cancela_o_perdedor():
+    async def cenario():
+        primary, hedge = standin(300), standin(0, model="reserva")
+        backend = ResilientBackend(primary, slo=1.0, hedge=hedge, hedge_after=0.05)
+        inicio = time.perf_counter()
+        resposta = await backend.chat(MENSAGENS)
+        decorrido = time.perf_counter() - inicio
+        return resposta, decorrido, backend.get_stats(), primary, hedge
+    
+    resposta, decorrido, stats, primary, hedge = run(cenario())
+    assert resposta["model"] == "reserva"
+    assert 0.05 <= decorrido < 0.3
+    assert (stats["hedged"], stats["hedge_wins"]) == (1, 1)
+    assert (primary.cancelled, hedge.cancelled) == (1, 0)
+
+
+def test_principal_no_prazo_nao_dispara_hedge():
+    async def cenario():
+        primary, hedge = standin(10), standin(0, model="reserva")
+        backend = ResilientBackend(primary, slo=1.0, hedge=hedge, hedge_after=0.1)
+        resposta = await backend.chat(MENSAGENS)
+        return resposta, backend.get_stats(), hedge.requests
+    
+    resposta, stats, hedge_requests = run(cenario())
+    assert resposta["model"] == "standin"
+    assert (stats["hedged"], hedge_requests) == (0, 0)
+
+
+def test_hedge_no_stream_fecha_o_stream_perdedor():
+    async def cenario():
+        primary, hedge = standin(300), standin(0, model="reserva")
+        backend = ResilientBackend(primary, slo=1.0, hedge=hedge, hedge_after=0.05)
+        pedacos = [chunk async for chunk in backend.stream(MENSAGENS)]
+        return pedacos, backend.get_stats(), primary, hedge
+    
+    pedacos, stats, primary, hedge = run(cenario())
+    assert pedacos[-1]["done"]
+    assert {chunk["model"] for chunk in pedacos} == {"reserva"}
+    assert stats["hedge_wins"] == 1
+    assert (primary.cancelled, hedge.cancelled) == (1, 0)
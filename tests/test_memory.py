@@ -0,0 +1,263 @@
+"""
+Testes da memória: fila write-behind, migrações do schema e consolidação
+"""
+
+from datetime import datetime, timedelta
+import asyncio
+import json
+import sqlite3
+
+import pytest
+
+from systems.memory import SCHEMA_VERSION, MemoryEvent, MemorySystem
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def memoria(tmp_path, **kwargs) -> MemorySystem:
+    kwargs.setdefault("write_flush_interval", 0.01)
+    return MemorySystem(str(tmp_path / "prime.db"), **kwargs)
+
+
+def test_contexto_invalido_falha_na_chamada_e_nao_no_lote(tmp_path):
+    async def cenario():
+        memory = memoria(tmp_path)
+        await memory.initialize()
+        for i in range(10):
+            contexto = {"i": i}
+            if i == 4:
+                contexto["quando"] = datetime.now()
+                with pytest.raises(TypeError):
+                    await memory.store_event(MemoryEvent(tipo="t", evento=f"e{i}", contexto=contexto))
+                continue
+            await memory.store_event(MemoryEvent(tipo="t", evento=f"e{i}", contexto=contexto))
+        await memory.flush()
+        gravados = await memory.count_events("t")
+        stats = memory.get_stats()["write_queue"]
+        await memory.close()
+        return gravados, stats
+    
+    gravados, stats = run(cenario())
+    assert gravados == 9
+    assert stats["errors"] == 0 and stats["dropped"] == 0
+
+
+def test_lote_que_falha_e_gravado_um_a_um(tmp_path):
+    async def cenario():
+        memory = memoria(tmp_path)
+        await memory.initialize()
+        original = memory.backend.write_batch
+        
+        async def falha_em_lote(rows, merge_into=None):
+            if len(rows) > 1:
+                raise OSError("falha simulada")
+            return await original(rows, merge_into)
+        
+        memory.backend.write_batch = falha_em_lote
+        for i in range(5):
+            await memory.store_event(MemoryEvent(tipo="t", evento=f"e{i}"))
+        await memory.flush()
+        gravados = await memory.count_events("t")
+        stats = memory.get_stats()["write_queue"]
+        await memory.close()
+        return gravados, stats
+    
+    gravados, stats = run(cenario())
+    assert gravados == 5
+    assert stats["errors"] == 1 and stats["dropped"] == 0
+
+
+def test_gravar_ou_ler_depois_de_fechar_e_erro(tmp_path):
+    async def cenario():
+        memory = memoria(tmp_path)
+        await memory.initialize()
+        await memory.store_event(MemoryEvent(tipo="t", evento="antes"))
+        await memory.close()
+        with pytest.raises(RuntimeError):
+            await memory.store_event(MemoryEvent(tipo="t", evento="depois"))
+        with pytest.raises(RuntimeError):
+            await memory.count_events("t")
+        
+        # Fechar grava o pendente; abrir de novo é explícito
+        reaberta = memoria(tmp_path)
+        await reaberta.initialize()
+        eventos = await reaberta.get_events_by_type("t")
+        await reaberta.close()
+        return eventos
+    
+    eventos = run(cenario())
+    assert [event.evento for event in eventos] == ["antes"]
+
+
+def test_initialize_repetido_nao_duplica_a_consolidacao(tmp_path):
+    async def cenario():
+        memory = memoria(tmp_path, consolidation_interval=3600)
+        await memory.initialize()
+        primeira = memory._consolidation_task
+        await memory.initialize()
+        mesma = memory._consolidation_task is primeira
+        await memory.close()
+        return mesma, primeira.cancelled()
+    
+    mesma, cancelada = run(cenario())
+    assert mesma
+    assert cancelada
+
+
+def test_consolidacao_mantem_os_padroes_arquivados(tmp_path):
+    async def cenario():
+        memory = memoria(tmp_path, coalesce_window=0)
+        await memory.initialize()
+        agora = datetime.now()
+        for dias, resultado, peso in ((60, "aceita", 0.2), (45, "ignorada", 0.5),
+                                      (45, "aceita", 0.9), (1, "aceita", 0.4)):
+            for i in range(3):
+                await memory.store_event(MemoryEvent(
+                    timestamp=agora - timedelta(days=dias, minutes=i), tipo="interacao",
+                    evento=f"e{dias}-{i}", resultado=resultado, peso_emocional=peso
+                ))
+        await memory.flush()
+        antes = await memory.get_patterns(90)
+        resultado = await memory.consolidate()
+        incremental = await memory.get_patterns(90)
+        await memory.rebuild_patterns()
+        reconstruido = await memory.get_patterns(90)
+        await memory.close()
+        return antes, resultado, incremental, reconstruido
+    
+    antes, resultado, incremental, reconstruido = run(cenario())
+    assert antes == {"interacao_aceita": 9, "interacao_ignorada": 3}
+    assert resultado["archived"] == 6
+    # Arquivados saem da tabela quente, mas continuam na janela dos padrões
+    assert incremental == reconstruido == antes
+
+
+def test_migracao_do_schema_v1_ate_o_atual(tmp_path):
+    # Schema original: timestamp em texto ISO, sem user_version
+    db = sqlite3.connect(str(tmp_path / "prime.db"))
+    db.execute("""
+        CREATE TABLE memory_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            tipo TEXT NOT NULL,
+            evento TEXT NOT NULL,
+            resposta_dada TEXT,
+            resultado TEXT,
+            peso_emocional REAL DEFAULT 0.5,
+            contexto TEXT
+        )
+    """)
+    agora = datetime.now().replace(microsecond=0)
+    db.executemany("""
+        INSERT INTO memory_events
+        (timestamp, tipo, evento, resposta_dada, resultado, peso_emocional, contexto)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [((agora - timedelta(hours=i)).isoformat(), "interacao", f"conversa sobre chuva {i}",
+           "vai chover hoje", "aceita", 0.5, json.dumps({"i": i})) for i in range(5)])
+    db.commit()
+    db.close()
+    
+    async def cenario():
+        memory = memoria(tmp_path)
+        await memory.initialize()
+        versao = await memory.get_schema_version()
+        eventos = await memory.get_events_by_type("interacao")
+        encontrados = await memory.search("chuva")
+        padroes = await memory.get_patterns(1)
+        await memory.store_event(MemoryEvent(tipo="interacao", evento="nova", resultado="aceita",
+                                             contexto={"novo": True}))
+        await memory.flush()
+        total = await memory.count_events("interacao")
+        await memory.close()
+        return versao, eventos, encontrados, padroes, total
+    
+    versao, eventos, encontrados, padroes, total = run(cenario())
+    assert versao == SCHEMA_VERSION
+    assert sorted(event.contexto["i"] for event in eventos) == list(range(5))
+    assert {event.timestamp for event in eventos} == {agora - timedelta(hours=i) for i in range(5)}
+    assert len(encontrados) == 5
+    assert padroes == {"interacao_aceita": 5}
+    assert total == 6
+
+
+def test_migracao_v5_para_v6_mantem_contexto_em_json(tmp_path):
+    async def criar():
+        memory = memoria(tmp_path)
+        await memory.initialize()
+        await memory.store_event(MemoryEvent(tipo="t", evento="antigo", contexto={"a": 1}))
+        await memory.close()
+    
+    run(criar())
+    # Volta o banco para o formato v5: sem a coluna codec nem os dicionários
+    db = sqlite3.connect(str(tmp_path / "prime.db"))
+    db.execute("ALTER TABLE memory_events DROP COLUMN codec")
+    db.execute("DROP TABLE memory_codec_dicts")
+    db.execute("PRAGMA user_version = 5")
+    db.commit()
+    db.close()
+    
+    async def reabrir():
+        memory = memoria(tmp_path)
+        await memory.initialize()
+        versao = await memory.get_schema_version()
+        eventos = await memory.get_events_by_type("t")
+        await memory.close()
+        return versao, eventos
+    
+    versao, eventos = run(reabrir())
+    assert versao == SCHEMA_VERSION
+    assert [event.contexto for event in eventos] == [{"a": 1}]
+
+
+def test_exportar_e_importar_em_banco_com_eventos(tmp_path):
+    async def cenario():
+        origem = memoria(tmp_path / "origem")
+        await origem.initialize()
+        for i in range(5):
+            await origem.store_event(MemoryEvent(tipo="fala", evento=f"importado numero {i}",
+                                                 contexto={"i": i, "lista": [i, "x"]}))
+        await origem.flush()
+        arquivo = str(tmp_path / "memoria.ndjson")
+        assert await origem.export_ndjson(arquivo) == 5
+        await origem.close()
+        
+        destino = memoria(tmp_path / "destino",
+                          semantic_index_path=str(tmp_path / "destino" / "semantic"))
+        await destino.initialize()
+        for i in range(8):
+            await destino.store_event(MemoryEvent(tipo="local", evento=f"local {i}"))
+        await destino.flush()
+        # Ids 1..5 já existem no destino: mantendo ids, nada entra
+        ignorados = await destino.import_ndjson(arquivo, keep_ids=True)
+        importados = await destino.import_ndjson(arquivo)
+        eventos = [event async for event in destino.iter_events(tipo="fala")]
+        lembrado = await destino.recall("importado numero 3", k=1, budget_ms=None)
+        total = await destino.count_events("fala") + await destino.count_events("local")
+        await destino.close()
+        
+        limpo = memoria(tmp_path / "limpo", semantic_index_path=str(tmp_path / "limpo" / "sem"))
+        await limpo.initialize()
+        altos = str(tmp_path / "altos.ndjson")
+        with open(altos, "w", encoding="utf-8") as f:
+            for i in (50, 51):
+                f.write(json.dumps({"id": i, "ts": 1, "tipo": "local", "evento": f"alto {i}"}))
+                f.write("\n")
+        await limpo.import_ndjson(altos, keep_ids=True)
+        # Ids abaixo do último indexado também entram no índice
+        mantidos = await limpo.import_ndjson(arquivo, keep_ids=True)
+        ids = [event.id async for event in limpo.iter_events(tipo="fala")]
+        lembrado_limpo = await limpo.recall("importado numero 3", k=1, budget_ms=None)
+        await limpo.close()
+        return (ignorados, importados, eventos, lembrado, total, mantidos, ids,
+                lembrado_limpo[0][0].id)
+    
+    (ignorados, importados, eventos, lembrado, total, mantidos, ids,
+     lembrado_limpo) = run(cenario())
+    assert (ignorados, importados, total) == (0, 5, 13)
+    assert [event.contexto for event in eventos] == [{"i": i, "lista": [i, "x"]} for i in range(5)]
+    assert all(event.id > 8 for event in eventos)
+    # Linhas importadas entram no índice semântico na hora
+    assert lembrado[0][0].evento == "importado numero 3"
+    assert (mantidos, ids, lembrado_limpo) == (5, [1, 2, 3, 4, 5], 4)
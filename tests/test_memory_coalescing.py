@@ -0,0 +1,116 @@
+"""
+Testes do agrupamento de repetições: entre lotes, sequência interrompida,
+janela vencida e contagens depois de agrupar, nos dois backends
+"""
+
+from datetime import datetime, timedelta
+import asyncio
+
+import pytest
+
+from systems.memory import MemoryEvent, MemorySystem
+
+BACKENDS = ["sqlite", "log"]
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def memoria(tmp_path, backend: str, **kwargs) -> MemorySystem:
+    kwargs.setdefault("write_flush_interval", 0.01)
+    if backend == "log":
+        kwargs.update(log_path=str(tmp_path / "log"), log_segment_records=256,
+                      contexto_codec="json")
+    return MemorySystem(str(tmp_path / "prime.db"), backend=backend, **kwargs)
+
+
+def evento(inicio: datetime, segundos: float, texto: str = "ping") -> MemoryEvent:
+    return MemoryEvent(timestamp=inicio + timedelta(seconds=segundos), tipo="fala",
+                       evento=texto, resultado="aceita")
+
+
+async def gravar_lotes(memory: MemorySystem, *lotes):
+    """Cada lote é gravado por um flush próprio"""
+    for lote in lotes:
+        for event in lote:
+            await memory.store_event(event)
+        await memory.flush()
+
+
+async def linhas(memory: MemorySystem) -> list:
+    return [(event.evento, event.count) async for event in memory.iter_events()]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_repeticao_continua_no_lote_seguinte(tmp_path, backend):
+    async def cenario():
+        memory = memoria(tmp_path, backend)
+        await memory.initialize()
+        # O armazenamento guarda milissegundos
+        inicio = (datetime.now() - timedelta(minutes=1)).replace(microsecond=0)
+        await gravar_lotes(memory, [evento(inicio, i) for i in range(3)],
+                           [evento(inicio, i) for i in range(3, 5)])
+        eventos = [event async for event in memory.iter_events()]
+        coalesced = memory.get_stats()["coalesced"]
+        await memory.close()
+        return inicio, eventos, coalesced
+    
+    inicio, eventos, coalesced = run(cenario())
+    assert [(event.evento, event.count) for event in eventos] == [("ping", 5)]
+    assert eventos[0].first_timestamp == inicio
+    assert eventos[0].timestamp == inicio + timedelta(seconds=4)
+    assert coalesced == 4
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_evento_diferente_interrompe_a_repeticao(tmp_path, backend):
+    async def cenario():
+        memory = memoria(tmp_path, backend)
+        await memory.initialize()
+        inicio = datetime.now() - timedelta(minutes=1)
+        await gravar_lotes(memory, [evento(inicio, 0), evento(inicio, 1),
+                                    evento(inicio, 2, "pong"), evento(inicio, 3)],
+                           [evento(inicio, 4, "pong")])
+        resultado = await linhas(memory)
+        await memory.close()
+        return resultado
+    
+    # "pong" do segundo lote não agrupa com o do primeiro: a última linha é "ping"
+    assert run(cenario()) == [("ping", 2), ("pong", 1), ("ping", 1), ("pong", 1)]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_janela_vencida_abre_linha_nova(tmp_path, backend):
+    async def cenario():
+        memory = memoria(tmp_path, backend, coalesce_window=10)
+        await memory.initialize()
+        inicio = datetime.now() - timedelta(minutes=5)
+        await gravar_lotes(memory, [evento(inicio, 0), evento(inicio, 5), evento(inicio, 30)],
+                           [evento(inicio, 35)], [evento(inicio, 60)])
+        resultado = await linhas(memory)
+        await memory.close()
+        return resultado
+    
+    # 0-5 agrupam; 30 passa da janela no lote; 35 agrupa com 30 entre lotes; 60 passa
+    assert run(cenario()) == [("ping", 2), ("ping", 2), ("ping", 1)]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_contagens_somam_as_repeticoes(tmp_path, backend):
+    async def cenario():
+        memory = memoria(tmp_path, backend)
+        await memory.initialize()
+        inicio = datetime.now() - timedelta(minutes=1)
+        await gravar_lotes(memory, [evento(inicio, i) for i in range(4)],
+                           [evento(inicio, 4), evento(inicio, 5, "pong"), evento(inicio, 6)])
+        eventos = [event async for event in memory.iter_events(tipo="fala")]
+        total = await memory.count_events("fala")
+        padroes = await memory.get_patterns()
+        await memory.close()
+        return eventos, total, padroes
+    
+    eventos, total, padroes = run(cenario())
+    assert len(eventos) == 3
+    assert sum(event.count for event in eventos) == total == 7
+    assert padroes == {"fala_aceita": 7}
@@ -0,0 +1,84 @@
+"""
+Testes da recordação semântica: indexação a cada gravação, backlog na
+reabertura e orçamento de latência
+"""
+
+import asyncio
+
+from systems.memory import MemoryEvent, MemorySystem
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def memoria(tmp_path, semantic: bool = True) -> MemorySystem:
+    return MemorySystem(str(tmp_path / "prime.db"), write_flush_interval=0.01,
+                        semantic_index_path=str(tmp_path / "semantic") if semantic else None)
+
+
+async def gravar(memory: MemorySystem, textos):
+    for texto in textos:
+        await memory.store_event(MemoryEvent(tipo="fala", evento=texto))
+    await memory.flush()
+
+
+def test_store_event_indexa_na_hora(tmp_path):
+    async def cenario():
+        memory = memoria(tmp_path)
+        await memory.initialize()
+        await gravar(memory, ["o gato dorme no sofá", "choveu a tarde toda"])
+        antes = memory._semantic.get_stats()["vectors"]
+        await gravar(memory, ["o cachorro late no quintal"])
+        depois = memory._semantic.get_stats()["vectors"]
+        lembrado = await memory.recall("cachorro latindo no quintal", k=1, budget_ms=None)
+        await memory.close()
+        return antes, depois, lembrado
+    
+    antes, depois, lembrado = run(cenario())
+    assert (antes, depois) == (2, 3)
+    assert lembrado[0][0].evento == "o cachorro late no quintal"
+
+
+def test_reabertura_indexa_o_backlog(tmp_path):
+    async def cenario():
+        memory = memoria(tmp_path)
+        await memory.initialize()
+        await gravar(memory, ["o gato dorme no sofá"])
+        await memory.close()
+        
+        # Gravados sem o índice semântico ativo
+        sem_indice = memoria(tmp_path, semantic=False)
+        await sem_indice.initialize()
+        await gravar(sem_indice, ["choveu a tarde toda", "o cachorro late no quintal"])
+        await sem_indice.close()
+        
+        memory = memoria(tmp_path)
+        await memory.initialize()
+        stats = memory._semantic.get_stats()
+        lembrado = await memory.recall("chuva a tarde toda", k=1, budget_ms=None)
+        await memory.close()
+        return stats, lembrado
+    
+    stats, lembrado = run(cenario())
+    assert (stats["vectors"], stats["last_id"]) == (3, 3)
+    assert lembrado[0][0].evento == "choveu a tarde toda"
+
+
+def test_orcamento_vencido_devolve_os_mais_novos(tmp_path):
+    async def cenario():
+        memory = memoria(tmp_path)
+        await memory.initialize()
+        await gravar(memory, [f"o gato dorme no sofá {i}" for i in range(10)])
+        # Blocos de 3 vetores e orçamento zero: só o primeiro bloco é varrido
+        memory._semantic.index._SEARCH_BLOCK = 3
+        parcial = await memory.recall("o gato dorme no sofá", k=5, budget_ms=0)
+        varridos = memory._semantic.get_stats()["last_scanned"]
+        completo = await memory.recall("o gato dorme no sofá", k=5, budget_ms=None)
+        await memory.close()
+        return parcial, varridos, completo
+    
+    parcial, varridos, completo = run(cenario())
+    assert varridos == 3
+    assert sorted(event.id for event, _ in parcial) == [8, 9, 10]
+    assert len(completo) == 5
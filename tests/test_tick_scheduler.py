@@ -0,0 +1,69 @@
+"""
+Testes do agendador do loop principal: políticas de atraso e a grade fixa
+"""
+
+import asyncio
+
+import pytest
+
+from systems.tick_scheduler import TickScheduler
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_sem_atraso_segue_a_grade():
+    scheduler = TickScheduler(1.0)
+    assert scheduler._next(10.0, 10.3) == 11.0
+    assert scheduler.overruns == 0
+
+
+def test_skip_descarta_os_prazos_perdidos():
+    scheduler = TickScheduler(1.0, policy="skip")
+    # Prazo 10, terminou em 13.5: 11, 12 e 13 vencidos; o próximo é 14
+    assert scheduler._next(10.0, 13.5) == 14.0
+    assert (scheduler.overruns, scheduler.skipped) == (1, 3)
+
+
+def test_catch_up_recupera_no_maximo_max_catch_up():
+    scheduler = TickScheduler(1.0, policy="catch_up", max_catch_up=2)
+    # 11, 12 e 13 vencidos: o mais antigo é descartado e 12 roda em seguida
+    assert scheduler._next(10.0, 13.5) == 12.0
+    assert (scheduler.skipped, scheduler.caught_up) == (1, 1)
+    
+    sem_recuperar = TickScheduler(1.0, policy="catch_up", max_catch_up=0)
+    assert sem_recuperar._next(10.0, 13.5) == 14.0
+    assert (sem_recuperar.skipped, sem_recuperar.caught_up) == (3, 0)
+
+
+def test_coalesce_recomeca_a_grade_no_fim_do_tick():
+    scheduler = TickScheduler(1.0, policy="coalesce")
+    assert scheduler._next(10.0, 13.5) == 13.5
+    assert (scheduler.skipped, scheduler.coalesced) == (2, 1)
+
+
+def test_parametros_invalidos():
+    with pytest.raises(ValueError):
+        TickScheduler(0)
+    with pytest.raises(ValueError):
+        TickScheduler(1.0, policy="outra")
+
+
+def test_periodo_nao_soma_a_duracao_do_tick():
+    async def cenario():
+        scheduler = TickScheduler(0.1)
+        inicios = []
+        loop = asyncio.get_running_loop()
+        
+        async def tick():
+            inicios.append(loop.time())
+            await asyncio.sleep(0.08)
+        
+        await scheduler.run(tick, lambda: len(inicios) < 6)
+        return scheduler, inicios
+    
+    scheduler, inicios = run(cenario())
+    assert scheduler.ticks == 6
+    # Na grade, 5 períodos = 0.5 s; com sleep depois do tick seriam 0.9 s
+    assert inicios[-1] - inicios[0] < 0.7
@@ -0,0 +1,174 @@
+"""
+Testes do worker de TTS com um engine falso: prioridade, fila limitada,
+limpeza por grupo, barge-in e on_done sempre chamado
+"""
+
+import asyncio
+import threading
+import time
+
+from systems.tts_worker import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, TTSWorker
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class Engine:
+    """
+    Engine falso no formato do pyttsx3: runAndWait "fala" palavra a palavra
+    (callback started-word) até `liberar`, ou até stop(), e anota os textos
+    """
+    
+    def __init__(self, falhas=()):
+        self.falhas = set(falhas)
+        self.faladas = []
+        self.falando = threading.Event()  # Alguma fala começou
+        self.liberar = threading.Event()  # Falas terminam depois disso
+        self._texto = None
+        self._parar = False
+        self._on_word = None
+    
+    def connect(self, nome, callback):
+        self._on_word = callback
+    
+    def say(self, texto):
+        self._texto = texto
+    
+    def stop(self):
+        self._parar = True
+    
+    def runAndWait(self):
+        texto, self._texto, self._parar = self._texto, None, False
+        if texto in self.falhas:
+            raise RuntimeError("falha no driver")
+        self.falando.set()
+        while not self.liberar.is_set():
+            self._on_word("started-word", 0, 1)
+            if self._parar:
+                return
+            time.sleep(0.001)
+        self.faladas.append(texto)
+
+
+def esperar(condicao, timeout: float = 2.0):
+    limite = time.monotonic() + timeout
+    while not condicao():
+        assert time.monotonic() < limite, "tempo esgotado"
+        time.sleep(0.005)
+
+
+def iniciar(engine: Engine, **kwargs) -> TTSWorker:
+    """Worker com uma primeira fala "segura" presa no engine"""
+    worker = TTSWorker(lambda: engine, **kwargs)
+    assert worker.start()
+    worker.submit("segura")
+    assert engine.falando.wait(2)
+    return worker
+
+
+def test_fala_na_ordem_de_prioridade():
+    engine = Engine()
+    worker = iniciar(engine)
+    worker.submit("baixa", PRIORITY_LOW)
+    worker.submit("normal 1", PRIORITY_NORMAL)
+    worker.submit("alta", PRIORITY_HIGH)
+    worker.submit("normal 2", PRIORITY_NORMAL)
+    engine.liberar.set()
+    esperar(lambda: len(engine.faladas) == 5)
+    worker.stop()
+    # Mesma prioridade sai em ordem de chegada
+    assert engine.faladas == ["segura", "alta", "normal 1", "normal 2", "baixa"]
+
+
+def test_fila_cheia_descarta_a_menos_prioritaria():
+    engine = Engine()
+    worker = iniciar(engine, max_queue=2)
+    fim = {}
+    
+    def submit(texto, prioridade):
+        return worker.submit(texto, prioridade,
+                             on_done=lambda utterance: fim.update({texto: utterance.status}))
+    
+    submit("a", PRIORITY_NORMAL)
+    submit("b", PRIORITY_NORMAL)
+    # Não é mais prioritária que a pior da fila: descartada
+    assert submit("c", PRIORITY_NORMAL) is None
+    assert submit("d", PRIORITY_LOW) is None
+    # Mais prioritária: toma o lugar da mais nova entre as de menor prioridade
+    assert submit("e", PRIORITY_HIGH) is not None
+    assert fim == {"c": "dropped", "d": "dropped", "b": "dropped"}
+    
+    engine.liberar.set()
+    esperar(lambda: len(engine.faladas) == 3)
+    stats = worker.get_stats()
+    worker.stop()
+    assert engine.faladas == ["segura", "e", "a"]
+    assert stats["dropped"] == 3
+
+
+def test_clear_por_grupo_e_barge_in():
+    engine = Engine()
+    worker = iniciar(engine)
+    fim = {}
+    for texto, grupo in (("x1", "x"), ("y1", "y"), ("x2", "x")):
+        worker.submit(texto, group=grupo,
+                      on_done=lambda utterance: fim.update({utterance.text: utterance.status}))
+    assert worker.clear("x") == 2
+    assert fim == {"x1": "cancelled", "x2": "cancelled"}
+    
+    # Barge-in de outro grupo não interrompe; sem grupo, interrompe "segura"
+    assert not worker.cancel_current("y")
+    assert worker.cancel_current()
+    esperar(lambda: worker.get_stats()["cancelled"] == 3)
+    engine.liberar.set()
+    esperar(lambda: fim.get("y1") == "spoken")
+    worker.stop()
+    assert engine.faladas == ["y1"]
+
+
+def test_on_done_sempre_resolve_o_future():
+    async def cenario():
+        loop = asyncio.get_running_loop()
+        engine = Engine(falhas=["quebra"])
+        parado = TTSWorker(lambda: engine)
+        worker = iniciar(engine)
+        
+        def falar(alvo: TTSWorker, texto: str, grupo=None) -> asyncio.Future:
+            # Mesmo caminho da expressão: on_done na thread do worker resolve no loop
+            future = loop.create_future()
+            alvo.submit(texto, group=grupo, on_done=lambda utterance: loop.call_soon_threadsafe(
+                future.set_result, utterance.status))
+            return future
+        
+        futuros = {
+            "sem worker": falar(parado, "oi"),
+            "fila": falar(worker, "repetida", "g"),
+            "repetida": falar(worker, "repetida", "g"),
+            "erro": falar(worker, "quebra"),
+            "limpa": falar(worker, "limpa", "z"),
+        }
+        worker.clear("z")
+        engine.liberar.set()
+        statuses = {}
+        for nome, future in futuros.items():
+            statuses[nome] = await asyncio.wait_for(future, 2)
+        
+        # Fala ainda na fila quando o worker para também resolve
+        engine.liberar.clear()
+        engine.falando.clear()
+        worker.submit("segura de novo")
+        assert engine.falando.wait(2)
+        pendente = falar(worker, "pendente")
+        await asyncio.to_thread(worker.stop)
+        statuses["parada"] = await asyncio.wait_for(pendente, 2)
+        return statuses
+    
+    assert run(cenario()) == {
+        "sem worker": "dropped",
+        "fila": "spoken",
+        "repetida": "coalesced",
+        "erro": "error",
+        "limpa": "cancelled",
+        "parada": "cancelled",
+    }